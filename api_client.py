@@ -0,0 +1,63 @@
+# api_client.py
+"""
+Thin client for api_server.py, so UIs and scripts can share one RAG service
+instead of each holding their own RAGCrew.
+"""
+
+import json
+import os
+
+import requests
+
+
+class RAGServiceClient:
+    """HTTP client for the OnboardIQ RAG API"""
+
+    def __init__(self, base_url=None, timeout=600):
+        self.base_url = (base_url or os.environ.get("ONBOARDIQ_API_URL", "http://localhost:8000")).rstrip("/")
+        self.timeout = timeout
+
+    def _check(self, response):
+        if response.status_code == 429:
+            raise RuntimeError(f"Service busy, retry after {response.headers.get('Retry-After', '?')}s")
+        response.raise_for_status()
+        return response.json()
+
+    def ingest(self, files, clear_existing=False, upload_batch=None):
+        """Upload (name, bytes or file-like) pairs for ingestion"""
+        payload = [("files", (name, content)) for name, content in files]
+        data = {"clear_existing": str(clear_existing).lower()}
+        if upload_batch:
+            data["upload_batch"] = upload_batch
+        response = requests.post(f"{self.base_url}/ingest", files=payload, data=data, timeout=self.timeout)
+        return self._check(response)
+
+    def query(self, question, k=None, score_threshold=None, tenant="default", batch=False,
+              answer_timeout=None, max_tokens=None, filters=None):
+        """Ask a question and return the answer with its sources; answer_timeout is the server-side limit"""
+        response = requests.post(f"{self.base_url}/query", timeout=self.timeout,
+                                 json={"question": question, "k": k, "score_threshold": score_threshold,
+                                       "tenant": tenant, "batch": batch, "timeout": answer_timeout,
+                                       "max_tokens": max_tokens, "filters": filters})
+        return self._check(response)
+
+    def stream(self, question, k=None, score_threshold=None):
+        """Yield progress events for a question as they arrive"""
+        with requests.post(f"{self.base_url}/query/stream", stream=True, timeout=self.timeout,
+                           json={"question": question, "k": k, "score_threshold": score_threshold}) as response:
+            if response.status_code != 200:
+                self._check(response)
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def sources(self):
+        return self._check(requests.get(f"{self.base_url}/sources", timeout=self.timeout))["sources"]
+
+    def delete_source(self, name=None):
+        """Delete one source by file name, or every source when name is None"""
+        url = f"{self.base_url}/sources" + (f"/{requests.utils.quote(name)}" if name else "")
+        return self._check(requests.delete(url, timeout=self.timeout))
+
+    def stats(self):
+        return self._check(requests.get(f"{self.base_url}/stats", timeout=self.timeout))
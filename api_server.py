@@ -0,0 +1,360 @@
+# api_server.py
+"""
+Headless HTTP API over a single shared RAGCrew.
+
+Requests that reach Ollama (ingest, query, stream) pass through a bounded
+queue: at most MAX_CONCURRENCY run at once and at most MAX_QUEUE wait; beyond
+that the server answers 429 with Retry-After so a load balancer can back off.
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000
+"""
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from rag_crew import METADATA_FILTER_FIELDS, RAGCrew, duplicate_upload_names
+from metrics import REGISTRY
+import asyncio
+import json
+import os
+import time
+
+MODEL_NAME = os.environ.get("ONBOARDIQ_MODEL", "llama3.2:latest")
+EMBEDDING_MODEL = os.environ.get("ONBOARDIQ_EMBED_MODEL", "nomic-embed-text")
+OLLAMA_URL = os.environ.get("ONBOARDIQ_OLLAMA_URL", "http://localhost:11434")
+PERSIST_DIRECTORY = os.environ.get("ONBOARDIQ_PERSIST_DIR", "./chroma_db")
+MAX_CONCURRENCY = int(os.environ.get("ONBOARDIQ_MAX_CONCURRENCY", "2"))
+MAX_QUEUE = int(os.environ.get("ONBOARDIQ_MAX_QUEUE", "16"))
+VECTOR_BACKEND = os.environ.get("ONBOARDIQ_VECTOR_BACKEND", "chroma")  # "mmap" for very large corpora
+VECTOR_DTYPE = os.environ.get("ONBOARDIQ_VECTOR_DTYPE", "int8")
+KEEP_ALIVE = os.environ.get("ONBOARDIQ_KEEP_ALIVE", "30m")  # how long Ollama keeps models loaded; "-1" = forever
+PRELOAD = os.environ.get("ONBOARDIQ_PRELOAD", "1") == "1"  # load the models at startup, not on the first question
+REQUEST_TIMEOUT = float(os.environ.get("ONBOARDIQ_REQUEST_TIMEOUT", "0")) or None  # seconds per answer, 0 = no limit
+SUMMARY_NODES = os.environ.get("ONBOARDIQ_SUMMARY_NODES") or None  # "extractive" or "llm" to add summary nodes
+PDF_EXTRACTOR = os.environ.get("ONBOARDIQ_PDF_EXTRACTOR", "auto")  # pymupdf, pypdfium2, pdftotext or pypdf
+DUPLICATE_POLICY = os.environ.get("ONBOARDIQ_DUPLICATE_POLICY", "skip")  # or "link_version", "keep_newest", "off"
+LLM_OUT_OF_CONTEXT = os.environ.get("ONBOARDIQ_LLM_OUT_OF_CONTEXT", "0") == "1"  # template replies unless set
+
+api_requests = REGISTRY.counter("rag_api_requests_total", "API requests by endpoint and outcome", ["endpoint", "status"])
+api_queue_depth = REGISTRY.gauge("rag_api_queue_depth", "Requests waiting for an Ollama slot")
+api_in_flight = REGISTRY.gauge("rag_api_in_flight", "Requests currently using an Ollama slot")
+
+
+class QueryRequest(BaseModel):
+    question: str
+    k: Optional[int] = None
+    score_threshold: Optional[float] = None
+    tenant: str = "default"
+    batch: bool = False  # batch jobs yield to interactive questions in the LLM scheduler
+    timeout: Optional[float] = None  # seconds; past it the best intermediate answer is returned as partial
+    max_tokens: Optional[int] = None  # output token budget across all agents
+    filters: Optional[Dict[str, Any]] = None  # e.g. {"source": ["jane_cv.pdf"], "doc_type": "cv"}
+
+
+class ReindexRequest(BaseModel):
+    embedding_model: str
+
+
+class WorkQueue:
+    """Bounded admission queue with a concurrency limit toward Ollama"""
+
+    def __init__(self, max_concurrency, max_queue):
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, endpoint, fn, *args):
+        """Run a blocking RAGCrew call in a worker thread once a slot is free"""
+        if self.waiting >= self.max_queue:
+            api_requests.inc(endpoint=endpoint, status="429")
+            raise HTTPException(status_code=429, detail="Server busy, retry later", headers={"Retry-After": "5"})
+        self.waiting += 1
+        api_queue_depth.set(self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            api_queue_depth.set(self.waiting)
+        self.in_flight += 1
+        api_in_flight.set(self.in_flight)
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self.in_flight -= 1
+            api_in_flight.set(self.in_flight)
+            self._slots.release()
+
+
+class ReadWriteLock:
+    """Queries share the index; ingestion and deletion get it exclusively.
+
+    A waiting writer holds back queries that arrive after it, so a steady
+    stream of questions cannot keep an upload waiting forever.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+
+    async def release_read(self):
+        async with self._condition:
+            self._readers -= 1
+            self._condition.notify_all()
+
+    async def acquire_write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and self._readers == 0)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+
+    async def release_write(self):
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+app = FastAPI(title="OnboardIQ RAG API")
+rag_crew = RAGCrew(model_name=MODEL_NAME, base_url=OLLAMA_URL, persist_directory=PERSIST_DIRECTORY,
+                   vector_backend=VECTOR_BACKEND, vector_dtype=VECTOR_DTYPE, embedding_model=EMBEDDING_MODEL,
+                   keep_alive=KEEP_ALIVE, request_timeout=REQUEST_TIMEOUT, llm_out_of_context=LLM_OUT_OF_CONTEXT,
+                   summary_nodes=SUMMARY_NODES, pdf_extractor=PDF_EXTRACTOR,
+                   duplicate_policy=None if DUPLICATE_POLICY == "off" else DUPLICATE_POLICY)
+work_queue = None
+index_lock = None
+
+
+@app.on_event("startup")
+async def startup():
+    # asyncio primitives must be created inside the server's event loop
+    global work_queue, index_lock
+    work_queue = WorkQueue(MAX_CONCURRENCY, MAX_QUEUE)
+    index_lock = ReadWriteLock()
+    if PRELOAD:
+        rag_crew.warm_up()
+
+
+def _sources_of(docs):
+    return [
+        {
+            "source": doc.metadata.get("source", "Unknown"),
+            "page": doc.metadata.get("page"),
+            "relevance_score": doc.metadata.get("relevance_score")
+        }
+        for doc in docs
+    ]
+
+
+def _check_filters(request, endpoint):
+    """Answer 400 for filters on fields the index does not record, before the request is queued"""
+    unknown = sorted(set(request.filters or {}) - set(METADATA_FILTER_FIELDS))
+    if unknown:
+        api_requests.inc(endpoint=endpoint, status="400")
+        raise HTTPException(status_code=400, detail=f"Cannot filter on {', '.join(unknown)}; "
+                                                    f"use one of {', '.join(METADATA_FILTER_FIELDS)}")
+
+
+def _generate(request, progress=None):
+    """Answer a question with retrieval, route and status all taken from the same call"""
+    return rag_crew.generate_response(request.question, tenant=request.tenant, interactive=not request.batch,
+                                      timeout=request.timeout, max_tokens=request.max_tokens,
+                                      filters=request.filters, return_details=True, k=request.k,
+                                      score_threshold=request.score_threshold, progress=progress)
+
+
+def _answer(request):
+    """Blocking query path run in a worker thread"""
+    start = time.perf_counter()
+    details = _generate(request)
+    return {
+        "answer": str(details["answer"]),
+        "route": details["route"],
+        "partial": details["partial"],
+        "sources": _sources_of(details["documents"]),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/ingest")
+async def ingest(files: List[UploadFile] = File(...), clear_existing: bool = Form(False),
+                 upload_batch: Optional[str] = Form(None)):
+    # The uploads are parsed from the request's own spooled files (see RAGCrew.load_and_process_uploads)
+    uploads = [(upload.filename, upload.file) for upload in files]
+    clashes = duplicate_upload_names(upload.filename for upload in files)
+    if clashes:
+        api_requests.inc(endpoint="ingest", status="400")
+        raise HTTPException(status_code=400, detail=f"Several files are named {', '.join(clashes)}; "
+                                                    "file names must be unique")
+    await index_lock.acquire_write()
+    try:
+        success = await work_queue.run("ingest", rag_crew.load_and_process_uploads, uploads, clear_existing,
+                                       upload_batch)
+    finally:
+        await index_lock.release_write()
+
+    if not success:
+        api_requests.inc(endpoint="ingest", status="500")
+        raise HTTPException(status_code=500, detail="Failed to process documents")
+    api_requests.inc(endpoint="ingest", status="200")
+    return {"files": [f.filename for f in files], "chunks": rag_crew.get_document_count(),
+            "upload_batch": rag_crew.last_ingestion_report["upload_batch"],
+            "duplicates": rag_crew.last_ingestion_report["duplicates"],
+            "bytes_copied": rag_crew.last_ingestion_report["extraction"]["bytes_copied"]}
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    if not rag_crew.retriever:
+        raise HTTPException(status_code=409, detail="No documents loaded")
+    _check_filters(request, "query")
+    await index_lock.acquire_read()
+    try:
+        result = await work_queue.run("query", _answer, request)
+    finally:
+        await index_lock.release_read()
+    api_requests.inc(endpoint="query", status="200")
+    return result
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Stream progress events as newline-delimited JSON while the question is answered.
+
+    Events: queued, route, retrieved (the sources used), one agent event per
+    finished crew task, then answer with the complete text and done. The
+    answer is sent whole once it is final; it is not streamed token by token.
+    """
+    if not rag_crew.retriever:
+        raise HTTPException(status_code=409, detail="No documents loaded")
+    _check_filters(request, "stream")
+    # Admission is decided before streaming starts so overload still returns 429
+    if work_queue.waiting >= work_queue.max_queue:
+        api_requests.inc(endpoint="stream", status="429")
+        raise HTTPException(status_code=429, detail="Server busy, retry later", headers={"Retry-After": "5"})
+
+    def progress_event(event):
+        if event["event"] == "route":
+            return {"event": "route", "route": event["route"]}
+        if event["event"] == "retrieved":
+            return {"event": "retrieved", "sources": _sources_of(event["documents"])}
+        return event
+
+    async def events():
+        yield json.dumps({"event": "queued"}) + "\n"
+        # Progress arrives from the answering thread and is handed to this loop through a queue
+        loop = asyncio.get_running_loop()
+        progress = asyncio.Queue()
+        await index_lock.acquire_read()
+        try:
+            answering = asyncio.ensure_future(work_queue.run(
+                "stream", _generate, request, lambda event: loop.call_soon_threadsafe(progress.put_nowait, event)))
+            answering.add_done_callback(lambda _: progress.put_nowait(None))
+            while (event := await progress.get()) is not None:
+                yield json.dumps(progress_event(event)) + "\n"
+            try:
+                details = await answering
+            except Exception as e:
+                # Headers are already sent, so the failure is reported as the last event
+                api_requests.inc(endpoint="stream", status="500")
+                yield json.dumps({"event": "error", "detail": getattr(e, "detail", str(e))}) + "\n"
+                return
+        finally:
+            await index_lock.release_read()
+        yield json.dumps({"event": "answer", "route": details["route"], "partial": details["partial"],
+                          "sources": _sources_of(details["documents"]), "text": str(details["answer"])}) + "\n"
+        yield json.dumps({"event": "done"}) + "\n"
+        api_requests.inc(endpoint="stream", status="200")
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/sources")
+async def sources():
+    return {"sources": await asyncio.to_thread(rag_crew.list_sources)}
+
+
+@app.delete("/sources")
+async def delete_all_sources():
+    await index_lock.acquire_write()
+    try:
+        cleared = await asyncio.to_thread(rag_crew.clear_documents)
+    finally:
+        await index_lock.release_write()
+    if not cleared:
+        raise HTTPException(status_code=500, detail="Failed to clear documents")
+    return {"deleted": "all"}
+
+
+@app.delete("/sources/{name}")
+async def delete_source(name: str):
+    await index_lock.acquire_write()
+    try:
+        deleted = await asyncio.to_thread(rag_crew.delete_source, name)
+    finally:
+        await index_lock.release_write()
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No chunks found for source {name}")
+    return {"source": name, "deleted_chunks": deleted}
+
+
+@app.post("/reindex")
+async def reindex(request: ReindexRequest):
+    """Start re-embedding the index with another embedding model; queries keep working meanwhile"""
+    if rag_crew.migration_status["state"] == "running":
+        raise HTTPException(status_code=409, detail="A re-index is already running")
+    await index_lock.acquire_write()
+    try:
+        started = await asyncio.to_thread(rag_crew.migrate_embeddings, request.embedding_model)
+    finally:
+        await index_lock.release_write()
+    if not started:
+        raise HTTPException(status_code=500, detail="Failed to start re-index")
+    return rag_crew.migration_status
+
+
+@app.get("/reindex")
+async def reindex_status():
+    return rag_crew.migration_status
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "model": MODEL_NAME,
+        "embedding_model": rag_crew.embedding_model,
+        "warm_up": rag_crew.warm_up_report,
+        "vector_backend": VECTOR_BACKEND,
+        "chunks": rag_crew.get_document_count(),
+        "queue_depth": work_queue.waiting,
+        "in_flight": work_queue.in_flight,
+        "max_concurrency": MAX_CONCURRENCY,
+        "max_queue": MAX_QUEUE,
+        "questions_served": rag_crew.metrics.questions.value()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return REGISTRY.render()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("ONBOARDIQ_API_PORT", "8000")))
@@ -1,8 +1,6 @@
 # app.py
 import streamlit as st
-from rag_crew import RAGCrew
-import tempfile
-import os
+from rag_crew import RAGCrew, duplicate_upload_names
 from datetime import datetime
 
 # Initialize session state
@@ -59,24 +57,18 @@ with st.sidebar:
     )
     
     if st.button("🚀 Process Documents", help="Process the uploaded documents for querying"):
-        if uploaded_files:
+        clashes = duplicate_upload_names(file.name for file in uploaded_files or [])
+        if clashes:
+            st.warning(f"⚠️ Several files are named {', '.join(clashes)}; rename them so none is lost")
+        elif uploaded_files:
             with st.spinner("Processing documents..."):
                 try:
-                    # Save uploaded files temporarily
-                    temp_dir = tempfile.mkdtemp()
-                    file_paths = []
-                    for file in uploaded_files:
-                        file_path = os.path.join(temp_dir, file.name)
-                        with open(file_path, "wb") as f:
-                            f.write(file.getbuffer())
-                        file_paths.append(file_path)
-                    
                     # Initialize RAG crew with local Ollama
                     st.session_state.rag_crew = RAGCrew(model_name=model_name)
                     
-                    # Process documents with clear option
-                    success = st.session_state.rag_crew.load_and_process_documents(
-                        file_paths, 
+                    # Process documents with clear option; uploads are parsed from memory, nothing is left on disk
+                    success = st.session_state.rag_crew.load_and_process_uploads(
+                        [(file.name, file) for file in uploaded_files],
                         clear_existing=clear_existing
                     )
                     
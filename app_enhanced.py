@@ -1,10 +1,38 @@
 # app_enhanced.py
 import streamlit as st
-from rag_crew import RAGCrew
-import tempfile
+from rag_crew import RAGCrew, duplicate_upload_names
+from requirement_matcher import format_coverage_table
+from metrics import start_metrics_server
+from document_loaders import available_extractors
 import os
 from datetime import datetime
 
+# Expose process-wide metrics for Prometheus (shared by all sessions of this server) when a port is set;
+# the exporter is unauthenticated, so it stays on localhost unless ONBOARDIQ_METRICS_HOST says otherwise
+if os.environ.get("ONBOARDIQ_METRICS_PORT"):
+    try:
+        start_metrics_server(int(os.environ["ONBOARDIQ_METRICS_PORT"]),
+                             host=os.environ.get("ONBOARDIQ_METRICS_HOST", "127.0.0.1"))
+    except OSError as e:
+        print(f"⚠️ Metrics exporter not started: {e}")
+
+def render_trace_waterfall(trace, width=40):
+    """Render a request trace as a text timing waterfall"""
+    total_ms = max((span["start_ms"] + (span["duration_ms"] or 0) for span in trace["spans"]), default=0) or 1
+    depth = {}
+    lines = []
+    for span in sorted(trace["spans"], key=lambda item: item["start_ms"]):
+        depth[span["span_id"]] = depth.get(span["parent_id"], -1) + 1
+        offset = int(span["start_ms"] / total_ms * width)
+        length = max(1, int((span["duration_ms"] or 0) / total_ms * width))
+        bar = "·" * offset + "█" * min(length, width - offset)
+        tokens = ""
+        if span["attributes"].get("prompt_tokens") or span["attributes"].get("completion_tokens"):
+            tokens = f"  {span['attributes'].get('prompt_tokens') or 0}→{span['attributes'].get('completion_tokens') or 0} tok"
+        name = "  " * depth[span["span_id"]] + span["name"]
+        lines.append(f"{name[:28]:<28} {bar:<{width}} {span['duration_ms'] or 0:>9.0f} ms{tokens}")
+    st.code("\n".join(lines), language=None)
+
 # Initialize session state
 if 'rag_crew' not in st.session_state:
     st.session_state.rag_crew = None
@@ -46,6 +74,67 @@ with st.sidebar:
         help="Choose the local LLM model to use for processing"
     )
     
+    embedding_model = st.selectbox(
+        "Embedding Model",
+        ["nomic-embed-text", "mxbai-embed-large", "all-minilm"],
+        index=0,
+        help="Small dedicated model used to embed document chunks and questions (ollama pull it first)"
+    )
+    
+    # Switching the embedding model re-embeds the loaded documents in the background
+    crew = st.session_state.rag_crew
+    if crew and crew.embedding_model != embedding_model:
+        if crew.migration_status["state"] == "running":
+            status = crew.migration_status
+            st.info(f"Re-embedding with {status['to_model']}: {status['embedded']}/{status['total']} chunks")
+        elif st.button(f"🔁 Re-index with {embedding_model}"):
+            crew.migrate_embeddings(embedding_model)
+            st.info("Re-indexing started; questions use the current index until it finishes")
+    elif crew and crew.migration_status["state"] == "failed":
+        st.warning(f"Last re-index failed: {crew.migration_status['error']}")
+    
+    # Per-agent models: small models for extraction and checks, the main model for the writer
+    agent_models = {}
+    with st.expander("🤖 Agent Models"):
+        for name, label in [("researcher", "Researcher"), ("analyst", "Analyst"), ("writer", "Writer"), ("qa_agent", "QA")]:
+            defaults = RAGCrew.AGENT_MODEL_DEFAULTS[name]
+            agent_model = st.selectbox(
+                f"{label} model",
+                ["Main model", "llama3.2:1b", "qwen2.5:1.5b", "llama3.2:latest", "mistral", "phi3", "gemma"],
+                key=f"{name}_model"
+            )
+            temperature = st.slider(f"{label} temperature", 0.0, 1.0, defaults["temperature"], 0.05, key=f"{name}_temperature")
+            max_tokens = st.number_input(
+                f"{label} max tokens (0 = no limit)", min_value=0, max_value=8192, value=0, step=128,
+                key=f"{name}_max_tokens"
+            )
+            agent_timeout = st.number_input(
+                f"{label} time limit in seconds (0 = no limit)", min_value=0, max_value=600, value=0, step=10,
+                key=f"{name}_timeout"
+            )
+            agent_models[name] = {
+                "model": None if agent_model == "Main model" else agent_model,
+                "temperature": temperature,
+                "max_tokens": max_tokens or None,
+                "timeout": agent_timeout or None
+            }
+    
+    # Limits per question; when one runs out the best draft so far is shown, marked as partial
+    request_timeout = st.number_input(
+        "Answer time limit in seconds (0 = no limit)", min_value=0, max_value=1800, value=180, step=30,
+        help="Return the best intermediate answer (e.g. the writer's draft without QA) once this time has passed"
+    )
+    request_max_tokens = st.number_input(
+        "Answer token budget (0 = no limit)", min_value=0, max_value=32768, value=0, step=256,
+        help="Output tokens all agents may generate for one question"
+    )
+    
+    llm_out_of_context = st.checkbox(
+        "Write out-of-context replies with the LLM",
+        value=False,
+        help="By default, questions the documents cannot answer get an instant reply listing what the documents cover"
+    )
+    
     # Show agent details toggle
     st.session_state.show_agent_details = st.checkbox(
         "Show Agent Workflow Details",
@@ -53,6 +142,49 @@ with st.sidebar:
         help="Display detailed information about each agent's work"
     )
     
+    st.header("🔍 Retrieval")
+    
+    retrieval_k = st.slider(
+        "Chunks per question (k)",
+        min_value=1,
+        max_value=12,
+        value=4,
+        help="Number of document chunks passed to the agents"
+    )
+    
+    score_threshold = st.slider(
+        "Minimum similarity",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.0,
+        step=0.05,
+        help="Drop chunks whose similarity to the question is below this value (0 disables the cutoff)"
+    )
+    
+    use_mmr = st.checkbox(
+        "Diverse results (MMR)",
+        value=False,
+        help="Prefer chunks that add new information over near-duplicates"
+    )
+    
+    decompose_queries = st.checkbox(
+        "Split multi-part questions",
+        value=True,
+        help="Search comparisons such as candidate vs. job requirements once per side, within the same number of chunks"
+    )
+    
+    # Apply model and retrieval settings to the active RAG crew; agents pick up model changes on the next question
+    if st.session_state.rag_crew:
+        st.session_state.rag_crew.model_name = model_name
+        st.session_state.rag_crew.agent_models = agent_models
+        st.session_state.rag_crew.request_timeout = request_timeout or None
+        st.session_state.rag_crew.request_max_tokens = request_max_tokens or None
+        st.session_state.rag_crew.llm_out_of_context = llm_out_of_context
+        st.session_state.rag_crew.retrieval_k = retrieval_k
+        st.session_state.rag_crew.score_threshold = score_threshold or None
+        st.session_state.rag_crew.use_mmr = use_mmr
+        st.session_state.rag_crew.decompose_queries = decompose_queries
+    
     st.header("📂 Document Management")
     
     # Document processing options
@@ -62,6 +194,24 @@ with st.sidebar:
         help="Clear previously loaded documents before processing new ones"
     )
     
+    summary_mode = st.selectbox(
+        "Summary nodes",
+        ["Off", "Extractive", "LLM"],
+        help="Add section and document summaries at ingestion, used for broad questions such as 'summarize this candidate'"
+    )
+    
+    duplicate_mode = st.selectbox(
+        "Near-duplicate uploads",
+        ["Skip", "Link as version", "Keep newest", "Off"],
+        help="What to do with a file that nearly repeats one already loaded; repeated chunks are stored once unless Off"
+    )
+    
+    pdf_extractor = st.selectbox(
+        "PDF text extractor",
+        ["auto"] + available_extractors(),
+        help="'auto' uses the fastest installed backend; parsed PDFs are cached, so re-uploads skip extraction"
+    )
+    
     uploaded_files = st.file_uploader(
         "Upload documents (PDF or TXT)",
         type=['pdf', 'txt'],
@@ -71,24 +221,34 @@ with st.sidebar:
     
     # Process documents button
     if st.button("🚀 Process Documents", help="Process the uploaded documents for querying"):
-        if uploaded_files:
+        clashes = duplicate_upload_names(file.name for file in uploaded_files or [])
+        if clashes:
+            st.warning(f"⚠️ Several files are named {', '.join(clashes)}; rename them so none is lost")
+        elif uploaded_files:
             with st.spinner("Processing documents..."):
                 try:
-                    # Save uploaded files temporarily
-                    temp_dir = tempfile.mkdtemp()
-                    file_paths = []
-                    for file in uploaded_files:
-                        file_path = os.path.join(temp_dir, file.name)
-                        with open(file_path, "wb") as f:
-                            f.write(file.getbuffer())
-                        file_paths.append(file_path)
-                    
                     # Initialize RAG crew with local Ollama
-                    st.session_state.rag_crew = RAGCrew(model_name=model_name)
+                    st.session_state.rag_crew = RAGCrew(
+                        model_name=model_name,
+                        embedding_model=embedding_model,
+                        agent_models=agent_models,
+                        preload=True,  # load the chat models while the documents are embedded
+                        request_timeout=request_timeout or None,
+                        request_max_tokens=request_max_tokens or None,
+                        llm_out_of_context=llm_out_of_context,
+                        retrieval_k=retrieval_k,
+                        score_threshold=score_threshold or None,
+                        use_mmr=use_mmr,
+                        decompose_queries=decompose_queries,
+                        summary_nodes=None if summary_mode == "Off" else summary_mode.lower(),
+                        duplicate_policy={"Skip": "skip", "Link as version": "link_version",
+                                          "Keep newest": "keep_newest"}.get(duplicate_mode),
+                        pdf_extractor=pdf_extractor
+                    )
                     
-                    # Process documents with clear option
-                    success = st.session_state.rag_crew.load_and_process_documents(
-                        file_paths, 
+                    # Process documents with clear option; uploads are parsed from memory, nothing is left on disk
+                    success = st.session_state.rag_crew.load_and_process_uploads(
+                        [(file.name, file) for file in uploaded_files],
                         clear_existing=clear_existing
                     )
                     
@@ -105,6 +265,24 @@ with st.sidebar:
                             st.write(f"**Documents Processed:** {len(uploaded_files)}")
                             st.write(f"**Text Chunks Created:** {st.session_state.document_count}")
                             st.write(f"**Files:** {[f.name for f in uploaded_files]}")
+                            report = st.session_state.rag_crew.last_ingestion_report
+                            if report:
+                                st.write("**Chunking:**")
+                                for entry in report["files"]:
+                                    st.write(f"- {os.path.basename(entry['source'])}: {entry['doc_type']} "
+                                             f"({entry['profile']} profile) → {entry['chunks']} chunks, "
+                                             f"~{entry['avg_chunk_chars']} characters each")
+                                extraction = report["extraction"]
+                                if extraction["pdf_pages"]:
+                                    st.write(f"**PDF extraction:** {extraction['pdf_pages']} pages with "
+                                             f"{extraction['extractor']} in {extraction['seconds']}s, "
+                                             f"{extraction['cache_hits']} file(s) from the cache")
+                                duplicates = report["duplicates"]
+                                for entry in duplicates["files"]:
+                                    st.write(f"- ♻️ {os.path.basename(entry['source'])}: {entry['action']}, "
+                                             f"{entry['similarity']:.0%} similar to {os.path.basename(entry['duplicate_of'])}")
+                                if duplicates["chunks"]:
+                                    st.write(f"- ♻️ {duplicates['chunks']} repeated chunks stored once")
                             if clear_existing:
                                 st.write("**Action:** Cleared existing documents before processing")
                             else:
@@ -132,6 +310,18 @@ with st.sidebar:
         else:
             st.warning("⚠️ No documents to clear")
     
+    # Instant requirement coverage preview (no LLM calls)
+    if st.session_state.documents_loaded:
+        if st.button("📋 Requirement Coverage", help="Match job requirements against CV evidence"):
+            with st.spinner("Matching requirements..."):
+                coverage_report = st.session_state.rag_crew.assess_requirement_coverage()
+            if coverage_report:
+                with st.expander("📋 Requirement Coverage", expanded=True):
+                    st.markdown(format_coverage_table(coverage_report))
+                    st.caption(f"Computed in {coverage_report['elapsed_ms']:.0f} ms")
+            else:
+                st.info("ℹ️ Upload both a CV and a job description to see requirement coverage")
+    
     # Document status
     if st.session_state.documents_loaded:
         st.success(f"📄 {st.session_state.document_count} document chunks loaded")
@@ -139,6 +329,26 @@ with st.sidebar:
             st.warning(f"⚠️ {st.session_state.out_of_context_count} out-of-context questions detected")
     else:
         st.info("📄 No documents loaded")
+    
+    # Search only the chunks of the selected documents, e.g. one candidate's CV and the job description
+    chat_filters = None
+    if st.session_state.documents_loaded:
+        source_names = sorted({os.path.basename(source) for source in st.session_state.rag_crew.list_sources()})
+        chat_sources = st.multiselect(
+            "🎯 Scope chat to documents",
+            source_names,
+            help="Leave empty to search all loaded documents"
+        )
+        if chat_sources:
+            chat_filters = {"source": chat_sources}
+    
+    # Service-wide metrics across all users of this server
+    if st.session_state.rag_crew:
+        service_metrics = st.session_state.rag_crew.metrics
+        with st.expander("📈 Service Metrics"):
+            st.write(f"**Questions served:** {service_metrics.questions.value()}")
+            for route in ["fast", "standard", "analytical", "out_of_context", "cached"]:
+                st.write(f"**Route {route}:** {service_metrics.routes.value(route=route)}")
 
 # Main chat interface
 st.divider()
@@ -164,6 +374,9 @@ with response_container:
                         st.markdown(f"**{agent}:**")
                         st.markdown(details)
                         st.divider()
+                    if message.get("trace"):
+                        st.markdown("**⏱️ Timing Waterfall:**")
+                        render_trace_waterfall(message["trace"])
             
             # Show document references
             if "metadata" in message:
@@ -171,7 +384,10 @@ with response_container:
                     for doc in message["metadata"]:
                         st.markdown(f"**Source:** {doc.get('source', 'Unknown')}")
                         st.markdown(f"**Page:** {doc.get('page', 'N/A')}")
-                        st.markdown(f"**Relevance:** {doc.get('relevance_score', 'N/A')}")
+                        relevance_score = doc.get('relevance_score', 'N/A')
+                        if isinstance(relevance_score, (int, float)):
+                            relevance_score = f"{relevance_score:.2f}"
+                        st.markdown(f"**Relevance:** {relevance_score}")
                         st.divider()
 
 # Input for new questions
@@ -194,7 +410,7 @@ with query_container:
                 with st.spinner("🤖 Processing with RAG crew..."):
                     try:
                         # Get relevant documents first
-                        relevant_docs = st.session_state.rag_crew.query_documents(prompt)
+                        relevant_docs = st.session_state.rag_crew.query_documents(prompt, filters=chat_filters)
                         
                         # Check if this is an out-of-context question
                         is_relevant, relevance_info = st.session_state.rag_crew.check_relevance(prompt, relevant_docs)
@@ -209,14 +425,18 @@ with query_container:
                                 st.write(f"**Retrieved {len(relevant_docs)} relevant document chunks**")
                                 st.write(f"**Relevance:** {relevance_info}")
                                 for i, doc in enumerate(relevant_docs[:3]):
-                                    st.markdown(f"**Chunk {i+1}:**")
+                                    st.markdown(f"**Chunk {i+1}** (similarity {doc.metadata.get('relevance_score', 0):.2f}):")
                                     st.markdown(doc.page_content[:200] + "...")
                                     st.divider()
                         
                         # Generate response using the improved RAG
-                        response = st.session_state.rag_crew.generate_response(prompt)
+                        details = st.session_state.rag_crew.generate_response(prompt, filters=chat_filters,
+                                                                              return_details=True)
+                        response = details["answer"]
                         
                         # Display response
+                        if details["partial"]:
+                            st.warning(f"⏱️ {details['partial']['message']}: showing the best answer so far")
                         st.markdown(response)
                         
                         # Add to chat history with metadata
@@ -241,6 +461,14 @@ with query_container:
                                 "Content Writer": "Synthesized information into a coherent response",
                                 "Quality Assurance": "Verified accuracy against source documents"
                             }
+                            message_data["trace"] = st.session_state.rag_crew.last_trace
+                            route = details["route_decision"]
+                            if route:
+                                message_data["agent_details"] = {
+                                    "Query Router": f"Route **{route['route']}** via {route['method']} "
+                                                    f"(confidence {route['confidence']:.2f})",
+                                    **message_data["agent_details"]
+                                }
                         
                         st.session_state.messages.append(message_data)
                         
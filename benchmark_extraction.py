@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction benchmark.
+
+Compares the installed extractors (see document_loaders.py) on a sample
+corpus: milliseconds per page when pages are extracted serially, with
+page-level parallelism, and when the parsed-text cache already holds them.
+The sample corpus is generated unless --corpus points at a directory of PDFs:
+
+    python benchmark_extraction.py --documents 4 --pages 60
+    python benchmark_extraction.py --corpus ./sample_pdfs --backends pypdf,pymupdf --workers 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmark_rag import VOCABULARY
+from document_loaders import DocumentLoader, available_extractors
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_sample_pdf(path, pages):
+    """Write a PDF with one page per list of text lines, using only the standard Helvetica font"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        commands = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_string(line)}) Tj T*" for line in lines) + " ET"
+        stream = commands.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >> >> >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+    return path
+
+
+def build_sample_corpus(directory, documents=4, pages=60, lines_per_page=60, seed=42):
+    """Write documents PDFs of pages pages each, filled with corpus vocabulary; returns the paths"""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(documents):
+        content = [[f"Document {index} page {page + 1}"] +
+                   [" ".join(rng.choices(VOCABULARY, k=12)) for _ in range(lines_per_page)]
+                   for page in range(pages)]
+        paths.append(write_sample_pdf(os.path.join(directory, f"sample_{index:03d}.pdf"), content))
+    return paths
+
+
+def run_backend(name, file_paths, workers, work_dir):
+    """Milliseconds per page for one extractor: serial, parallel and from the cache"""
+    cache_dir = os.path.join(work_dir, f"cache_{name}")
+    results = {}
+    for label, loader in (("serial", DocumentLoader(name, workers=1)),
+                          ("parallel", DocumentLoader(name, workers=workers, min_parallel_pages=1)),
+                          ("cold_cache", DocumentLoader(name, cache_dir=cache_dir, workers=1)),
+                          ("warm_cache", DocumentLoader(name, cache_dir=cache_dir, workers=1))):
+        start = time.perf_counter()
+        _, stats = loader.load(file_paths)
+        elapsed = time.perf_counter() - start
+        results[f"{label}_ms_per_page"] = round(elapsed * 1000 / max(stats["pdf_pages"], 1), 3)
+    results["pages"] = stats["pdf_pages"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extractors on a sample corpus")
+    parser.add_argument("--corpus", help="Directory of PDFs to use instead of the generated sample")
+    parser.add_argument("--documents", type=int, default=4, help="Generated sample documents")
+    parser.add_argument("--pages", type=int, default=60, help="Pages per generated document")
+    parser.add_argument("--backends", help="Comma-separated extractors (default: every installed one)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for parallel extraction")
+    parser.add_argument("--output", help="Optional path to write the results JSON")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="extraction_benchmark_")
+    try:
+        if args.corpus:
+            file_paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+        else:
+            file_paths = build_sample_corpus(work_dir, args.documents, args.pages)
+        backends = [b.strip() for b in args.backends.split(",")] if args.backends else available_extractors()
+        print(f"🧪 {len(file_paths)} PDFs, backends: {', '.join(backends) or 'none installed'}")
+
+        results = {}
+        for name in backends:
+            print(f"\n📊 {name}")
+            results[name] = run_backend(name, file_paths, args.workers, work_dir)
+            for metric, value in results[name].items():
+                print(f"   {metric}: {value}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if results:
+        fastest = min(results, key=lambda name: results[name]["serial_ms_per_page"])
+        print(f"\n✅ Fastest serial extractor: {fastest} ({results[fastest]['serial_ms_per_page']} ms/page)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for RAGCrew against a mock Ollama server.
+
+Measures ingestion throughput, retrieval latency (p50/p95), end-to-end answer
+latency, peak RSS and on-disk index size on synthetic corpora, and compares the results with a
+stored baseline so regressions show up. Each corpus size runs in a fresh interpreter so its
+peak RSS is its own rather than the largest scenario's so far:
+
+    python benchmark_rag.py --sizes 10,1000,10000
+    python benchmark_rag.py --sizes 1000 --save-baseline
+    python benchmark_rag.py --sizes 10000 --vector-backend mmap --baseline mmap_baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_ollama import MockOllamaServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Metrics where a larger value is better; everything else is a latency or size
+HIGHER_IS_BETTER = {"ingest_chunks_per_sec"}
+
+VOCABULARY = [
+    "onboarding", "compliance", "policy", "account", "customer", "verification", "training",
+    "module", "branch", "manager", "risk", "audit", "report", "deposit", "loan", "credit",
+    "payment", "fraud", "identity", "document", "review", "approval", "process", "system",
+    "python", "cloud", "engineer", "experience", "requirement", "candidate", "skills", "team",
+    "security", "access", "role", "department", "schedule", "benefits", "holiday", "salary"
+]
+
+
+def build_synthetic_corpus(num_chunks, directory, chunks_per_file=100, seed=42):
+    """Write text files holding roughly num_chunks chunk-sized paragraphs; returns the file paths"""
+    rng = random.Random(seed)
+    paths = []
+    for file_index in range(max(1, (num_chunks + chunks_per_file - 1) // chunks_per_file)):
+        paragraphs = []
+        for i in range(min(chunks_per_file, num_chunks - file_index * chunks_per_file)):
+            words = [f"topic{file_index}x{i}"] + rng.choices(VOCABULARY, k=120)
+            paragraphs.append(" ".join(words))
+        path = os.path.join(directory, f"synthetic_{file_index:05d}.txt")
+        with open(path, "w") as f:
+            f.write("\n\n".join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+def synthetic_queries(count, seed=7):
+    """Questions made of corpus vocabulary so retrieval has something to find"""
+    rng = random.Random(seed)
+    return [f"What does the {' '.join(rng.sample(VOCABULARY, 3))} policy say?" for _ in range(count)]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (the scenario's interpreter) in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def directory_size_mb(path):
+    """Total size of the files under path in MB"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+
+def run_scenario(num_chunks, base_url, retrieval_queries, e2e_queries, vector_backend="chroma", vector_dtype="int8"):
+    """Benchmark one corpus size and return its metrics"""
+    from rag_crew import RAGCrew
+
+    # Memory already held after importing rag_crew, so scenario_rss_mb is what the scenario itself added
+    startup_rss_mb = peak_rss_mb()
+    work_dir = tempfile.mkdtemp(prefix="rag_bench_")
+    try:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        file_paths = build_synthetic_corpus(num_chunks, corpus_dir)
+
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "chroma_db"),
+                           vector_backend=vector_backend, vector_dtype=vector_dtype)
+
+        start = time.perf_counter()
+        if not rag_crew.load_and_process_documents(file_paths, clear_existing=True):
+            raise RuntimeError("Ingestion failed")
+        ingest_seconds = time.perf_counter() - start
+        chunk_count = rag_crew.get_document_count()
+
+        retrieval_ms = []
+        for query in synthetic_queries(retrieval_queries):
+            start = time.perf_counter()
+            rag_crew.query_documents(query)
+            retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+        answer_ms = []
+        for query in synthetic_queries(e2e_queries, seed=11):
+            start = time.perf_counter()
+            rag_crew.generate_response(query)
+            answer_ms.append((time.perf_counter() - start) * 1000)
+
+        return {
+            "chunks": chunk_count,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_chunks_per_sec": round(chunk_count / ingest_seconds, 1) if ingest_seconds else 0.0,
+            "retrieval_p50_ms": round(percentile(retrieval_ms, 50), 2),
+            "retrieval_p95_ms": round(percentile(retrieval_ms, 95), 2),
+            "answer_p50_ms": round(percentile(answer_ms, 50), 2),
+            "answer_p95_ms": round(percentile(answer_ms, 95), 2),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "scenario_rss_mb": round(peak_rss_mb() - startup_rss_mb, 1),
+            "index_mb": round(directory_size_mb(os.path.join(work_dir, "chroma_db")), 2)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_scenario_process(num_chunks, base_url, args):
+    """Run one scenario in a fresh interpreter and return the metrics it printed as its last line"""
+    command = [sys.executable, os.path.abspath(__file__), "--scenario", str(num_chunks), "--base-url", base_url,
+               "--queries", str(args.queries), "--e2e-queries", str(args.e2e_queries),
+               "--vector-backend", args.vector_backend, "--vector-dtype", args.vector_dtype]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "scenario failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return human-readable regression messages for metrics worse than baseline by more than tolerance"""
+    regressions = []
+    for scenario, metrics in results.items():
+        expected = baseline.get(scenario)
+        if not expected:
+            continue
+        for name, value in metrics.items():
+            reference = expected.get(name)
+            if not reference or name == "chunks":
+                continue
+            if name in HIGHER_IS_BETTER:
+                regressed = value < reference * (1 - tolerance)
+            else:
+                regressed = value > reference * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{scenario} chunks: {name} {value} vs baseline {reference}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAGCrew benchmark with a mock Ollama server")
+    parser.add_argument("--sizes", default="10,1000,10000", help="Comma-separated corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=50, help="Retrieval queries per scenario")
+    parser.add_argument("--e2e-queries", type=int, default=5, help="End-to-end answers per scenario (0 to skip)")
+    parser.add_argument("--generate-latency", type=float, default=0.05, help="Mock seconds per generation request")
+    parser.add_argument("--embed-latency", type=float, default=0.001, help="Mock seconds per embedded text")
+    parser.add_argument("--vector-backend", default="chroma", choices=["chroma", "mmap"], help="RAGCrew vector store")
+    parser.add_argument("--vector-dtype", default="int8", choices=["int8", "float16", "float32"],
+                        help="Storage type for the mmap backend")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--output", help="Optional path to write the results JSON")
+    # Used by run_scenario_process: run one corpus size against a running mock and print its metrics
+    parser.add_argument("--scenario", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        metrics = run_scenario(args.scenario, args.base_url, args.queries, args.e2e_queries,
+                               args.vector_backend, args.vector_dtype)
+        print(json.dumps(metrics))
+        return 0
+
+    mock = MockOllamaServer(generate_latency=args.generate_latency, embed_latency=args.embed_latency)
+    base_url = mock.start()
+    # CrewAI/LiteLLM read these at call time; point them at the mock as well
+    os.environ["OPENAI_API_BASE"] = f"{base_url}/v1"
+    os.environ["OLLAMA_API_BASE"] = base_url
+    print(f"🧪 Mock Ollama running at {base_url}")
+
+    results = {}
+    try:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            print(f"\n📊 Benchmarking {size} chunks...")
+            results[str(size)] = run_scenario_process(size, base_url, args)
+            for name, value in results[str(size)].items():
+                print(f"   {name}: {value}")
+    finally:
+        mock.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️ No baseline found; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Regressions against baseline:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for rag_crew.
+
+Each measurement runs in a fresh interpreter so module caches do not hide
+import cost. Reports the median time to import rag_crew, to construct a
+RAGCrew, and to build its first agent (which is when CrewAI gets imported),
+plus the slowest modules from ``python -X importtime``:
+
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --save-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "benchmark_startup_baseline.json")
+
+# Each snippet prints the milliseconds it measured as its last line
+SNIPPETS = {
+    "import_ms": """
+import time
+start = time.perf_counter()
+import rag_crew
+print((time.perf_counter() - start) * 1000)
+""",
+    "construct_ms": """
+import time
+import rag_crew
+start = time.perf_counter()
+rag_crew.RAGCrew(persist_directory="./benchmark_startup_db")
+print((time.perf_counter() - start) * 1000)
+""",
+    "first_agent_ms": """
+import time
+import rag_crew
+rag = rag_crew.RAGCrew(persist_directory="./benchmark_startup_db")
+start = time.perf_counter()
+rag.researcher
+print((time.perf_counter() - start) * 1000)
+"""
+}
+
+# Heavy dependencies that should not be loaded by `import rag_crew`
+HEAVY_MODULES = ("crewai", "langchain", "langchain_community", "langchain_core", "langchain_ollama", "chromadb")
+
+
+def run_snippet(code):
+    """Run code in a fresh interpreter and return the milliseconds it printed"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "snippet failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def heavy_modules_on_import():
+    """Heavy dependencies that `import rag_crew` loads eagerly (should be empty)"""
+    code = "import sys, rag_crew; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def slowest_imports(top=10):
+    """Modules with the largest cumulative import time (including what they import), from python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import rag_crew"],
+                            cwd=HERE, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rag_crew import and construction time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    metrics = {}
+    for name, code in SNIPPETS.items():
+        samples = []
+        try:
+            for _ in range(args.runs):
+                samples.append(run_snippet(code))
+        except RuntimeError as e:
+            print(f"⚠️ {name} skipped: {e}")
+            continue
+        metrics[name] = round(statistics.median(samples), 1)
+        print(f"⏱️ {name}: {metrics[name]} ms (median of {args.runs})")
+
+    heavy = heavy_modules_on_import()
+    if heavy:
+        print(f"❌ import rag_crew loads heavy modules eagerly: {', '.join(heavy)}")
+    else:
+        print("✅ import rag_crew loads no heavy dependencies")
+
+    print("\n🐢 Slowest imports:")
+    for milliseconds, module in slowest_imports():
+        print(f"   {milliseconds:8.1f} ms  {module}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"startup": metrics}, f, indent=2)
+        print(f"\n✅ Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️ No baseline found; run with --save-baseline to create one")
+        return 1 if heavy else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, value in metrics.items():
+        reference = baseline.get("startup", {}).get(name)
+        if reference and value > reference * (1 + args.tolerance):
+            regressions.append(f"{name} {value} ms vs baseline {reference} ms")
+    if regressions or heavy:
+        print("\n❌ Regressions against baseline:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
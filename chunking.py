@@ -0,0 +1,147 @@
+# chunking.py
+"""
+Chunking profiles per document type.
+
+CVs and job descriptions are split at section headings and blank-line
+blocks, so a job entry or a requirements list stays in one chunk and every
+chunk starts with its section heading. PDFs keep each page whole when it
+fits. Everything else uses recursive character splitting. Each profile sets
+its own chunk size and overlap; overlaps are smaller than a flat 20% because
+section and page boundaries already keep related text together.
+"""
+
+from requirement_matcher import heading_of
+import bisect
+
+CHUNKING_PROFILES = {
+    "cv": {"strategy": "sections", "chunk_size": 1200, "chunk_overlap": 0, "min_chunk_size": 300},
+    "job_description": {"strategy": "sections", "chunk_size": 1200, "chunk_overlap": 0, "min_chunk_size": 300},
+    "pdf": {"strategy": "pages", "chunk_size": 1500, "chunk_overlap": 100},
+    "default": {"strategy": "recursive", "chunk_size": 1000, "chunk_overlap": 100}
+}
+
+
+def profile_name_for(doc_type, is_pdf=False):
+    """Name of the chunking profile for a document type"""
+    if doc_type in ("cv", "job_description"):
+        return doc_type
+    return "pdf" if is_pdf else "default"
+
+
+def _recursive_split(text, chunk_size, chunk_overlap):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text(text)
+
+
+def _blocks(text):
+    """(offset, block text, heading) for each blank-line separated block, tagged with its section heading"""
+    blocks = []
+    heading = None
+    lines, start, offset = [], 0, 0
+    for line in text.splitlines(keepends=True):
+        line_heading = heading_of(line)
+        if line_heading is not None or not line.strip():
+            if lines:
+                blocks.append((start, "".join(lines).strip(), heading))
+                lines = []
+            if line_heading is not None:
+                heading = line.strip()
+        else:
+            if not lines:
+                start = offset
+            lines.append(line)
+        offset += len(line)
+    if lines:
+        blocks.append((start, "".join(lines).strip(), heading))
+    return blocks
+
+
+def split_sections(text, chunk_size=1200, chunk_overlap=0, min_chunk_size=300):
+    """Pack whole blocks into chunks that start at a section heading.
+
+    Returns (offset, chunk text, heading) tuples. A section only shares a
+    chunk with the previous one when that chunk is still shorter than
+    min_chunk_size. Blocks longer than a chunk are split recursively; with
+    chunk_overlap, a short trailing block is repeated at the start of the
+    next chunk of the same section.
+    """
+    chunks = []
+    current, current_start, chunk_heading, section = [], 0, None, None
+
+    def with_heading(heading, body):
+        return f"{heading}\n{body}" if heading else body
+
+    def flush():
+        if current:
+            chunks.append((current_start, with_heading(chunk_heading, "\n\n".join(current)), chunk_heading))
+
+    for offset, block, heading in _blocks(text):
+        if heading != section:
+            if current and len(with_heading(chunk_heading, "\n\n".join(current))) < min_chunk_size:
+                current.append(heading)  # tiny sections share a chunk, keeping their heading inline
+            else:
+                flush()
+                current, chunk_heading = [], heading
+            section = heading
+        prefix = len(chunk_heading) + 1 if chunk_heading else 0
+        if len(heading or "") + 1 + len(block) > chunk_size:
+            # An oversized block becomes several chunks of its own
+            flush()
+            for piece in _recursive_split(block, chunk_size - len(heading or "") - 1, chunk_overlap):
+                chunks.append((offset, with_heading(heading, piece), heading))
+            current, chunk_heading = [], heading
+            continue
+        if current and prefix + len("\n\n".join(current + [block])) > chunk_size:
+            flush()
+            current = current[-1:] if chunk_overlap and len(current[-1]) <= chunk_overlap else []
+            chunk_heading = section
+        if not current:
+            current_start = offset
+        current.append(block)
+    flush()
+    return chunks
+
+
+def chunk_source(documents, doc_type, profiles=None, is_pdf=False):
+    """Split one source's loaded Documents (one per PDF page) into chunk Documents.
+
+    Returns (chunks, profile name). Chunks keep the metadata of the page they
+    start on and gain doc_type and, for section profiles, section.
+    """
+    from langchain_core.documents import Document
+
+    name = profile_name_for(doc_type, is_pdf)
+    profile = (profiles or CHUNKING_PROFILES)[name]
+    chunk_size, chunk_overlap = profile["chunk_size"], profile["chunk_overlap"]
+    chunks = []
+
+    if profile["strategy"] == "sections":
+        # Sections may run across pages, so split the whole text and map offsets back to pages
+        page_starts, position = [], 0
+        for document in documents:
+            page_starts.append(position)
+            position += len(document.page_content) + 1
+        full_text = "\n".join(document.page_content for document in documents)
+        sections = split_sections(full_text, chunk_size, chunk_overlap, profile.get("min_chunk_size", 0))
+        for offset, text, heading in sections:
+            page = documents[max(0, bisect.bisect_right(page_starts, offset) - 1)]
+            metadata = dict(page.metadata)
+            if heading:
+                metadata["section"] = heading.rstrip(":").strip().lower()
+            chunks.append(Document(page_content=text, metadata=metadata))
+    else:
+        for document in documents:
+            text = document.page_content
+            if not text.strip():
+                continue
+            if profile["strategy"] == "pages" and len(text) <= chunk_size:
+                pieces = [text.strip()]
+            else:
+                pieces = _recursive_split(text, chunk_size, chunk_overlap)
+            chunks.extend(Document(page_content=piece, metadata=dict(document.metadata)) for piece in pieces)
+
+    for chunk in chunks:
+        chunk.metadata["doc_type"] = doc_type
+    return chunks, name
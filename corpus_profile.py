@@ -0,0 +1,189 @@
+# corpus_profile.py
+"""
+A short profile of every loaded source, built at ingestion time.
+
+For each source it keeps a title, its section headings, the most distinctive
+terms, the names that occur most often (companies, tools, places) and a
+summary of its opening sentences. Out-of-context replies are rendered from
+the profile by template, so telling a user that the documents do not cover
+a question, and what they do cover, needs no LLM call. The profile is a
+plain dict and travels in index snapshots.
+"""
+
+from lexical_index import tokenize
+from requirement_matcher import BULLET_PATTERN, heading_of
+from collections import Counter
+import math
+import os
+import re
+
+# Frequent English words that never make useful topics
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been before being below between both but by
+can could did do does doing down during each etc few for from further had has have having he her here hers
+him his how i if in into is it its itself just may me more most must my no nor not now of off on once only
+or other our ours out over own per same she should so some such than that the their theirs them then there
+these they this those through to too under until up upon very via was we were what when where which while
+who whom why will with within would you your yours years year using use used work working team new well
+including include includes strong good ability able
+""".split())
+
+# Capitalised names (one or more words) and acronyms such as "AWS" or "Node.js"
+NAME_PATTERN = re.compile(r"\b[A-Z][A-Za-z0-9+#&.]*[A-Za-z0-9+#](?:\s+(?:of\s+)?[A-Z][A-Za-z0-9+#&.]*[A-Za-z0-9+#])*")
+
+DOC_TYPE_LABELS = {"cv": "CV", "job_description": "job description"}
+
+SUMMARY_CHARS = 240
+
+
+def shorten(text, limit):
+    """Cut text at a word boundary so it fits in limit characters"""
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",;:-") + "…"
+
+
+def _title(lines, source):
+    """First short line that is not a section label, else the file name"""
+    for line in lines[:5]:
+        if len(line) <= 80 and not line.endswith(":"):
+            return line.title() if line.isupper() else line
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def _names(lines):
+    """Capitalised names in order of frequency, skipping sentence starts and field labels"""
+    counts = Counter()
+    for line in lines:
+        if heading_of(line) is not None:
+            continue
+        for match in NAME_PATTERN.finditer(line):
+            name = match.group(0).rstrip(".")
+            before = line[:match.start()].rstrip()
+            sentence_start = not before or before.endswith((".", "!", "?", ":"))
+            single_word = " " not in name
+            if line[match.end():].startswith(":"):
+                continue  # "Email:", "Programming Languages:"
+            if single_word and name.lower() in STOPWORDS:
+                continue
+            if single_word and sentence_start and not any(c.isupper() for c in name[1:]):
+                continue  # an ordinary capitalised first word
+            counts[name] += 1
+    return [name for name, _ in counts.most_common()]
+
+
+def _summary(lines):
+    """Opening sentences of the prose in a source, up to SUMMARY_CHARS"""
+    prose = [line for line in lines if len(line.split()) >= 6 and heading_of(line) is None]
+    sentences = re.split(r"(?<=[.!?])\s+", " ".join(prose or lines))
+    summary = ""
+    for sentence in sentences:
+        if summary and len(summary) + len(sentence) + 1 > SUMMARY_CHARS:
+            break
+        summary = f"{summary} {sentence}".strip()
+    return shorten(summary, SUMMARY_CHARS)
+
+
+class CorpusProfile:
+    """Title, sections, topics, names and summary of each loaded source"""
+
+    def __init__(self, max_topics=8, max_entities=8):
+        self.max_topics = max_topics
+        self.max_entities = max_entities
+        self.sources = {}  # source path -> profile dict
+
+    def add(self, source, text, doc_type="other", lexical_index=None, upload_batch=None):
+        """Profile one source; lexical_index supplies corpus statistics for picking distinctive terms"""
+        lines = [BULLET_PATTERN.sub("", line).strip() for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        sections = []
+        for line in lines[1:]:
+            heading = heading_of(line)
+            if heading and heading not in sections:
+                sections.append(heading)
+
+        counts = Counter(term for term in tokenize(text)
+                         if len(term) > 2 and term not in STOPWORDS and not term[0].isdigit())
+        if lexical_index is not None and lexical_index.chunks:
+            def weight(term):
+                idf = math.log((lexical_index.chunks + 1) / (lexical_index.chunk_frequency.get(term, 0) + 1)) + 1
+                return counts[term] * idf
+        else:
+            def weight(term):
+                return counts[term]
+        topics = sorted(counts, key=lambda term: (-weight(term), term))[:self.max_topics]
+
+        profile = {
+            "title": _title(lines, source),
+            "doc_type": doc_type,
+            "upload_batch": upload_batch,
+            "sections": sections,
+            "topics": topics,
+            "entities": _names(lines)[:self.max_entities],
+            "summary": _summary(lines),
+            "characters": len(text)
+        }
+        self.sources[source] = profile
+        return profile
+
+    def remove(self, source):
+        self.sources.pop(source, None)
+
+    def merge(self, other):
+        """Take over the profiles of another CorpusProfile, e.g. from a snapshot"""
+        self.sources.update(other.sources)
+
+    def to_dict(self):
+        return {"sources": self.sources}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls()
+        profile.sources = {source: dict(entry) for source, entry in data.get("sources", {}).items()}
+        return profile
+
+    def describe(self, max_sources=10):
+        """One line per source: title, type, file name, summary and topics"""
+        lines = []
+        for source, entry in sorted(self.sources.items())[:max_sources]:
+            label = DOC_TYPE_LABELS.get(entry["doc_type"], "document")
+            covers = ", ".join(entry["sections"][:6] or entry["topics"][:6])
+            line = f"- **{entry['title']}** ({label}, `{os.path.basename(source)}`)"
+            if entry["summary"]:
+                line += f": {entry['summary']}"
+            if covers:
+                line += f" Covers: {covers}."
+            if entry["entities"]:
+                line += f" Mentions: {', '.join(entry['entities'][:5])}."
+            lines.append(line)
+        if len(self.sources) > max_sources:
+            lines.append(f"- …and {len(self.sources) - max_sources} more documents")
+        return "\n".join(lines)
+
+    def suggestions(self, limit=3):
+        """Example questions the loaded documents can answer"""
+        questions = []
+        for source, entry in sorted(self.sources.items()):
+            if entry["doc_type"] == "cv":
+                questions.append("What is the candidate's work experience?")
+            elif entry["doc_type"] == "job_description":
+                questions.append(f"What are the requirements for {entry['title']}?")
+            elif entry["topics"]:
+                questions.append(f"What does {entry['title']} say about {entry['topics'][0]}?")
+        if any(entry["doc_type"] == "cv" for entry in self.sources.values()) and \
+                any(entry["doc_type"] == "job_description" for entry in self.sources.values()):
+            questions.insert(0, "How well does the candidate match the job requirements?")
+        return list(dict.fromkeys(questions))[:limit]
+
+    def out_of_context_reply(self, query, missing_info=None):
+        """Explain that the documents do not answer query and what they cover instead"""
+        parts = [f"I couldn't find information about \"{query}\" in the uploaded documents."]
+        if missing_info:
+            parts.append(f"_{missing_info.strip()}_")
+        if self.sources:
+            parts.append(f"**What the documents cover:**\n{self.describe()}")
+            suggestions = "\n".join(f"- \"{question}\"" for question in self.suggestions())
+            if suggestions:
+                parts.append(f"**You could ask, for example:**\n{suggestions}")
+        parts.append("If you need this information, upload a document that contains it and ask again.")
+        return "\n\n".join(parts)
@@ -0,0 +1,367 @@
+# document_loaders.py
+"""
+Text extraction for ingestion, with a parsed-text cache.
+
+PDFs go through a pluggable extractor. An extractor is any object with a
+name, available(), page_count(source) and extract(source, start, end)
+returning the texts of pages start..end-1; register_extractor() adds one.
+source is a path, or a memoryview when the extractor sets reads_memory. The built-in
+backends are PyMuPDF, pypdfium2 and poppler's pdftotext, which are fast C
+libraries/tools, and pypdf (what LangChain's PyPDFLoader uses), which is pure
+Python. "auto" picks the first of them that is installed. Large PDFs are cut
+into page ranges that are extracted in parallel worker processes.
+
+Extracted pages are cached on disk keyed by the SHA-256 of the file and the
+extractor name, so a PDF that was parsed before (under any path) is not
+parsed again. Text files are read directly.
+
+Files already in memory (uploads) are parsed from a memoryview over their
+bytes. Only extractors that need a path, and PDFs large enough to be split
+over worker processes, get the bytes spooled to a temporary directory that
+is removed when loading ends; the bytes copied that way are reported.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import hashlib
+import importlib.util
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+EXTRACTOR_PREFERENCE = ["pymupdf", "pypdfium2", "pdftotext", "pypdf"]
+HASH_BLOCK_BYTES = 1 << 20
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview; each read copies only what it asks for"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._buffer[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def open_buffer(data, stack):
+    """(memoryview over data, bytes copied to make it); data is bytes-like or a binary file object.
+
+    BytesIO and Streamlit uploads expose their buffer and regular files are
+    memory-mapped, so neither is copied; other file objects are read once.
+    Views and maps are released when stack closes.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return memoryview(data).cast("B"), 0
+    if hasattr(data, "getbuffer"):
+        view = data.getbuffer()
+        stack.callback(view.release)
+        return view, 0
+    # A real file (a path or descriptor name; in-memory spooled files have neither) can be mapped
+    if isinstance(getattr(data, "name", None), (str, int)):
+        try:
+            mapped = stack.enter_context(mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ))
+            view = memoryview(mapped)
+            stack.callback(view.release)
+            return view, 0
+        except (OSError, ValueError, io.UnsupportedOperation):
+            pass  # empty files cannot be mapped, and some file objects have no descriptor
+    content = data.read()
+    return memoryview(content), len(content)
+
+
+class PyPDFExtractor:
+    """pypdf, the pure-Python parser behind PyPDFLoader"""
+    name = "pypdf"
+    reads_memory = True
+
+    def available(self):
+        return importlib.util.find_spec("pypdf") is not None
+
+    def _reader(self, source):
+        from pypdf import PdfReader
+        return PdfReader(source if isinstance(source, str) else BufferReader(source))
+
+    def page_count(self, source):
+        return len(self._reader(source).pages)
+
+    def extract(self, source, start, end):
+        reader = self._reader(source)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class PyMuPDFExtractor:
+    """PyMuPDF (pip install pymupdf)"""
+    name = "pymupdf"
+    reads_memory = True
+
+    def available(self):
+        return importlib.util.find_spec("pymupdf") is not None
+
+    def _open(self, source):
+        import pymupdf
+        return pymupdf.open(source) if isinstance(source, str) else pymupdf.open(stream=source, filetype="pdf")
+
+    def page_count(self, source):
+        with self._open(source) as document:
+            return document.page_count
+
+    def extract(self, source, start, end):
+        with self._open(source) as document:
+            return [document[i].get_text() for i in range(start, end)]
+
+
+class PdfiumExtractor:
+    """pypdfium2, Google's PDFium (pip install pypdfium2)"""
+    name = "pypdfium2"
+    reads_memory = True
+
+    def available(self):
+        return importlib.util.find_spec("pypdfium2") is not None
+
+    def _open(self, source):
+        import pypdfium2
+        return pypdfium2.PdfDocument(source if isinstance(source, str) else BufferReader(source))
+
+    def page_count(self, source):
+        document = self._open(source)
+        try:
+            return len(document)
+        finally:
+            document.close()
+
+    def extract(self, source, start, end):
+        document = self._open(source)
+        try:
+            return [document[i].get_textpage().get_text_range() for i in range(start, end)]
+        finally:
+            document.close()
+
+
+class PdftotextExtractor:
+    """poppler's pdftotext and pdfinfo command-line tools"""
+    name = "pdftotext"
+    reads_memory = False
+
+    def available(self):
+        return shutil.which("pdftotext") is not None and shutil.which("pdfinfo") is not None
+
+    def page_count(self, path):
+        output = subprocess.run(["pdfinfo", path], capture_output=True, text=True, check=True).stdout
+        for line in output.splitlines():
+            if line.startswith("Pages:"):
+                return int(line.split()[1])
+        return 0
+
+    def extract(self, path, start, end):
+        output = subprocess.run(["pdftotext", "-layout", "-f", str(start + 1), "-l", str(end), path, "-"],
+                                capture_output=True, text=True, check=True).stdout
+        # Pages are separated by form feeds, and the last one is followed by one
+        return (output.split("\f") + [""] * (end - start))[:end - start]
+
+
+EXTRACTORS = {}
+
+
+def register_extractor(extractor):
+    """Make an extractor selectable by its name"""
+    EXTRACTORS[extractor.name] = extractor
+
+
+for _extractor in (PyMuPDFExtractor(), PdfiumExtractor(), PdftotextExtractor(), PyPDFExtractor()):
+    register_extractor(_extractor)
+
+
+def available_extractors():
+    """Names of the registered extractors that can run here, preferred ones first"""
+    names = EXTRACTOR_PREFERENCE + [name for name in EXTRACTORS if name not in EXTRACTOR_PREFERENCE]
+    return [name for name in names if name in EXTRACTORS and EXTRACTORS[name].available()]
+
+
+def get_extractor(name="auto"):
+    """The extractor called name, or for "auto" the fastest one installed"""
+    if name == "auto":
+        names = available_extractors()
+        if not names:
+            raise RuntimeError("No PDF extractor is installed; pip install pypdf (or pymupdf for speed)")
+        return EXTRACTORS[names[0]]
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor {name}; use 'auto' or one of {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]
+
+
+def file_sha256(path, buffer=None):
+    """SHA-256 of a file, or of buffer when its bytes are already in memory"""
+    if buffer is not None:
+        return hashlib.sha256(buffer).hexdigest()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedTextCache:
+    """Per-page text and metadata of parsed files, one JSON file per (file hash, extractor)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Cached pages [{"text", "metadata"}] for key, or None"""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, pages, extractor):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"extractor": extractor, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                       "pages": pages}, f)
+        os.replace(temp_path, path)  # readers never see a half-written entry
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DocumentLoader:
+    """Loads files into LangChain Documents: one per PDF page, one per text file.
+
+    extractor is a registered extractor name or "auto". PDFs with at least
+    min_parallel_pages pages are split into page ranges extracted by up to
+    workers processes (default: CPU count, at most 4). cache_dir enables
+    the parsed-text cache.
+    """
+
+    def __init__(self, extractor="auto", cache_dir=None, workers=None, min_parallel_pages=32):
+        if extractor != "auto":
+            get_extractor(extractor)  # unknown names fail here rather than at the first PDF
+        self.extractor_name = extractor
+        self.cache = ParsedTextCache(cache_dir) if cache_dir else None
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.min_parallel_pages = min_parallel_pages
+
+    def load(self, file_paths, contents=None):
+        """([(path, Documents)], stats) for file_paths, in order.
+
+        contents maps some of the paths (for uploads, just file names) to their
+        data, bytes-like or a binary file object; those are parsed from memory.
+        """
+        from langchain_core.documents import Document
+
+        start = time.perf_counter()
+        stats = {"extractor": None, "pdf_pages": 0, "cache_hits": 0, "cache_misses": 0, "parallel_files": 0,
+                 "bytes_in_memory": 0, "bytes_copied": 0, "spooled_files": 0}
+        with ExitStack() as stack:
+            buffers, spool_dir = {}, []
+            for path, data in (contents or {}).items():
+                buffers[path], copied = open_buffer(data, stack)
+                stats["bytes_in_memory"] += buffers[path].nbytes
+                stats["bytes_copied"] += copied
+
+            def spool(path, buffer):
+                """Write an in-memory file to a temporary directory that is removed when loading ends"""
+                if not spool_dir:
+                    spool_dir.append(stack.enter_context(tempfile.TemporaryDirectory(prefix="onboardiq_spool_")))
+                spooled = os.path.join(spool_dir[0], f"{stats['spooled_files']}_{os.path.basename(path)}")
+                with open(spooled, "wb") as f:
+                    f.write(buffer)
+                stats["spooled_files"] += 1
+                stats["bytes_copied"] += buffer.nbytes
+                return spooled
+
+            pages_by_path, pending = {}, []
+            for path in file_paths:
+                if not path.lower().endswith(".pdf"):
+                    continue
+                extractor = get_extractor(self.extractor_name)
+                stats["extractor"] = extractor.name
+                key = f"{file_sha256(path, buffers.get(path))}-{extractor.name}" if self.cache else None
+                cached = self.cache.get(key) if self.cache else None
+                if cached is not None:
+                    pages_by_path[path] = cached
+                    stats["cache_hits"] += 1
+                else:
+                    pending.append((path, buffers.get(path, path), extractor, key))
+                    stats["cache_misses"] += self.cache is not None
+            if pending:
+                pages_by_path.update(self._extract(pending, stats, spool))
+
+            loaded = []
+            for path in file_paths:
+                if path in pages_by_path:
+                    documents = [Document(page_content=page["text"], metadata=dict(page["metadata"], source=path))
+                                 for page in pages_by_path[path]]
+                    stats["pdf_pages"] += len(documents)
+                elif path in buffers:
+                    documents = [Document(page_content=str(buffers[path], "utf-8"), metadata={"source": path})]
+                else:
+                    with open(path, encoding="utf-8") as f:
+                        documents = [Document(page_content=f.read(), metadata={"source": path})]
+                loaded.append((path, documents))
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return loaded, stats
+
+    def _extract(self, pending, stats, spool):
+        """Extract uncached PDFs; page ranges of large ones go to a process pool shared by the batch"""
+        ranges, pool = {}, None
+        try:
+            for path, source, extractor, key in pending:
+                if not isinstance(source, str) and not getattr(extractor, "reads_memory", False):
+                    source = spool(path, source)
+                count = extractor.page_count(source)
+                if self.workers > 1 and count >= self.min_parallel_pages:
+                    # Workers open the file themselves, so an in-memory PDF is written out once, not sent to each
+                    if not isinstance(source, str):
+                        source = spool(path, source)
+                    if pool is None:
+                        pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+                    step = -(-count // self.workers)
+                    ranges[path] = [pool.submit(extractor.extract, source, begin, min(begin + step, count))
+                                    for begin in range(0, count, step)]
+                    stats["parallel_files"] += 1
+                else:
+                    ranges[path] = [extractor.extract(source, 0, count)]
+            pages_by_path = {}
+            for path, _, extractor, key in pending:
+                texts = [text for part in ranges[path] for text in (part if isinstance(part, list) else part.result())]
+                pages = [{"text": text, "metadata": {"page": page, "total_pages": len(texts)}}
+                         for page, text in enumerate(texts)]
+                if self.cache:
+                    self.cache.put(key, pages, extractor.name)
+                pages_by_path[path] = pages
+            return pages_by_path
+        finally:
+            if pool is not None:
+                pool.shutdown()
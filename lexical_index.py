@@ -0,0 +1,62 @@
+# lexical_index.py
+"""
+Corpus-wide term statistics for the loaded chunks.
+
+Keeps the number of chunks each term occurs in, so relevance checks can tell
+whether a query term appears anywhere in the corpus. The index is small,
+serialises to a plain dict and travels in index snapshots so replicas do not
+have to rebuild it.
+"""
+
+from collections import Counter
+import re
+
+# Words plus the punctuation that matters in skills (c++, c#, node.js)
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+
+
+def tokenize(text):
+    """Lower-cased terms of a text"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """Chunk frequency of every term in the corpus"""
+
+    def __init__(self):
+        self.chunk_frequency = Counter()
+        self.chunks = 0
+        self.total_terms = 0
+
+    def add(self, texts):
+        for text in texts:
+            terms = tokenize(text)
+            self.chunk_frequency.update(set(terms))
+            self.chunks += 1
+            self.total_terms += len(terms)
+
+    def contains(self, term):
+        """True if every token of term occurs somewhere in the corpus"""
+        tokens = tokenize(term)
+        return bool(tokens) and all(token in self.chunk_frequency for token in tokens)
+
+    def merge(self, other):
+        """Add the statistics of another index built over different chunks"""
+        self.chunk_frequency.update(other.chunk_frequency)
+        self.chunks += other.chunks
+        self.total_terms += other.total_terms
+
+    def to_dict(self):
+        return {
+            "chunks": self.chunks,
+            "total_terms": self.total_terms,
+            "chunk_frequency": dict(self.chunk_frequency)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.chunks = data.get("chunks", 0)
+        index.total_terms = data.get("total_terms", 0)
+        index.chunk_frequency = Counter(data.get("chunk_frequency", {}))
+        return index
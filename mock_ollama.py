@@ -0,0 +1,306 @@
+# mock_ollama.py
+"""
+Local stand-in for the Ollama HTTP API, used by benchmarks and offline tests.
+
+Implements the generate, chat, embed/embeddings, tags and OpenAI-compatible
+chat completion endpoints with configurable latency. Embeddings are
+deterministic feature-hashed bag-of-words vectors, so texts sharing words
+get similar vectors and retrieval behaves plausibly without a real model.
+Models are "loaded" on first use and unloaded after keep_alive, and only the
+part of a prompt that differs from the model's previous prompt is counted in
+prompt_eval_count, like Ollama's prompt cache.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+DEFAULT_RESPONSE = "Based on the provided documents, here is a concise answer to the question."
+
+
+def deterministic_embedding(text, dim=384):
+    """Feature-hash the words of text into a unit vector of length dim"""
+    vector = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+def _keep_alive_seconds(value, default=300.0):
+    """Ollama keep_alive (seconds, or a duration such as "30m"; negative keeps forever) in seconds"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str) and value[-1] in "smh":
+        seconds = float(value[:-1]) * {"s": 1, "m": 60, "h": 3600}[value[-1]]
+    else:
+        seconds = float(value)
+    return math.inf if seconds < 0 else seconds
+
+
+def _count_tokens(text):
+    """Rough token count (words and punctuation) used for the eval counters"""
+    return len(re.findall(r"\w+|[^\w\s]", text or ""))
+
+
+class MockOllamaServer:
+    """Threaded HTTP server mimicking Ollama's API.
+
+    generate_latency is a fixed delay per generation request, token_latency a
+    delay per generated token (applied while streaming) and embed_latency a
+    delay per embedded text.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, generate_latency=0.05, token_latency=0.0,
+                 embed_latency=0.002, embedding_dim=384, response_text=DEFAULT_RESPONSE,
+                 models=("llama3.2:latest",), load_latency=0.0):
+        self.host = host
+        self.port = port
+        self.generate_latency = generate_latency
+        self.token_latency = token_latency
+        self.embed_latency = embed_latency
+        self.embedding_dim = embedding_dim
+        self.response_text = response_text
+        self.models = list(models)
+        self.request_counts = {}
+        self.embedded_by_model = {}  # texts embedded per requested model
+        self.generated_by_model = {}  # generation requests per requested model
+        self.load_latency = load_latency
+        self.loads = {}  # cold loads per model
+        self._loaded = {}  # model -> time it is unloaded
+        self._last_prompt = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Start serving in a background thread and return the base URL"""
+        handler = _make_handler(self)
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Shut the server down"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _track(self, path, delta):
+        with self._lock:
+            if delta > 0:
+                self.request_counts[path] = self.request_counts.get(path, 0) + 1
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def load(self, model, keep_alive=None):
+        """Load model unless it is still in memory; returns the load time in seconds"""
+        now = time.monotonic()
+        with self._lock:
+            cold = self._loaded.get(model, 0.0) <= now
+            if cold:
+                self.loads[model] = self.loads.get(model, 0) + 1
+            self._loaded[model] = now + _keep_alive_seconds(keep_alive)
+        if not cold:
+            return 0.0
+        time.sleep(self.load_latency)
+        return self.load_latency
+
+    def cached_prefix(self, model, prompt):
+        """Characters of prompt shared with the model's previous prompt"""
+        with self._lock:
+            previous = self._last_prompt.get(model, "")
+            self._last_prompt[model] = prompt
+        return len(os.path.commonprefix([previous, prompt]))
+
+    def embed(self, texts, model=None, keep_alive=None):
+        """Return deterministic embeddings for texts after the configured delay"""
+        self.load(model, keep_alive)
+        with self._lock:
+            self.embedded_by_model[model] = self.embedded_by_model.get(model, 0) + len(texts)
+        if self.embed_latency:
+            time.sleep(self.embed_latency * len(texts))
+        return [deterministic_embedding(text, self.embedding_dim) for text in texts]
+
+    def generation_stats(self, prompt, completion, elapsed, load_seconds=0.0, cached_chars=0):
+        """Ollama-style timing and token counters (durations in nanoseconds)"""
+        return {
+            "total_duration": int(elapsed * 1e9),
+            "load_duration": int(load_seconds * 1e9),
+            "prompt_eval_count": _count_tokens(prompt[cached_chars:]),
+            "prompt_eval_duration": int(self.generate_latency * 1e9),
+            "eval_count": _count_tokens(completion),
+            "eval_duration": int(max(elapsed - self.generate_latency, 0) * 1e9),
+        }
+
+
+def _make_handler(server):
+    """Build a request handler class bound to a MockOllamaServer instance"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # keep benchmark output clean
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            server._track(self.path, 1)
+            try:
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": name, "model": name} for name in server.models]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-mock"})
+                elif self.path in ("/", "/api/ps"):
+                    self._send_json({"models": []} if self.path == "/api/ps" else {"status": "Ollama is running"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+            finally:
+                server._track(self.path, -1)
+
+        def do_POST(self):
+            server._track(self.path, 1)
+            try:
+                payload = self._read_json()
+                if self.path == "/api/embed":
+                    inputs = payload.get("input", [])
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._send_json({"model": payload.get("model"), "embeddings": server.embed(inputs, payload.get("model"), payload.get("keep_alive"))})
+                elif self.path == "/api/embeddings":
+                    self._send_json({"embedding": server.embed([payload.get("prompt", "")], payload.get("model"), payload.get("keep_alive"))[0]})
+                elif self.path == "/api/generate":
+                    self._generate(payload, payload.get("prompt", ""), chat=False)
+                elif self.path == "/api/chat":
+                    prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+                    self._generate(payload, prompt, chat=True)
+                elif self.path == "/v1/chat/completions":
+                    self._openai_completion(payload)
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+            finally:
+                server._track(self.path, -1)
+
+        def _generate(self, payload, prompt, chat):
+            start = time.perf_counter()
+            model = payload.get("model", server.models[0])
+            load_seconds = server.load(model, payload.get("keep_alive"))
+            if not prompt and not chat:
+                # An empty prompt only loads the model, as Ollama does for preloading
+                self._send_json({"model": model, "response": "", "done": True, "done_reason": "load",
+                                 "load_duration": int(load_seconds * 1e9)})
+                return
+            cached_chars = server.cached_prefix(model, prompt)
+            time.sleep(server.generate_latency)
+            words = server.response_text.split(" ")
+            with server._lock:
+                server.generated_by_model[model] = server.generated_by_model.get(model, 0) + 1
+
+            def chunk(text, done):
+                body = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+                if chat:
+                    body["message"] = {"role": "assistant", "content": text}
+                else:
+                    body["response"] = text
+                if done:
+                    body["done_reason"] = "stop"
+                    body.update(server.generation_stats(prompt, server.response_text, time.perf_counter() - start,
+                                                        load_seconds, cached_chars))
+                return body
+
+            if not payload.get("stream", True):
+                time.sleep(server.token_latency * len(words))
+                self._send_json(chunk(server.response_text, True))
+                return
+
+            # Streamed responses are newline-delimited JSON, one token per line
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for i, word in enumerate(words):
+                    time.sleep(server.token_latency)
+                    text = word if i == 0 else " " + word
+                    self.wfile.write((json.dumps(chunk(text, False)) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write((json.dumps(chunk("", True)) + "\n").encode("utf-8"))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped reading; Ollama aborts the generation the same way
+
+        def _openai_completion(self, payload):
+            prompt = "\n".join(m.get("content") or "" for m in payload.get("messages", []))
+            time.sleep(server.generate_latency + server.token_latency * len(server.response_text.split()))
+            self._send_json({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", server.models[0]),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": server.response_text},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": _count_tokens(prompt),
+                    "completion_tokens": _count_tokens(server.response_text),
+                    "total_tokens": _count_tokens(prompt) + _count_tokens(server.response_text)
+                }
+            })
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--generate-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(port=args.port, generate_latency=args.generate_latency,
+                            token_latency=args.token_latency, embed_latency=args.embed_latency)
+    print(f"🧪 Mock Ollama listening on {mock.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
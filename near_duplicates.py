@@ -0,0 +1,187 @@
+# near_duplicates.py
+"""
+Near-duplicate detection for ingestion.
+
+The same CV uploaded twice, a job description exported once as PDF and once
+as text, or a handbook with one paragraph changed would otherwise fill the
+index with copies that crowd everything else out of retrieval. Whole files
+are compared by MinHash signatures of their word shingles; the share of
+matching signature slots estimates the Jaccard similarity of the two texts.
+Chunks get a 64-bit SimHash of their shingles, and chunks a few bits apart
+count as the same: that covers reformatted text and an edit of a word or two
+in a long chunk, while a rewritten sentence makes a new chunk. Chunk lookups
+go through four 16-bit bands: a fingerprint within three bits of a stored
+one matches it exactly in at least one band, so no scan over the stored
+chunks is needed.
+"""
+
+from lexical_index import tokenize
+import numpy as np
+import zlib
+
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 128
+SIMHASH_BANDS = 4  # chunk_distance must stay below this for the band lookup to find every match
+
+FILE_SIMILARITY = 0.8   # estimated Jaccard similarity from which two files are near-duplicates
+CHUNK_DISTANCE = 3      # SimHash bits in which two near-duplicate chunks may differ
+
+# What happens to an incoming file that nearly duplicates one already ingested
+POLICY_SKIP = "skip"                  # leave it out
+POLICY_LINK_VERSION = "link_version"  # store only its new chunks, linked to the original by version_of
+POLICY_KEEP_NEWEST = "keep_newest"    # keep whichever of the two was modified last
+DUPLICATE_POLICIES = (POLICY_SKIP, POLICY_LINK_VERSION, POLICY_KEEP_NEWEST)
+
+_MASK64 = (1 << 64) - 1
+
+
+def _splitmix64(value):
+    """Fixed 64-bit mixing of an integer; gives reproducible constants across processes"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+_PERMUTATION_MASKS = np.array([_splitmix64(i) for i in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+_SHINGLE_MULTIPLIERS = np.array([_splitmix64(1000 + i) | 1 for i in range(SHINGLE_WORDS)], dtype=np.uint64)
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def _mix(values):
+    """splitmix64 finaliser over a uint64 array (a bijection, so it permutes hash values)"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingle_hashes(text):
+    """Distinct 64-bit hashes of the SHINGLE_WORDS-word shingles of text"""
+    tokens = tokenize(text)
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    words = np.array([zlib.crc32(token.encode("utf-8")) for token in tokens], dtype=np.uint64)
+    if len(words) < SHINGLE_WORDS:
+        words = np.concatenate([words, np.zeros(SHINGLE_WORDS - len(words), dtype=np.uint64)])
+    count = len(words) - SHINGLE_WORDS + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        combined += words[offset:offset + count] * _SHINGLE_MULTIPLIERS[offset]
+    return np.unique(_mix(combined))
+
+
+def minhash_signature(text, block_size=4096):
+    """MinHash signature (NUM_PERMUTATIONS uint64 values) of text, or None when it has no words"""
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(hashes), block_size):
+        block = hashes[start:start + block_size]
+        permuted = _mix(block[None, :] ^ _PERMUTATION_MASKS[:, None])
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return signature
+
+
+def estimated_similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two MinHash signatures"""
+    return float(np.mean(np.asarray(signature) == np.asarray(other)))
+
+
+def simhash(text):
+    """64-bit SimHash of text's shingles, or None when it has no words"""
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    ones = ((hashes[:, None] >> _BITS) & np.uint64(1)).sum(axis=0)
+    return sum(1 << int(bit) for bit in np.flatnonzero(ones * 2 > len(hashes)))
+
+
+def _bands(fingerprint):
+    width = 64 // SIMHASH_BANDS
+    return [(fingerprint >> (band * width)) & ((1 << width) - 1) for band in range(SIMHASH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of every ingested file and SimHash fingerprints of every chunk.
+
+    Kept next to the vector store: sources are removed with their chunks and
+    the whole index travels in snapshots, so later uploads are compared with
+    everything already stored.
+    """
+
+    def __init__(self, file_similarity=FILE_SIMILARITY, chunk_distance=CHUNK_DISTANCE):
+        if chunk_distance >= SIMHASH_BANDS:
+            raise ValueError(f"chunk_distance must be below {SIMHASH_BANDS}")
+        self.file_similarity = file_similarity
+        self.chunk_distance = chunk_distance
+        self.files = {}   # source -> {"signature": uint64 array, "modified": mtime}
+        self.chunks = {}  # source -> chunk fingerprints
+        self._bands = [{} for _ in range(SIMHASH_BANDS)]  # band value -> [(fingerprint, source)]
+
+    def match_file(self, signature):
+        """(source, similarity) of the most similar file at or above file_similarity, else None"""
+        best = None
+        if signature is None:
+            return best
+        # Files are few next to chunks, so a scan over their signatures is cheap
+        for source, entry in self.files.items():
+            similarity = estimated_similarity(entry["signature"], signature)
+            if similarity >= self.file_similarity and (best is None or similarity > best[1]):
+                best = (source, similarity)
+        return best
+
+    def add_file(self, source, signature, modified=None):
+        if signature is not None:
+            self.files[source] = {"signature": signature, "modified": modified}
+
+    def match_chunk(self, fingerprint):
+        """Source of a stored chunk within chunk_distance bits of fingerprint, else None"""
+        if fingerprint is None:
+            return None
+        for table, band in zip(self._bands, _bands(fingerprint)):
+            for other, source in table.get(band, ()):
+                if bin(other ^ fingerprint).count("1") <= self.chunk_distance:
+                    return source
+        return None
+
+    def add_chunk(self, source, fingerprint):
+        if fingerprint is None:
+            return
+        self.chunks.setdefault(source, []).append(fingerprint)
+        for table, band in zip(self._bands, _bands(fingerprint)):
+            table.setdefault(band, []).append((fingerprint, source))
+
+    def remove(self, source):
+        self.files.pop(source, None)
+        if self.chunks.pop(source, None) is not None:
+            for table in self._bands:
+                for band in list(table):
+                    table[band] = [entry for entry in table[band] if entry[1] != source]
+                    if not table[band]:
+                        del table[band]
+
+    def merge(self, other):
+        for source, entry in other.files.items():
+            self.files[source] = entry
+        for source, fingerprints in other.chunks.items():
+            for fingerprint in fingerprints:
+                self.add_chunk(source, fingerprint)
+
+    def to_dict(self):
+        return {
+            "files": {source: {"signature": [int(value) for value in entry["signature"]],
+                               "modified": entry["modified"]}
+                      for source, entry in self.files.items()},
+            "chunks": self.chunks
+        }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        index = cls(**kwargs)
+        for source, entry in data.get("files", {}).items():
+            index.add_file(source, np.array(entry["signature"], dtype=np.uint64), entry.get("modified"))
+        for source, fingerprints in data.get("chunks", {}).items():
+            for fingerprint in fingerprints:
+                index.add_chunk(source, fingerprint)
+        return index
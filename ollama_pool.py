@@ -0,0 +1,207 @@
+# ollama_pool.py
+"""
+Pool of Ollama endpoints with least-outstanding-requests balancing, background
+health checks and automatic retry on another node when one fails.
+
+Generation and embedding traffic use separate pools, so each can be scaled
+on its own set of machines.
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Failures that mean "this node is unreachable or overloaded"; other errors are returned as-is
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError, OSError)
+
+
+def _retryable_errors():
+    """RETRYABLE_ERRORS plus httpx transport errors once the Ollama client has imported httpx"""
+    httpx = sys.modules.get("httpx")
+    if httpx is None:
+        return RETRYABLE_ERRORS
+    return RETRYABLE_ERRORS + (httpx.TransportError,)
+
+
+class NoHealthyEndpointError(RuntimeError):
+    """Raised when every endpoint in the pool failed the request"""
+
+
+def urls_from_env(variable, default):
+    """Comma-separated URL list from an environment variable, falling back to default"""
+    value = os.environ.get(variable, "")
+    urls = [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+    if urls:
+        return urls
+    return [default] if isinstance(default, str) else list(default)
+
+
+class OllamaEndpointPool:
+    """Least-outstanding-requests load balancer over Ollama base URLs"""
+
+    def __init__(self, urls, name="ollama", health_check_interval=15.0, failure_cooldown=30.0,
+                 max_attempts=None, health_timeout=2.0):
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            raise ValueError("At least one Ollama endpoint is required")
+        self.name = name
+        self.endpoints = [
+            {"url": url.rstrip("/"), "outstanding": 0, "healthy": True, "failures": 0,
+             "last_failure": 0.0, "requests": 0}
+            for url in urls
+        ]
+        self.health_check_interval = health_check_interval
+        self.failure_cooldown = failure_cooldown
+        self.max_attempts = max_attempts or len(self.endpoints)
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._next = 0  # rotates ties between equally loaded endpoints
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def urls(self):
+        return [endpoint["url"] for endpoint in self.endpoints]
+
+    def _available(self, endpoint, now):
+        return endpoint["healthy"] or now - endpoint["last_failure"] > self.failure_cooldown
+
+    def acquire(self, exclude=()):
+        """Reserve the least-loaded healthy endpoint not in exclude"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e["url"] not in exclude and self._available(e, now)]
+            if not candidates:
+                # Everything looks down: try the node that failed longest ago rather than giving up
+                candidates = sorted((e for e in self.endpoints if e["url"] not in exclude),
+                                    key=lambda e: e["last_failure"])[:1]
+            if not candidates:
+                return None
+            offset = self._next % len(candidates)
+            self._next += 1
+            rotated = candidates[offset:] + candidates[:offset]
+            endpoint = min(rotated, key=lambda e: e["outstanding"])
+            endpoint["outstanding"] += 1
+            endpoint["requests"] += 1
+            return endpoint
+
+    def release(self, endpoint, success=True):
+        """Return an endpoint reserved by acquire and record the outcome"""
+        with self._lock:
+            endpoint["outstanding"] -= 1
+            if success:
+                endpoint["healthy"] = True
+                endpoint["failures"] = 0
+            else:
+                endpoint["healthy"] = False
+                endpoint["failures"] += 1
+                endpoint["last_failure"] = time.monotonic()
+
+    def call(self, fn):
+        """Run fn(base_url) on the best endpoint, retrying on another node after connection failures"""
+        tried = []
+        last_error = None
+        for _ in range(self.max_attempts):
+            endpoint = self.acquire(exclude=tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint["url"])
+            try:
+                result = fn(endpoint["url"])
+            except _retryable_errors() as e:
+                self.release(endpoint, success=False)
+                last_error = e
+                print(f"⚠️ {self.name} endpoint {endpoint['url']} failed ({e}); retrying on another node")
+                continue
+            except Exception:
+                self.release(endpoint, success=True)  # request-level error, the node itself is fine
+                raise
+            self.release(endpoint, success=True)
+            return result
+        raise NoHealthyEndpointError(f"All {self.name} endpoints failed: {', '.join(tried)}") from last_error
+
+    def check_health(self):
+        """Probe every endpoint's /api/tags and update its health flag"""
+        import urllib.request
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(f"{endpoint['url']}/api/tags", timeout=self.health_timeout) as response:
+                    healthy = response.status == 200
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    endpoint["healthy"] = True
+                    endpoint["failures"] = 0
+                elif endpoint["healthy"]:
+                    endpoint["healthy"] = False
+                    endpoint["last_failure"] = time.monotonic()
+        return {endpoint["url"]: endpoint["healthy"] for endpoint in self.endpoints}
+
+    def preload(self, model, keep_alive=None, embedding=False, timeout=600.0):
+        """Load model into memory on every endpoint; returns {url: load seconds, or None on failure}"""
+        import json
+        import urllib.request
+        if embedding:
+            path, payload = "/api/embed", {"model": model, "input": "warm-up"}
+        else:
+            path, payload = "/api/generate", {"model": model, "stream": False}  # no prompt: load only
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        results = {}
+        for url in self.urls:
+            start = time.perf_counter()
+            request = urllib.request.Request(f"{url}{path}", data=json.dumps(payload).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    body = json.loads(response.read() or b"{}")
+                load_duration = body.get("load_duration")
+                results[url] = load_duration / 1e9 if load_duration is not None else time.perf_counter() - start
+            except Exception as e:
+                print(f"⚠️ Could not preload {model} on {url}: {e}")
+                results[url] = None
+        return results
+
+    def start_health_checks(self):
+        """Probe endpoints periodically on a daemon thread (no-op for single-endpoint pools)"""
+        if len(self.endpoints) < 2 or self._health_thread:
+            return
+
+        def loop():
+            while not self._stop.wait(self.health_check_interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, daemon=True, name=f"{self.name}-health")
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def stats(self):
+        """Snapshot of per-endpoint load and health"""
+        with self._lock:
+            return [dict(endpoint) for endpoint in self.endpoints]
+
+
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+
+
+def shared_pool(urls, name="ollama"):
+    """Process-wide pool for a name and list of URLs, with health checks started on first use.
+
+    Every RAGCrew (e.g. one per Streamlit session, rebuilt on each upload)
+    gets the same pool for the same endpoints, so balancing sees all of
+    their traffic and only one health-check thread runs per pool.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    key = (name, tuple(url.rstrip("/") for url in urls))
+    with _shared_pools_lock:
+        if key not in _shared_pools:
+            _shared_pools[key] = OllamaEndpointPool(list(key[1]), name=name)
+            _shared_pools[key].start_health_checks()
+        return _shared_pools[key]
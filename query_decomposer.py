@@ -0,0 +1,123 @@
+# query_decomposer.py
+"""
+Splits questions that need evidence from several places into sub-queries.
+
+"Compare the candidate's experience with the job requirements" is one dense
+query, and its nearest chunks tend to come from only one of the two
+documents. The rules below turn it into one sub-query per side, each scoped
+to its document type, alongside the original question. Comparisons between
+named things ("Python vs Java") and several questions in one message are
+split as well. An LLM can be asked for sub-queries when no rule applies.
+Every sub-query is a dict {"query": text, "filters": metadata filters or None}.
+"""
+
+import re
+
+# Words that point at the candidate's documents or at the job's
+CANDIDATE_TERMS = ["candidate", "candidates", "applicant", "cv", "resume", "résumé", "his", "her", "their", "he", "she"]
+JOB_TERMS = ["job", "role", "position", "vacancy", "posting", "requirement", "requirements", "jd", "job description"]
+
+COMPARISON_PATTERN = re.compile(
+    r'\b(compare|comparison|match|matches|fit|fits|against|align|aligns|meet|meets|versus|vs\.?|gap|gaps)\b',
+    re.IGNORECASE
+)
+# "compare X with Y", "X vs Y", "difference between X and Y"
+PAIR_PATTERNS = [
+    re.compile(r'\bcompare\s+(?P<a>.+?)\s+(?:with|to|against|and)\s+(?P<b>.+)', re.IGNORECASE),
+    re.compile(r'\b(?:difference|differences)\s+between\s+(?P<a>.+?)\s+and\s+(?P<b>.+)', re.IGNORECASE),
+    re.compile(r'^(?:\w+\s+){0,3}?(?P<a>[\w#+.\- ]+?)\s+(?:vs\.?|versus)\s+(?P<b>.+)', re.IGNORECASE),
+]
+# Second question joined by "and": "What is her notice period and what does the role pay?"
+QUESTION_JOIN_PATTERN = re.compile(
+    r'\s*(?:[?;]|,?\s+and|,?\s+also)\s+(?=(?:what|how|which|who|when|where|does|do|is|are|can)\b)',
+    re.IGNORECASE
+)
+# Words dropped when extracting the aspect being compared ("experience" in the example above)
+FILLER_WORDS = set("""
+a an the of with to against and or how well does do is are what which compare comparison match matches fit fits
+align aligns meet meets versus vs between difference differences in for on this that these those
+please give me tell about any
+""".split()) | set(CANDIDATE_TERMS) | set(JOB_TERMS) | {"candidate's", "applicant's", "job's", "role's"}
+
+
+def _clean(text):
+    return text.strip(" ?.!,;:").strip()
+
+
+def _mentions(text, terms):
+    return any(re.search(rf"\b{re.escape(term)}\b", text) for term in terms)
+
+
+class QueryDecomposer:
+    """Rule-based query decomposition with optional LLM assistance.
+
+    decompose() always returns the original question first. max_sub_queries
+    caps the total, so retrieval work stays bounded. When llm is given, it is
+    consulted only for long questions no rule could split.
+    """
+
+    def __init__(self, max_sub_queries=4, llm=None, llm_min_words=10):
+        self.max_sub_queries = max_sub_queries
+        self.llm = llm
+        self.llm_min_words = llm_min_words
+
+    def decompose(self, query, doc_types=None, llm=None):
+        """Sub-queries for query; doc_types (loaded document types) enables the candidate/job rule.
+
+        llm overrides the decomposer's own LLM for this call.
+        """
+        llm = llm or self.llm
+        sub_queries = self._by_rules(query, set(doc_types or []))
+        method = "rules"
+        if len(sub_queries) == 1 and llm is not None and len(query.split()) >= self.llm_min_words:
+            sub_queries += [{"query": text, "filters": None} for text in self._by_llm(query, llm)]
+            method = "llm"
+        unique, seen = [], set()
+        for sub_query in sub_queries:
+            key = (sub_query["query"].lower(), repr(sub_query["filters"]))
+            if sub_query["query"] and key not in seen:
+                seen.add(key)
+                unique.append(sub_query)
+        unique = unique[:self.max_sub_queries]
+        return {"sub_queries": unique, "method": method if len(unique) > 1 else "none"}
+
+    def _by_rules(self, query, doc_types):
+        sub_queries = [{"query": query, "filters": None}]
+        text = query.lower()
+
+        # Candidate against job: one sub-query per side, scoped to its document type
+        if ({"cv", "job_description"} <= doc_types and COMPARISON_PATTERN.search(text)
+                and _mentions(text, CANDIDATE_TERMS + ["experience", "skills"]) and _mentions(text, JOB_TERMS)):
+            aspect = " ".join(word for word in re.findall(r"[\w'#+.\-]+", text) if word not in FILLER_WORDS)
+            aspect = aspect or "experience skills qualifications"
+            sub_queries.append({"query": _clean(f"candidate {aspect}"), "filters": {"doc_type": "cv"}})
+            sub_queries.append({"query": _clean(f"job requirements {aspect}"), "filters": {"doc_type": "job_description"}})
+            return sub_queries
+
+        # Two named things compared with each other
+        for pattern in PAIR_PATTERNS:
+            match = pattern.search(query)
+            if match:
+                sub_queries += [{"query": _clean(match.group("a")), "filters": None},
+                                {"query": _clean(match.group("b")), "filters": None}]
+                return sub_queries
+
+        # Several questions in one message
+        parts = [_clean(part) for part in QUESTION_JOIN_PATTERN.split(query) if _clean(part)]
+        if len(parts) > 1:
+            sub_queries += [{"query": part, "filters": None} for part in parts]
+        return sub_queries
+
+    def _by_llm(self, query, llm):
+        prompt = f"""Split the question below into at most {self.max_sub_queries - 1} short, standalone search queries,
+each looking for a different piece of evidence. Write one query per line and nothing else.
+If the question needs only one piece of evidence, write it unchanged.
+
+QUESTION: {query}
+"""
+        try:
+            lines = str(llm.invoke(prompt)).splitlines()
+        except Exception as e:
+            print(f"⚠️ LLM query decomposition failed, using the question as is: {e}")
+            return []
+        return [_clean(re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line)) for line in lines if line.strip()]
@@ -0,0 +1,145 @@
+# query_router.py
+import re
+
+import numpy as np
+
+ROUTE_FAST = "fast"
+ROUTE_STANDARD = "standard"
+ROUTE_ANALYTICAL = "analytical"
+ROUTE_OUT_OF_CONTEXT = "out_of_context"
+
+ROUTES = [ROUTE_FAST, ROUTE_STANDARD, ROUTE_ANALYTICAL, ROUTE_OUT_OF_CONTEXT]
+
+# Labeled example questions for each route; extend these to tune routing for a deployment
+DEFAULT_EXEMPLARS = {
+    ROUTE_FAST: [
+        "What is the candidate's email address?",
+        "What is John's phone number?",
+        "When did she graduate?",
+        "Where is the position located?",
+        "What is the job title?",
+        "Which university did he attend?",
+        "What is the name of the company?",
+        "How many years of experience are required?",
+    ],
+    ROUTE_STANDARD: [
+        "Describe the candidate's work history.",
+        "What are the responsibilities of this role?",
+        "Summarize the onboarding process for new employees.",
+        "What does the policy say about remote work?",
+        "Explain the steps for opening a customer account.",
+        "What skills does the candidate list?",
+        "What training modules are part of the first week?",
+        "Tell me about the candidate's education and certifications.",
+    ],
+    ROUTE_ANALYTICAL: [
+        "Is this candidate a good fit for the position?",
+        "Evaluate the candidate's qualifications against the job requirements.",
+        "Compare the candidate's experience with the job requirements and identify gaps.",
+        "Should we hire this candidate? Give a recommendation with evidence.",
+        "What are the strengths and weaknesses of this applicant for the role?",
+        "Assess how well the CV matches the job description.",
+        "Rank the candidates by suitability for the role.",
+        "Which requirements does the candidate not meet?",
+    ],
+    ROUTE_OUT_OF_CONTEXT: [
+        "What is the weather like today?",
+        "Who won the football match last night?",
+        "Write me a poem about the ocean.",
+        "What is the capital of France?",
+        "Tell me a joke.",
+        "How do I bake a chocolate cake?",
+        "What is the stock price of Apple?",
+        "Translate this sentence into Spanish.",
+    ],
+}
+
+# Only words that signal an evaluation; generic words like "job" or "role" are deliberately absent
+ANALYTICAL_KEYWORDS = [
+    'recommend', 'recommendation', 'fit', 'suitable', 'suitability', 'evaluate', 'evaluation',
+    'assess', 'assessment', 'compare', 'comparison', 'match', 'strengths', 'weaknesses',
+    'gap', 'gaps', 'hire', 'hiring decision', 'rank', 'qualified'
+]
+
+FAST_QUESTION_PATTERN = re.compile(r'^\s*(what|who|when|where|which|how many|how much)\b', re.IGNORECASE)
+
+
+class KeywordRouter:
+    """Rule-based router; used on its own or as the fallback for low-confidence classifications"""
+
+    def __init__(self, analytical_keywords=None, fast_max_words=8):
+        self.analytical_keywords = analytical_keywords or ANALYTICAL_KEYWORDS
+        self.fast_max_words = fast_max_words
+
+    def route(self, query, query_vector=None):
+        """Return a routing decision dict for the query"""
+        text = query.lower()
+        words = re.findall(r"[a-z']+", text)
+        if any(re.search(rf'\b{re.escape(keyword)}\b', text) for keyword in self.analytical_keywords):
+            return {"route": ROUTE_ANALYTICAL, "confidence": 1.0, "method": "keyword"}
+        if FAST_QUESTION_PATTERN.match(query) and len(words) <= self.fast_max_words:
+            return {"route": ROUTE_FAST, "confidence": 1.0, "method": "keyword"}
+        return {"route": ROUTE_STANDARD, "confidence": 1.0, "method": "keyword"}
+
+
+class EmbeddingRouter:
+    """Nearest-exemplar query classifier over embedding vectors.
+
+    Each route is scored by the mean similarity of its top_k closest exemplars.
+    When the margin between the best and second-best route is below
+    confidence_threshold, the decision is delegated to the fallback router.
+    """
+
+    def __init__(self, embeddings, exemplars=None, confidence_threshold=0.02, top_k=3, fallback=None):
+        self.embeddings = embeddings
+        self.exemplars = exemplars or DEFAULT_EXEMPLARS
+        self.confidence_threshold = confidence_threshold
+        self.top_k = top_k
+        self.fallback = fallback or KeywordRouter()
+        self._exemplar_vectors = None
+        self._exemplar_routes = None
+
+    def _fit(self):
+        """Embed all exemplars in one batch the first time the router is used"""
+        routes, texts = [], []
+        for route, examples in self.exemplars.items():
+            routes.extend([route] * len(examples))
+            texts.extend(examples)
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._exemplar_vectors = vectors / np.maximum(norms, 1e-12)
+        self._exemplar_routes = np.array(routes)
+
+    def reset(self):
+        """Forget the exemplar vectors, e.g. after the embedding model changed"""
+        self._exemplar_vectors = None
+        self._exemplar_routes = None
+
+    def route(self, query, query_vector=None):
+        """Return a routing decision dict for the query, reusing query_vector when given"""
+        try:
+            if self._exemplar_vectors is None:
+                self._fit()
+            if query_vector is None:
+                query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+                query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+        except Exception as e:
+            print(f"⚠️ Embedding router unavailable, using keyword routing: {e}")
+            return self.fallback.route(query)
+
+        similarities = self._exemplar_vectors @ query_vector
+        scores = {}
+        for route in self.exemplars:
+            route_similarities = np.sort(similarities[self._exemplar_routes == route])[::-1]
+            scores[route] = float(route_similarities[:self.top_k].mean())
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        margin = scores[ranked[0]] - scores[ranked[1]] if len(ranked) > 1 else 1.0
+
+        if margin < self.confidence_threshold:
+            decision = self.fallback.route(query)
+            decision["method"] = "keyword_fallback"
+            decision["scores"] = scores
+            return decision
+
+        return {"route": ranked[0], "confidence": margin, "method": "embedding", "scores": scores}
@@ -1,153 +1,1953 @@
 # rag_crew.py
-from crewai import Agent, Task, Crew, Process
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaLLM  # Updated import for newer package
-from langchain_ollama import OllamaEmbeddings  # Updated import for newer package
+# CrewAI, langchain, Chroma and langchain_ollama are imported where they are first
+# used, so importing this module (and constructing RAGCrew) stays fast
+from requirement_matcher import RequirementMatcher, format_coverage_table
+from query_router import EmbeddingRouter, KeywordRouter, ROUTE_FAST, ROUTE_ANALYTICAL, ROUTE_OUT_OF_CONTEXT
+from query_decomposer import QueryDecomposer
+from summary_tree import NODE_CHUNK, NODE_DOCUMENT, NODE_SECTION, build_summary_nodes, granularity_for
+from metrics import REGISTRY
+from ollama_pool import OllamaEndpointPool, shared_pool, urls_from_env
+from vector_index import MMapVectorIndex, STORAGE_DTYPES, metadata_matches, quantize
+from lexical_index import LexicalIndex
+from corpus_profile import CorpusProfile
+from document_loaders import DocumentLoader
+from near_duplicates import (DUPLICATE_POLICIES, POLICY_KEEP_NEWEST, POLICY_LINK_VERSION, NearDuplicateIndex,
+                             minhash_signature, simhash)
+from snapshot import SnapshotWriter, read_snapshot
+from chunking import CHUNKING_PROFILES, chunk_source
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+import contextvars
+import json
+import numpy as np
 import os
+import re
 import shutil
+import threading
+import time
+import uuid
 
-# Set environment variables to configure CrewAI to use Ollama
-os.environ["OPENAI_API_BASE"] = "http://localhost:11434/v1"
-os.environ["OPENAI_API_KEY"] = "ollama"  # Dummy key for Ollama
-os.environ["DEFAULT_MODEL"] = "llama3.2:latest"
-os.environ["LITELLM_MODEL"] = "llama3.2:latest"
+# Environment CrewAI/LiteLLM need to talk to Ollama; applied as defaults when CrewAI
+# is first imported, so settings made by the caller (e.g. a benchmark's mock URL) win
+CREWAI_ENV_DEFAULTS = {
+    "OPENAI_API_BASE": "http://localhost:11434/v1",
+    "OPENAI_API_KEY": "ollama",  # Dummy key for Ollama
+    "DEFAULT_MODEL": "llama3.2:latest",
+    "LITELLM_MODEL": "llama3.2:latest",
+}
+
+def _crewai():
+    """Import CrewAI on first use, after applying the Ollama environment defaults"""
+    for name, value in CREWAI_ENV_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    import crewai
+    return crewai
+
+# Keywords used to tell CVs and job descriptions apart
+CV_MARKERS = ['curriculum vitae', 'work experience', 'education', 'professional summary', 'certifications']
+JOB_DESCRIPTION_MARKERS = ['requirements', 'responsibilities', 'qualifications', 'we are seeking', 'benefits']
+
+def detect_document_type(text, filename=""):
+    """Classify a document as 'cv', 'job_description' or 'other' from its name and content"""
+    name_tokens = set(re.findall(r'[a-zé]+', os.path.basename(filename).lower()))
+    if name_tokens & {'cv', 'resume', 'résumé', 'curriculum'}:
+        return "cv"
+    if name_tokens & {'job', 'jd', 'posting', 'vacancy'}:
+        return "job_description"
+
+    content = text.lower()
+    cv_hits = sum(1 for marker in CV_MARKERS if marker in content)
+    jd_hits = sum(1 for marker in JOB_DESCRIPTION_MARKERS if marker in content)
+    if max(cv_hits, jd_hits) < 2:
+        return "other"
+    return "cv" if cv_hits > jd_hits else "job_description"
+
+def duplicate_upload_names(names):
+    """File names that occur more than once once folders are stripped; such uploads would overwrite each other"""
+    seen, clashes = set(), set()
+    for name in names:
+        name = os.path.basename(name)
+        (clashes if name in seen else seen).add(name)
+    return sorted(clashes)
+
+# Chunk metadata fields that query_documents and generate_response can filter on
+METADATA_FILTER_FIELDS = ("source", "doc_type", "upload_batch", "page", "node_type", "parent_id", "version_of")
+
+def _chroma_where(where):
+    """Chroma where clause for normalised filters ({field: [values]})"""
+    clauses = [{field: {"$in": values}} for field, values in sorted(where.items())]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _combine_filters(where, extra):
+    """Two sets of normalised filters applied together; a field in both keeps only the common values"""
+    if not where or not extra:
+        return where or extra
+    combined = dict(where)
+    for field, values in extra.items():
+        combined[field] = [value for value in combined[field] if value in values] if field in combined else values
+    return combined
+
+def _merge_ranked(result_lists, k, max_chars=None):
+    """Interleave ranked (doc, score) lists best-first, dropping repeated chunks, until k chunks
+    or max_chars characters of chunk text are collected"""
+    merged, seen, used = [], set(), 0
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            doc, score = results[rank]
+            key = (doc.metadata.get("source"), doc.page_content)
+            if key in seen:
+                continue
+            if len(merged) >= k or (max_chars and merged and used + len(doc.page_content) > max_chars):
+                return merged
+            seen.add(key)
+            merged.append((doc, score))
+            used += len(doc.page_content)
+    return merged
+
+def _normalize_vectors(vectors):
+    """L2-normalise a vector or a matrix of row vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class QueryProcessor:
+    """Embeds each query once and shares the vector with every stage that needs it.
+    
+    Vectors are kept in a small LRU keyed by the normalised query text, so the
+    UI's retrieval preview and generate_response reuse a single embedding call.
+    """
+    
+    def __init__(self, embeddings, cache_size=256):
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(query):
+        """Normalise whitespace and case so trivially different queries share a vector"""
+        return " ".join(query.lower().split())
+    
+    def process(self, query):
+        """Return a processed query dict with the (cached) embedding vector"""
+        key = self.normalize(query)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(self._cache[key], query=query, cached=True)
+        
+        start = time.perf_counter()
+        vector = _normalize_vectors(self.embeddings.embed_query(query))
+        embed_ms = (time.perf_counter() - start) * 1000
+        processed = {"query": query, "normalized": key, "vector": vector, "embed_ms": embed_ms, "cached": False}
+        
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = processed
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        print(f"🔎 Embedded query in {embed_ms:.0f} ms")
+        return processed
+    
+    def clear(self):
+        """Drop all cached query vectors"""
+        with self._lock:
+            self._cache.clear()
+
+class SemanticCache:
+    """Response cache keyed by query vectors; near-identical questions reuse an answer"""
+    
+    def __init__(self, similarity_threshold=0.98, max_entries=128):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._entries = []  # list of (vector, query, response, scope)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _signature(query):
+        """Numbers and capitalised words; questions differing in these never share an answer"""
+        # The first word is skipped so a sentence-initial capital doesn't count
+        return set(re.findall(r'\d+|\b[A-Z][a-zA-Z]+', " ".join(query.split()[1:])))
+    
+    def lookup(self, vector, query, scope=None):
+        """Return (response, similarity, cached_query) for the closest entry above the threshold, or None
+        
+        Only answers stored with the same scope (e.g. the metadata filters of the question) are reused.
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[3] == scope]
+            if not entries:
+                self.misses += 1
+                return None
+            matrix = np.stack([entry[0] for entry in entries])
+            similarities = matrix @ vector
+            best = int(similarities.argmax())
+            if (similarities[best] < self.similarity_threshold
+                    or self._signature(entries[best][1]) != self._signature(query)):
+                self.misses += 1
+                return None
+            self.hits += 1
+            _, cached_query, response, _ = entries[best]
+            return response, float(similarities[best]), cached_query
+    
+    def store(self, vector, query, response, scope=None):
+        """Remember a response for the given query vector"""
+        with self._lock:
+            self._entries.append((vector, query, response, scope))
+            if len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+    
+    def clear(self):
+        """Forget all cached responses"""
+        with self._lock:
+            self._entries = []
+
+# Trace and span of the request currently running in this context
+_active_trace = contextvars.ContextVar("active_trace", default=None)
+_active_span = contextvars.ContextVar("active_span", default=None)
+
+class Tracer:
+    """Per-request timing spans with token counts, exported as JSON lines.
+    
+    Spans nest through context variables: anything run inside
+    ``with tracer.trace(...)`` (including LLM calls made by crew agents)
+    becomes part of that request's trace. Optionally mirrors finished
+    traces to OpenTelemetry when the package is installed.
+    """
+    
+    def __init__(self, export_path=None, use_opentelemetry=False):
+        self.export_path = export_path
+        self.last_trace = None
+        self._lock = threading.Lock()
+        self._otel_tracer = None
+        if use_opentelemetry:
+            try:
+                from opentelemetry import trace as otel_trace
+                self._otel_tracer = otel_trace.get_tracer("onboardiq.rag_crew")
+            except ImportError:
+                print("⚠️ opentelemetry is not installed; exporting JSON lines only")
+    
+    @contextmanager
+    def trace(self, name, **attributes):
+        """Start a new trace with a root span; exported when the block exits"""
+        trace = {
+            "trace_id": uuid.uuid4().hex,
+            "name": name,
+            "timestamp": time.time(),
+            "perf_start": time.perf_counter(),
+            "spans": []
+        }
+        token = _active_trace.set(trace)
+        try:
+            with self.span(name, **attributes):
+                yield trace
+        finally:
+            _active_trace.reset(token)
+            self.last_trace = trace
+            self._export(trace)
+    
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a stage of the active trace; a no-op when no trace is active"""
+        trace = _active_trace.get()
+        if trace is None:
+            yield {"name": name, "attributes": dict(attributes)}
+            return
+        parent = _active_span.get()
+        span = self._new_span(trace, name, parent, time.perf_counter(), attributes)
+        token = _active_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span["attributes"]["error"] = str(e)
+            raise
+        finally:
+            span["duration_ms"] = (time.perf_counter() - trace["perf_start"]) * 1000 - span["start_ms"]
+            _active_span.reset(token)
+    
+    def record_span(self, name, start, end, **attributes):
+        """Record a span measured elsewhere (perf_counter start/end) under the active span.
+        
+        LLM call spans that ran inside the window are re-parented to the new
+        span and their token counts are summed into it.
+        """
+        trace = _active_trace.get()
+        if trace is None:
+            return None
+        parent = _active_span.get()
+        span = self._new_span(trace, name, parent, start, attributes)
+        span["duration_ms"] = (end - start) * 1000
+        window_end = span["start_ms"] + span["duration_ms"]
+        prompt_tokens = completion_tokens = 0
+        for child in trace["spans"]:
+            if (child is not span and child["name"].startswith("llm")
+                    and child["parent_id"] == span["parent_id"]
+                    and span["start_ms"] <= child["start_ms"] <= window_end):
+                child["parent_id"] = span["span_id"]
+                prompt_tokens += child["attributes"].get("prompt_tokens") or 0
+                completion_tokens += child["attributes"].get("completion_tokens") or 0
+        span["attributes"].setdefault("prompt_tokens", prompt_tokens)
+        span["attributes"].setdefault("completion_tokens", completion_tokens)
+        return span
+    
+    def _new_span(self, trace, name, parent, start, attributes):
+        span = {
+            "trace_id": trace["trace_id"],
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "start_ms": (start - trace["perf_start"]) * 1000,
+            "duration_ms": None,
+            "attributes": dict(attributes)
+        }
+        with self._lock:
+            trace["spans"].append(span)
+        return span
+    
+    def _export(self, trace):
+        """Append the trace's spans to the JSON lines file and OpenTelemetry"""
+        if self.export_path:
+            try:
+                with self._lock, open(self.export_path, "a") as f:
+                    for span in trace["spans"]:
+                        f.write(json.dumps(dict(span, trace_name=trace["name"]), default=str) + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not export trace: {e}")
+        if self._otel_tracer:
+            self._export_opentelemetry(trace)
+    
+    def _export_opentelemetry(self, trace):
+        from opentelemetry import trace as otel_trace
+        base_ns = int(trace["timestamp"] * 1e9)
+        otel_spans = {}
+        for span in sorted(trace["spans"], key=lambda item: item["start_ms"]):
+            parent = otel_spans.get(span["parent_id"])
+            context = otel_trace.set_span_in_context(parent) if parent else None
+            otel_span = self._otel_tracer.start_span(
+                span["name"],
+                context=context,
+                start_time=base_ns + int(span["start_ms"] * 1e6),
+                attributes={k: v for k, v in span["attributes"].items()
+                            if isinstance(v, (str, bool, int, float))}
+            )
+            otel_spans[span["span_id"]] = otel_span
+        for span in trace["spans"]:
+            otel_spans[span["span_id"]].end(
+                end_time=base_ns + int((span["start_ms"] + (span["duration_ms"] or 0)) * 1e6)
+            )
+
+# Scheduling classes for LLM calls; lower numbers are served first
+PRIORITY_FAST = 0         # interactive fast-path answers and out-of-context replies
+PRIORITY_INTERACTIVE = 1  # interactive standard crews
+PRIORITY_ANALYTICAL = 2   # interactive analytical crews
+PRIORITY_BATCH = 3        # offline/batch jobs
+
+# Tenant, priority and limits of the request running in this context, read by CustomOllamaLLM
+_request_context = contextvars.ContextVar("request_context", default=None)
+
+# Prefix of answers cut short by a time or token limit
+PARTIAL_ANSWER_MARKER = "⚠️ PARTIAL ANSWER"
+
+class RequestLimitExceeded(RuntimeError):
+    """Raised by LLM calls once the request's deadline or token budget is used up"""
+    
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind  # "deadline", "agent_deadline" or "token_budget"
+
+def _limit_exceeded(context):
+    """(kind, message) of the first limit of the request that has run out, or None"""
+    if context.get("expired"):
+        return context["expired"]
+    now = time.perf_counter()
+    if context.get("deadline") and now >= context["deadline"]:
+        return ("deadline", f"time limit of {context['timeout']:g}s reached")
+    if context.get("agent_deadline") and now >= context["agent_deadline"]:
+        return ("agent_deadline", f"{context['agent_role']} time limit of {context['agent_timeout']:g}s reached")
+    if context.get("max_tokens") and context.get("tokens_used", 0) >= context["max_tokens"]:
+        return ("token_budget", f"limit of {context['max_tokens']} output tokens reached")
+    return None
+
+class LLMScheduler:
+    """Central admission control for LLM calls.
+    
+    Calls run in the caller's thread once admitted. Admission follows strict
+    priority (tickets waiting longer than aging_seconds are promoted to the
+    top class), round-robin across tenants within a priority, and a cap on
+    calls in flight. Identical prompts already in flight are coalesced: later
+    callers wait for and share the first caller's result.
+    """
+    
+    def __init__(self, max_in_flight=2, aging_seconds=60.0, metrics=None):
+        self.max_in_flight = max_in_flight
+        self.aging_seconds = aging_seconds
+        self.metrics = metrics
+        self._condition = threading.Condition()
+        self._queues = {}  # priority -> OrderedDict(tenant -> deque of tickets)
+        self._in_flight = 0
+        self._pending = {}  # coalescing key -> Future
+    
+    def _next_ticket(self):
+        """Head ticket of the best tenant queue in the best priority class"""
+        now = time.perf_counter()
+        best = None
+        for priority, tenants in self._queues.items():
+            for tenant_queue in tenants.values():
+                if not tenant_queue:
+                    continue
+                ticket = tenant_queue[0]
+                effective = 0 if now - ticket["enqueued"] > self.aging_seconds else priority
+                if best is None or (effective, ticket["priority"]) < (best[0], best[1]["priority"]):
+                    best = (effective, ticket)
+                break  # only the first tenant with work counts; tenants rotate after each admission
+        return best[1] if best else None
+    
+    def queued(self):
+        """Number of calls waiting for admission"""
+        with self._condition:
+            return sum(len(tenant_queue) for tenants in self._queues.values() for tenant_queue in tenants.values())
+    
+    def _dequeue(self, ticket):
+        tenants = self._queues[ticket["priority"]]
+        tenants[ticket["tenant"]].popleft()
+        # Rotate the tenant to the back so other tenants of this priority go next
+        tenant_queue = tenants.pop(ticket["tenant"])
+        if tenant_queue:
+            tenants[ticket["tenant"]] = tenant_queue
+    
+    def submit(self, fn, key=None, priority=PRIORITY_INTERACTIVE, tenant="default"):
+        """Run fn() under the scheduler and return its result"""
+        with self._condition:
+            if key is not None and key in self._pending:
+                future = self._pending[key]
+                coalesced = True
+            else:
+                coalesced = False
+                future = Future()
+                if key is not None:
+                    self._pending[key] = future
+                ticket = {"priority": priority, "tenant": tenant, "enqueued": time.perf_counter()}
+                self._queues.setdefault(priority, OrderedDict()).setdefault(tenant, deque()).append(ticket)
+        
+        if coalesced:
+            if self.metrics:
+                self.metrics.llm_coalesced.inc()
+            return future.result()
+        
+        with self._condition:
+            while self._in_flight >= self.max_in_flight or self._next_ticket() is not ticket:
+                self._condition.wait()
+            self._dequeue(ticket)
+            self._in_flight += 1
+        if self.metrics:
+            self.metrics.llm_queue_wait.observe(time.perf_counter() - ticket["enqueued"], priority=str(priority))
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                if key is not None and self._pending.get(key) is future:
+                    del self._pending[key]
+                self._condition.notify_all()
+
+def _route_priority(route, interactive=True):
+    """Scheduling priority for a request given its route"""
+    if not interactive:
+        return PRIORITY_BATCH
+    if route == ROUTE_ANALYTICAL:
+        return PRIORITY_ANALYTICAL
+    if route in (ROUTE_FAST, ROUTE_OUT_OF_CONTEXT):
+        return PRIORITY_FAST
+    return PRIORITY_INTERACTIVE
+
+# Retrieved chunks are wrapped in one block that every prompt starts with, so Ollama can
+# reuse the evaluated prefix (its KV cache) across agents and follow-up questions
+DOCUMENTS_OPEN = "<documents>"
+DOCUMENTS_CLOSE = "</documents>"
+COLD_LOAD_SECONDS = 1.0  # load_duration above this counts as a cold model load
+
+def format_document_context(docs):
+    """Chunks as a <documents> block, ordered by source and page rather than by score,
+    so questions that retrieve the same chunks produce byte-identical prompt prefixes"""
+    ordered = sorted(docs, key=lambda doc: (str(doc.metadata.get("source", "")), doc.metadata.get("page") or 0,
+                                            doc.page_content))
+    body = "\n\n".join(
+        f"[{os.path.basename(str(doc.metadata.get('source', 'document')))}"
+        f"{', page ' + str(doc.metadata['page'] + 1) if isinstance(doc.metadata.get('page'), int) else ''}]\n"
+        f"{doc.page_content}"
+        for doc in ordered
+    )
+    return f"{DOCUMENTS_OPEN}\n{body}\n{DOCUMENTS_CLOSE}"
+
+def _documents_first(prompt):
+    """Move the <documents> block to the start of a prompt, ahead of agent-specific text"""
+    start = prompt.find(DOCUMENTS_OPEN)
+    end = prompt.find(DOCUMENTS_CLOSE, start)
+    if start <= 0 or end < 0:
+        return prompt
+    end += len(DOCUMENTS_CLOSE)
+    return prompt[start:end] + "\n\n" + (prompt[:start] + prompt[end:]).strip()
+
+class _TracedOllamaLLM:
+    """CrewAI LLM backed by langchain's OllamaLLM that traces every call.
+    
+    Each call becomes an ``llm`` span carrying Ollama's own prompt and
+    completion token counts and its model load time. Combined with CrewAI's
+    BaseLLM into CustomOllamaLLM on first use (see _custom_llm_class).
+    """
+    
+    def __init__(self, model_name="llama3.2:latest", base_url="http://localhost:11434",
+                 temperature=0.3, tracer=None, metrics=None, scheduler=None, pool=None, **ollama_kwargs):
+        # The ollama/ prefix lets CrewAI/LiteLLM identify the provider
+        super().__init__(model=f"ollama/{model_name}", temperature=temperature)
+        self.model_name = model_name
+        self.tracer = tracer or Tracer()
+        self.metrics = metrics or RAGMetrics()
+        self.scheduler = scheduler or LLM_SCHEDULER
+        self.pool = pool or OllamaEndpointPool(base_url, name="generation")
+        self._ollama_kwargs = dict(ollama_kwargs, temperature=temperature)
+        self._clients = {}
+    
+    def _client(self, base_url):
+        """OllamaLLM bound to one endpoint of the pool"""
+        if base_url not in self._clients:
+            from langchain_ollama import OllamaLLM
+            self._clients[base_url] = OllamaLLM(model=self.model_name, base_url=base_url, **self._ollama_kwargs)
+        return self._clients[base_url]
+    
+    @property
+    def client(self):
+        """Client for the pool's first endpoint"""
+        return self._client(self.pool.urls[0])
+    
+    @staticmethod
+    def _messages_to_prompt(messages):
+        if isinstance(messages, str):
+            return messages
+        return "\n\n".join(message.get("content") or "" for message in messages)
+    
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        """CrewAI entry point; the shared documents go first so agents reuse Ollama's prompt cache"""
+        return self.invoke(_documents_first(self._messages_to_prompt(messages)))
+    
+    def invoke(self, prompt, **kwargs):
+        """Generate a completion for a plain prompt"""
+        stop = kwargs.pop("stop", None) or getattr(self, "stop", None) or None
+        context = _request_context.get() or {}
+        priority = context.get("priority")
+        if priority is None:
+            priority = PRIORITY_INTERACTIVE
+        limited = any(context.get(name) for name in ("deadline", "agent_deadline", "max_tokens"))
+        # Calls under a deadline or token budget are not shared with other requests
+        key = None if limited else (self.model_name, prompt, tuple(stop or ()), tuple(sorted(kwargs.items())))
+        
+        def generate():
+            exceeded = _limit_exceeded(context)
+            if exceeded:
+                raise RequestLimitExceeded(*exceeded)
+            start = time.perf_counter()
+            if limited:
+                text, info = self.pool.call(lambda url: self._stream_within_limits(url, prompt, stop, context, **kwargs))
+            else:
+                result = self.pool.call(lambda url: self._client(url).generate([prompt], stop=stop, **kwargs))
+                generation = result.generations[0][0]
+                text, info = generation.text, generation.generation_info or {}
+            self.metrics.llm_latency.observe(time.perf_counter() - start, model=self.model_name)
+            return text, info
+        
+        with self.tracer.span(f"llm:{self.model_name}", model=self.model_name, priority=priority) as span:
+            text, info = self.scheduler.submit(generate, key=key, priority=priority,
+                                               tenant=context.get("tenant", "default"))
+            span["attributes"]["prompt_tokens"] = info.get("prompt_eval_count")
+            span["attributes"]["completion_tokens"] = info.get("eval_count")
+            load_seconds = (info.get("load_duration") or 0) / 1e9
+            span["attributes"]["load_ms"] = load_seconds * 1000
+            span["attributes"]["cold_load"] = load_seconds >= COLD_LOAD_SECONDS
+        self.metrics.llm_load_time.observe(load_seconds, model=self.model_name)
+        if info.get("prompt_eval_count") is not None:
+            self.metrics.llm_prompt_eval_tokens.observe(info["prompt_eval_count"], model=self.model_name)
+        if load_seconds >= COLD_LOAD_SECONDS:
+            self.metrics.llm_cold_loads.inc(model=self.model_name)
+            print(f"🧊 Cold load of {self.model_name} took {load_seconds:.1f}s")
+        return text
+    
+    def _stream_within_limits(self, base_url, prompt, stop, context, **kwargs):
+        """Stream a completion, stopping as soon as the request's deadline or token budget runs out.
+        
+        Closing the stream drops the connection, which makes Ollama stop
+        generating. The text produced so far is kept in the request context.
+        """
+        parts, info = [], {}
+        stream = self._client(base_url)._stream(prompt, stop=stop, **kwargs)
+        try:
+            for chunk in stream:
+                parts.append(chunk.text)
+                info = chunk.generation_info or info
+                context["tokens_used"] = context.get("tokens_used", 0) + 1
+                exceeded = None if info.get("done") else _limit_exceeded(context)
+                if exceeded:
+                    context["expired"] = exceeded
+                    context["partial_output"] = "".join(parts)
+                    raise RequestLimitExceeded(*exceeded)
+        finally:
+            stream.close()
+        return "".join(parts), info
+    
+    def predict(self, prompt):
+        """Alias kept for callers written against the langchain LLM interface"""
+        return self.invoke(prompt)
+    
+    def supports_function_calling(self):
+        return False
+    
+    def get_context_window_size(self):
+        return 8192
+
+_lazy_classes = {}
+_lazy_classes_lock = threading.Lock()
+
+def _custom_llm_class():
+    """CustomOllamaLLM class, created on first use so only LLM users pay for importing CrewAI"""
+    with _lazy_classes_lock:
+        if "CustomOllamaLLM" not in _lazy_classes:
+            _lazy_classes["CustomOllamaLLM"] = type("CustomOllamaLLM", (_TracedOllamaLLM, _crewai().BaseLLM), {
+                "__module__": __name__,
+                "__doc__": _TracedOllamaLLM.__doc__
+            })
+        return _lazy_classes["CustomOllamaLLM"]
+
+def __getattr__(name):
+    # Keeps `from rag_crew import CustomOllamaLLM` working without importing CrewAI up front
+    if name == "CustomOllamaLLM":
+        return _custom_llm_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class RAGMetrics:
+    """Operational metrics for RAGCrew; every instance on a registry shares the same series"""
+    
+    def __init__(self, registry=None):
+        registry = registry or REGISTRY
+        self.registry = registry
+        self.questions = registry.counter("rag_questions_total", "Questions received by generate_response")
+        self.routes = registry.counter("rag_route_total", "Questions by route taken", ["route"])
+        self.question_latency = registry.histogram(
+            "rag_question_latency_seconds", "End-to-end generate_response latency", ["route"])
+        self.cache_requests = registry.counter(
+            "rag_cache_requests_total", "Query vector and response cache lookups", ["cache", "result"])
+        self.embedding_batch_size = registry.histogram(
+            "rag_embedding_batch_size", "Texts per embedding request", ["kind"],
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096))
+        self.embedding_latency = registry.histogram(
+            "rag_embedding_latency_seconds", "Embedding request latency", ["kind"])
+        self.ingested_chunks = registry.counter("rag_ingested_chunks_total", "Chunks embedded and stored")
+        self.ingestion_rate = registry.gauge(
+            "rag_ingestion_chunks_per_second", "Embedding throughput of the most recent ingestion")
+        self.agent_latency = registry.histogram("rag_agent_latency_seconds", "Crew task latency per agent", ["agent"])
+        self.llm_latency = registry.histogram("rag_llm_call_latency_seconds", "Latency of single LLM calls", ["model"])
+        # Labelled by persist directory so crews on different stores don't overwrite each other
+        self.vector_store_chunks = registry.gauge(
+            "rag_vector_store_chunks", "Chunks in the vector store", ["collection"])
+        self.llm_queue_wait = registry.histogram(
+            "rag_llm_queue_wait_seconds", "Time LLM calls wait for the scheduler", ["priority"])
+        self.llm_coalesced = registry.counter(
+            "rag_llm_coalesced_total", "LLM calls served by an identical in-flight prompt")
+        self.llm_load_time = registry.histogram(
+            "rag_llm_load_seconds", "Model load time reported by Ollama per call or preload", ["model"],
+            buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+        self.llm_cold_loads = registry.counter(
+            "rag_llm_cold_loads_total", "LLM calls that waited for Ollama to load the model", ["model"])
+        self.partial_answers = registry.counter(
+            "rag_partial_answers_total", "Answers cut short by a time or token limit", ["reason"])
+        self.llm_prompt_eval_tokens = registry.histogram(
+            "rag_llm_prompt_eval_tokens", "Prompt tokens Ollama had to evaluate (cached prefixes excluded)",
+            ["model"], buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192))
+        self.query_decompositions = registry.counter(
+            "rag_query_decompositions_total", "Questions searched as several sub-queries", ["method"])
+        self.out_of_context_replies = registry.counter(
+            "rag_out_of_context_replies_total", "Out-of-context replies by how they were written", ["method"])
+        self.ingest_bytes_copied = registry.counter(
+            "rag_ingest_bytes_copied_total", "Bytes of uploaded files copied or spooled to disk before parsing")
+        self.near_duplicates = registry.counter(
+            "rag_near_duplicates_total", "Near-duplicate files and chunks collapsed at ingestion", ["level", "action"])
+
+def _duration_seconds(value):
+    """Whole seconds of an Ollama duration such as "30m", "1h" or "90s"; numbers pass through"""
+    if isinstance(value, str) and value[-1:] in ("s", "m", "h"):
+        return int(float(value[:-1]) * {"s": 1, "m": 60, "h": 3600}[value[-1]])
+    return int(value)
+
+class PooledOllamaEmbeddings:
+    """Ollama embeddings spread over an endpoint pool.
+    
+    Large document batches are split and embedded on all endpoints in
+    parallel; single queries go to the least-loaded endpoint. Implements
+    langchain's Embeddings interface by duck typing, and creates no client
+    until the first request.
+    """
+    
+    def __init__(self, model_name, pool, batch_size=64, keep_alive=None):
+        self.model_name = model_name
+        self.pool = pool
+        self.batch_size = batch_size
+        self.keep_alive = keep_alive
+        self._clients = {}
+    
+    def _client(self, base_url):
+        if base_url not in self._clients:
+            from langchain_ollama import OllamaEmbeddings
+            options = {}
+            if self.keep_alive is not None:
+                # langchain's OllamaEmbeddings takes keep_alive in seconds, not as a duration string
+                options["keep_alive"] = _duration_seconds(self.keep_alive)
+            self._clients[base_url] = OllamaEmbeddings(model=self.model_name, base_url=base_url, **options)
+        return self._clients[base_url]
+    
+    def embed_documents(self, texts):
+        if len(self.pool.endpoints) == 1 or len(texts) <= self.batch_size:
+            return self.pool.call(lambda url: self._client(url).embed_documents(texts))
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=len(self.pool.endpoints)) as executor:
+            results = executor.map(
+                lambda batch: self.pool.call(lambda url: self._client(url).embed_documents(batch)), batches
+            )
+            return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    def embed_query(self, text):
+        return self.pool.call(lambda url: self._client(url).embed_query(text))
+
+class InstrumentedEmbeddings:
+    """Embeddings wrapper that records batch sizes and latency"""
+    
+    def __init__(self, embeddings, metrics):
+        self.embeddings = embeddings
+        self.metrics = metrics
+    
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self.metrics.embedding_latency.observe(time.perf_counter() - start, kind="documents")
+        self.metrics.embedding_batch_size.observe(len(texts), kind="documents")
+        return vectors
+    
+    def embed_query(self, text):
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self.metrics.embedding_latency.observe(time.perf_counter() - start, kind="query")
+        self.metrics.embedding_batch_size.observe(1, kind="query")
+        return vector
+
+def _mmr_select(query_similarities, doc_vectors, k, lambda_mult):
+    """Maximal marginal relevance: pick k indices balancing relevance and diversity"""
+    n = len(query_similarities)
+    if n == 0:
+        return []
+    doc_similarities = doc_vectors @ doc_vectors.T
+    selected = [int(np.argmax(query_similarities))]
+    while len(selected) < min(k, n):
+        redundancy = doc_similarities[:, selected].max(axis=1)
+        scores = lambda_mult * query_similarities - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+class SwapLock:
+    """Questions share the index; an index swap waits for them to finish and holds new ones back"""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._swapping = False
+    
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._swapping)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+    
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._swapping)
+            self._swapping = True
+            self._condition.wait_for(lambda: self._readers == 0)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._swapping = False
+                self._condition.notify_all()
+
+# Written next to the vectors so an index is never searched with vectors from another model
+INDEX_MANIFEST = "index_manifest.json"
+
+# One scheduler per process so every RAGCrew (e.g. one per Streamlit session) shares the Ollama slots
+LLM_SCHEDULER = LLMScheduler(
+    max_in_flight=int(os.environ.get("ONBOARDIQ_LLM_MAX_IN_FLIGHT", "2")),
+    metrics=RAGMetrics()
+)
 
 class RAGCrew:
-    def __init__(self, model_name="llama3.2:latest"):
+    # Agent definitions; each agent is created the first time a crew needs it
+    AGENT_PROFILES = {
+        "researcher": {
+            "role": "Research Analyst",
+            "goal": "Analyze and extract relevant information from documents, identify patterns, and gather evidence for analysis",
+            "backstory": "Expert in document analysis, pattern recognition, and evidence gathering. Skilled at identifying relevant information from various document types including CVs, job descriptions, and company records."
+        },
+        "analyst": {
+            "role": "Business Analyst",
+            "goal": "Analyze information, evaluate fit, assess qualifications, and provide detailed reasoning for recommendations",
+            "backstory": "Experienced business analyst with expertise in candidate evaluation, job matching, and strategic analysis. Skilled at evaluating qualifications against requirements and providing evidence-based recommendations."
+        },
+        "writer": {
+            "role": "Recommendation Specialist",
+            "goal": "Generate clear, actionable recommendations and comprehensive responses based on analysis",
+            "backstory": "Expert in creating clear, actionable recommendations and comprehensive responses. Skilled at presenting analysis results in a structured, professional manner with clear reasoning and actionable insights."
+        },
+        "qa_agent": {
+            "role": "Quality Assurance & Validation",
+            "goal": "Verify accuracy, completeness, and validity of analysis and recommendations against source documents",
+            "backstory": "Detail-oriented specialist who ensures high quality output, validates claims against source documents, and ensures recommendations are well-supported by evidence."
+        }
+    }
+    
+    # Model settings and limits per agent; model None means the RAGCrew's model_name.
+    # Extraction and checking work well on a 1-3B model, so only the writer needs the
+    # large one, e.g. agent_models={"researcher": {"model": "llama3.2:1b"}}. timeout is
+    # the agent's wall-clock budget in seconds per question (None: no limit).
+    AGENT_MODEL_DEFAULTS = {
+        "researcher": {"model": None, "temperature": 0.1, "max_tokens": None, "timeout": None},
+        "analyst": {"model": None, "temperature": 0.3, "max_tokens": None, "timeout": None},
+        "writer": {"model": None, "temperature": 0.3, "max_tokens": None, "timeout": None},
+        "qa_agent": {"model": None, "temperature": 0.1, "max_tokens": None, "timeout": None}
+    }
+    
+    def __init__(self, model_name="llama3.2:latest", retrieval_k=4, score_threshold=None,
+                 use_mmr=False, mmr_fetch_k=20, mmr_lambda=0.5, router=None,
+                 base_url="http://localhost:11434", embedding_urls=None, persist_directory="./chroma_db",
+                 trace_path=None, use_opentelemetry=False, metrics_registry=None, scheduler=None,
+                 vector_backend="chroma", vector_dtype="int8", ivf_nlist=None, ivf_nprobe=8,
+                 chunking_profiles=None, embedding_model="nomic-embed-text", agent_models=None,
+                 keep_alive="30m", preload=False, request_timeout=None, request_max_tokens=None,
+                 llm_out_of_context=False, decompose_queries=True, llm_decomposition=False,
+                 context_budget_chars=None, summary_nodes=None, summary_k=2, duplicate_policy="skip",
+                 pdf_extractor="auto", parsed_text_cache=True, extraction_workers=None,
+                 requirement_matched_threshold=0.75, requirement_partial_threshold=0.6):
         self.model_name = model_name
+        
+        # "chroma" keeps vectors in Chroma; "mmap" uses the quantised memory-mapped
+        # MMapVectorIndex (see vector_index.py) for corpora too large for RAM
+        if vector_backend not in ("chroma", "mmap"):
+            raise ValueError(f"Unknown vector backend {vector_backend}; use 'chroma' or 'mmap'")
+        self.vector_backend = vector_backend
+        self.vector_dtype = vector_dtype
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        
+        # Separate endpoint pools for generation and embedding; ONBOARDIQ_OLLAMA_URLS and
+        # ONBOARDIQ_EMBED_URLS (comma-separated) override the constructor arguments. Pools are
+        # shared by every RAGCrew using the same endpoints, like LLM_SCHEDULER
+        generation_urls = urls_from_env("ONBOARDIQ_OLLAMA_URLS", base_url)
+        self.generation_pool = shared_pool(generation_urls, name="generation")
+        self.embedding_pool = shared_pool(
+            urls_from_env("ONBOARDIQ_EMBED_URLS", embedding_urls or generation_urls), name="embedding"
+        )
+        self.base_url = self.generation_pool.urls[0]
         self.vector_store = None
         self.retriever = None
-        self.chroma_persist_directory = "./chroma_db"
+        self.chroma_persist_directory = persist_directory
+        self._base_persist_directory = persist_directory
+        self.source_texts = {}  # source path -> full extracted text
         
-        # Initialize Ollama LLM with LiteLLM-compatible model name
-        self.llm = OllamaLLM(
-            model=f"ollama/{model_name}",  # Add ollama/ prefix for LiteLLM compatibility
-            base_url='http://localhost:11434',
-            temperature=0.3
-        )
+        # PDF text extraction backend and the on-disk cache of parsed pages, keyed by file hash
+        # (see document_loaders.py); the cache sits next to the index directory and survives clearing it
+        self.parsed_text_cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(persist_directory)), "parsed_text_cache"
+        ) if parsed_text_cache else None
+        self.document_loader = DocumentLoader(pdf_extractor, cache_dir=self.parsed_text_cache_dir,
+                                              workers=extraction_workers)
+        self._coverage_report = None
+        self.lexical_index = LexicalIndex()  # corpus term statistics, shipped in snapshots
         
-        # Initialize embeddings with correct model name
-        self.embeddings = OllamaEmbeddings(
-            model=model_name,
-            base_url='http://localhost:11434'
-        )
+        # Title, topics, names and summary per source, built at ingestion; out-of-context replies
+        # are rendered from it by template unless llm_out_of_context asks the LLM to write them
+        self.corpus_profile = CorpusProfile()
+        self.llm_out_of_context = llm_out_of_context
         
-        # Initialize agents with enhanced capabilities
-        self.researcher = Agent(
-            role="Research Analyst",
-            goal="Analyze and extract relevant information from documents, identify patterns, and gather evidence for analysis",
-            backstory="Expert in document analysis, pattern recognition, and evidence gathering. Skilled at identifying relevant information from various document types including CVs, job descriptions, and company records.",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[]
-        )
+        # Chunking profile per document type (see chunking.py); chunking_profiles overrides
+        # individual settings, e.g. {"cv": {"chunk_size": 800}}
+        self.chunking_profiles = {name: dict(profile) for name, profile in CHUNKING_PROFILES.items()}
+        for name, overrides in (chunking_profiles or {}).items():
+            self.chunking_profiles.setdefault(name, {}).update(overrides)
+        self.last_ingestion_report = None
         
-        self.analyst = Agent(
-            role="Business Analyst",
-            goal="Analyze information, evaluate fit, assess qualifications, and provide detailed reasoning for recommendations",
-            backstory="Experienced business analyst with expertise in candidate evaluation, job matching, and strategic analysis. Skilled at evaluating qualifications against requirements and providing evidence-based recommendations.",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[]
-        )
+        # Optional summary tree (see summary_tree.py): None, "extractive" (no LLM) or "llm".
+        # Broad questions retrieve up to summary_k document summaries instead of raw chunks
+        if summary_nodes not in (None, "extractive", "llm"):
+            raise ValueError(f"Unknown summary_nodes {summary_nodes}; use None, 'extractive' or 'llm'")
+        self.summary_nodes = summary_nodes
+        self.summary_k = summary_k
+        self.last_granularity = None
         
-        self.writer = Agent(
-            role="Recommendation Specialist",
-            goal="Generate clear, actionable recommendations and comprehensive responses based on analysis",
-            backstory="Expert in creating clear, actionable recommendations and comprehensive responses. Skilled at presenting analysis results in a structured, professional manner with clear reasoning and actionable insights.",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[]
-        )
+        # Near-duplicate files and chunks (see near_duplicates.py) are collapsed at ingestion:
+        # duplicate_policy "skip", "link_version" or "keep_newest" decides what happens to a file
+        # that nearly repeats one already loaded; None turns detection off
+        if duplicate_policy is not None and duplicate_policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate_policy {duplicate_policy}; "
+                             f"use None or one of {', '.join(DUPLICATE_POLICIES)}")
+        self.duplicate_policy = duplicate_policy
+        self.duplicate_index = NearDuplicateIndex()
+        
+        # Chunks and queries are embedded by a small dedicated model rather than the chat model;
+        # its name is recorded in the index manifest and in snapshots (see migrate_embeddings)
+        self.embedding_model = embedding_model
+        self.migration_status = {"state": "idle"}
+        self._swap_lock = SwapLock()
+        self._index_version = 0  # bumped by every change to the stored chunks
+        
+        # Retrieval settings; all can be overridden per call in query_documents
+        self.retrieval_k = retrieval_k
+        self.score_threshold = score_threshold  # cosine similarity cutoff, None disables it
+        self.use_mmr = use_mmr
+        self.mmr_fetch_k = mmr_fetch_k
+        self.mmr_lambda = mmr_lambda
+        
+        # Questions needing evidence from several documents are split into sub-queries that are
+        # searched concurrently and merged into at most retrieval_k chunks and context_budget_chars
+        # characters (see query_decomposer.py); llm_decomposition lets the LLM split the rest
+        self.query_decomposer = QueryDecomposer()
+        self.decompose_queries = decompose_queries
+        self.llm_decomposition = llm_decomposition
+        self.context_budget_chars = context_budget_chars
+        self.last_decomposition = None
+        
+        # Per-stage and per-agent timing spans, exported as JSON lines when trace_path is set
+        self.tracer = Tracer(export_path=trace_path, use_opentelemetry=use_opentelemetry)
+        
+        # Process-wide counters and histograms (see metrics.start_metrics_server)
+        self.metrics = RAGMetrics(metrics_registry)
+        
+        # LLMs and agents are built on first use (see _llm_for and _agent), so a RAGCrew that
+        # only ingests or retrieves never imports CrewAI. agent_models overrides the model,
+        # temperature or max_tokens of individual agents (see AGENT_MODEL_DEFAULTS).
+        self.agent_models = {name: dict(settings) for name, settings in self.AGENT_MODEL_DEFAULTS.items()}
+        for name, overrides in (agent_models or {}).items():
+            if name not in self.agent_models:
+                raise ValueError(f"Unknown agent {name}; use one of {', '.join(self.agent_models)}")
+            self.agent_models[name].update(overrides)
+        self._scheduler = scheduler
+        self._llms = {}
+        self._agents = {}
+        self._llm_lock = threading.Lock()
+        
+        # How long Ollama keeps the models in memory after a call (Ollama's own default is 5m);
+        # preload=True loads them in the background right away (see warm_up)
+        self.keep_alive = keep_alive
+        self.warm_up_report = None
         
-        self.qa_agent = Agent(
-            role="Quality Assurance & Validation",
-            goal="Verify accuracy, completeness, and validity of analysis and recommendations against source documents",
-            backstory="Detail-oriented specialist who ensures high quality output, validates claims against source documents, and ensures recommendations are well-supported by evidence.",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm,
-            tools=[]
+        # Per-question wall-clock limit (seconds) and output token budget across all agents;
+        # when either runs out the best intermediate output is returned, marked as partial
+        self.request_timeout = request_timeout
+        self.request_max_tokens = request_max_tokens
+        
+        # Ollama clients for the embedding model are created on first request
+        self.embeddings = InstrumentedEmbeddings(
+            PooledOllamaEmbeddings(embedding_model, self.embedding_pool, keep_alive=self.keep_alive),
+            self.metrics
         )
+        
+        # Embed each query once; the vector is shared by retrieval, relevance checks and caching
+        self.query_processor = QueryProcessor(self.embeddings)
+        self.response_cache = SemanticCache()
+        self.min_similarity = 0.2  # below this the best chunk is treated as unrelated
+        
+        # Query router picks fast / standard / analytical / out-of-context handling.
+        # Any object with a route(query, query_vector) method can be plugged in.
+        self.router = router or EmbeddingRouter(self.embeddings)
+        
+        # Deterministic requirement-to-evidence matching for fit assessments; a requirement whose
+        # best evidence scores at least the matched (partial) threshold counts as met (partly met)
+        self.requirement_matcher = RequirementMatcher(self.embeddings, requirement_matched_threshold,
+                                                      requirement_partial_threshold)
+        
+        if preload:
+            self.warm_up()
+    
+    def _llm_for(self, model=None, temperature=0.3, max_tokens=None):
+        """Ollama LLM for one model configuration, shared by every agent that uses it.
+        
+        The wrapper records latency and token counts per call; max_tokens caps
+        the completion length (Ollama's num_predict).
+        """
+        key = (model or self.model_name, temperature, max_tokens)
+        with self._llm_lock:
+            if key not in self._llms:
+                options = {"num_predict": max_tokens} if max_tokens else {}
+                if self.keep_alive is not None:
+                    options["keep_alive"] = self.keep_alive
+                self._llms[key] = _custom_llm_class()(
+                    model_name=key[0],
+                    pool=self.generation_pool,
+                    temperature=temperature,
+                    tracer=self.tracer,
+                    metrics=self.metrics,
+                    scheduler=self._scheduler,
+                    **options
+                )
+            return self._llms[key]
+    
+    @property
+    def llm(self):
+        """LLM at the RAGCrew's model_name, used for single-call answers"""
+        return self._llm_for()
+    
+    def warm_up(self, background=True):
+        """Load the chat, agent and embedding models on every Ollama node before the first question.
+        
+        Load times are stored in warm_up_report ({model: {url: seconds}}) and
+        in the model load metrics. With background=True this returns at once.
+        """
+        def run():
+            start = time.perf_counter()
+            models = {self.model_name} | {self.agent_model(name)["model"] for name in self.AGENT_PROFILES}
+            report = {model: self.generation_pool.preload(model, keep_alive=self.keep_alive) for model in sorted(models)}
+            report[self.embedding_model] = self.embedding_pool.preload(
+                self.embedding_model, keep_alive=self.keep_alive, embedding=True
+            )
+            for model, loads in report.items():
+                for seconds in loads.values():
+                    if seconds is not None:
+                        self.metrics.llm_load_time.observe(seconds, model=model)
+            self.warm_up_report = report
+            print(f"🔥 Preloaded {', '.join(report)} in {time.perf_counter() - start:.1f}s")
+            return report
+        
+        if not background:
+            return run()
+        threading.Thread(target=run, name="ollama-warm-up", daemon=True).start()
+    
+    def agent_model(self, name):
+        """Resolved model, temperature and max_tokens of an agent"""
+        settings = dict(self.agent_models[name])
+        settings["model"] = settings["model"] or self.model_name
+        return settings
+    
+    def _agent(self, name):
+        """Agent for one of AGENT_PROFILES, rebuilt when its model settings change"""
+        settings = self.agent_model(name)
+        llm = self._llm_for(settings["model"], settings["temperature"], settings["max_tokens"])
+        cached = self._agents.get(name)
+        if cached is None or cached[0] is not llm:
+            agent = _crewai().Agent(
+                **self.AGENT_PROFILES[name],
+                verbose=True,
+                allow_delegation=False,
+                llm=llm,
+                tools=[]
+            )
+            cached = self._agents[name] = (llm, agent)
+        return cached[1]
+    
+    @property
+    def researcher(self):
+        return self._agent("researcher")
+    
+    @property
+    def analyst(self):
+        return self._agent("analyst")
+    
+    @property
+    def writer(self):
+        return self._agent("writer")
+    
+    @property
+    def qa_agent(self):
+        return self._agent("qa_agent")
     
     def clear_documents(self):
         """Clear all existing documents and reset the vector store"""
         try:
+            self._index_version += 1
+            if self.vector_backend == "mmap" and self.vector_store:
+                self.vector_store.clear()  # releases the memory maps before the files are removed
             if os.path.exists(self.chroma_persist_directory):
                 shutil.rmtree(self.chroma_persist_directory)
                 print(f"✅ Cleared existing documents from {self.chroma_persist_directory}")
             self.vector_store = None
             self.retriever = None
+            self.source_texts = {}
+            self._coverage_report = None
+            self.lexical_index = LexicalIndex()
+            self.corpus_profile = CorpusProfile()
+            self.duplicate_index = NearDuplicateIndex()
+            self.response_cache.clear()
+            self.metrics.vector_store_chunks.set(0, collection=self._base_persist_directory)
             return True
         except Exception as e:
             print(f"❌ Error clearing documents: {e}")
             return False
     
-    def load_and_process_documents(self, file_paths, clear_existing=True):
-        """Load and process documents into vector embeddings"""
+    def load_and_process_documents(self, file_paths, clear_existing=True, upload_batch=None):
+        """Load and process documents into vector embeddings
+        
+        Every chunk's metadata holds its source, doc_type, upload_batch and,
+        for PDFs, page; these can be used as filters when querying.
+        upload_batch defaults to a new id per call. Near-duplicate files and
+        chunks are collapsed according to duplicate_policy and listed in
+        last_ingestion_report["duplicates"].
+        """
         try:
-            # Clear existing documents if requested
-            if clear_existing:
-                self.clear_documents()
-            
-            documents = []
-            
-            for file_path in file_paths:
+            with self.tracer.trace("ingest", files=len(file_paths)):
+                return self._load_and_process_documents(file_paths, clear_existing, upload_batch)
+        except Exception as e:
+            print(f"❌ Error processing documents: {e}")
+            return False
+    
+    def load_and_process_uploads(self, uploads, clear_existing=True, upload_batch=None):
+        """Load and process files that are already in memory, such as web uploads
+        
+        uploads is a list of (file name, data) pairs, data being bytes, a
+        memoryview or a binary file object; the file names become the sources.
+        Files are parsed from memory where the PDF extractor allows and are
+        otherwise spooled to a temporary directory that is always removed.
+        last_ingestion_report["extraction"]["bytes_copied"] counts the bytes
+        copied on the way. Uploads are keyed by file name, so two uploads with
+        the same name are refused instead of one silently replacing the other.
+        """
+        clashes = duplicate_upload_names(name for name, _ in uploads)
+        if clashes:
+            print(f"❌ Several uploads are named {', '.join(clashes)}; rename them so none is lost")
+            return False
+        contents = {os.path.basename(name): data for name, data in uploads}
+        try:
+            with self.tracer.trace("ingest", files=len(contents), in_memory=True):
+                return self._load_and_process_documents(list(contents), clear_existing, upload_batch, contents)
+        except Exception as e:
+            print(f"❌ Error processing uploads: {e}")
+            return False
+    
+    def _load_and_process_documents(self, file_paths, clear_existing, upload_batch, contents=None):
+        # Clear existing documents if requested
+        if clear_existing:
+            self.clear_documents()
+        self._index_version += 1
+        self._check_index_model()
+        
+        from langchain_community.vectorstores import Chroma
+        
+        with self.tracer.span("load") as span:
+            # (file path, documents loaded from it): one document per PDF page or text file
+            loaded_sources, extraction = self.document_loader.load(file_paths, contents)
+            for file_path, loaded in loaded_sources:
                 print(f"📄 Processing: {os.path.basename(file_path)}")
-                if file_path.endswith('.pdf'):
-                    loader = PyPDFLoader(file_path)
+                self.source_texts[file_path] = "\n".join(doc.page_content for doc in loaded)
+            documents = [doc for _, loaded in loaded_sources for doc in loaded]
+            span["attributes"].update(documents=len(documents), cached_files=extraction["cache_hits"])
+        
+        # New sources invalidate any previously computed coverage table and cached answers
+        self._coverage_report = None
+        self.response_cache.clear()
+        
+        cached = f" ({extraction['cache_hits']} PDFs from the parsed-text cache)" if extraction["cache_hits"] else ""
+        print(f"✅ Loaded {len(documents)} document chunks{cached}")
+        if contents:
+            print(f"📦 Parsed {len(contents)} files from memory ({extraction['bytes_in_memory']} bytes, "
+                  f"{extraction['bytes_copied']} copied, {extraction['spooled_files']} spooled to disk)")
+        self.metrics.ingest_bytes_copied.inc(extraction["bytes_copied"])
+        
+        duplicates = {"policy": self.duplicate_policy, "files": [], "chunks": 0, "chunk_examples": []}
+        versions = {}  # source -> the earlier file it is a version of
+        # Fingerprints of this batch join duplicate_index only once its chunks are stored, so a failed
+        # ingestion can be retried without the files matching themselves
+        pending = NearDuplicateIndex(self.duplicate_index.file_similarity, self.duplicate_index.chunk_distance)
+        if self.duplicate_policy:
+            with self.tracer.span("deduplicate", policy=self.duplicate_policy) as span:
+                loaded_sources, versions = self._collapse_duplicate_files(loaded_sources, duplicates, pending,
+                                                                          contents or {})
+                span["attributes"]["files"] = len(duplicates["files"])
+        
+        # Split each source with the chunking profile of its document type
+        with self.tracer.span("split") as span:
+            splits, source_chunks = [], {}
+            upload_batch = upload_batch or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            report = {"files": [], "chunks": 0, "characters": 0, "by_profile": {}, "upload_batch": upload_batch,
+                      "duplicates": duplicates, "extraction": extraction}
+            for file_path, loaded in loaded_sources:
+                doc_type = detect_document_type(self.source_texts[file_path], file_path)
+                chunks, profile = chunk_source(
+                    loaded, doc_type, self.chunking_profiles, is_pdf=file_path.lower().endswith('.pdf')
+                )
+                if self.duplicate_policy:
+                    chunks = self._collapse_duplicate_chunks(file_path, chunks, duplicates, pending)
+                for chunk in chunks:
+                    chunk.metadata.update(source=file_path, upload_batch=upload_batch, node_type=NODE_CHUNK)
+                    if file_path in versions:
+                        chunk.metadata["version_of"] = versions[file_path]
+                if not chunks:
+                    # Nothing new in this file: every chunk repeats one already stored
+                    self.source_texts.pop(file_path, None)
+                    continue
+                source_chunks[file_path] = chunks
+                splits.extend(chunks)
+                characters = sum(len(chunk.page_content) for chunk in chunks)
+                report["files"].append({
+                    "source": file_path,
+                    "doc_type": doc_type,
+                    "profile": profile,
+                    "pages": len(loaded),
+                    "chunks": len(chunks),
+                    "avg_chunk_chars": round(characters / len(chunks)) if chunks else 0
+                })
+                if file_path in versions:
+                    report["files"][-1]["version_of"] = versions[file_path]
+                report["chunks"] += len(chunks)
+                report["characters"] += characters
+                report["by_profile"][profile] = report["by_profile"].get(profile, 0) + len(chunks)
+            self.last_ingestion_report = report
+            span["attributes"]["chunks"] = len(splits)
+        
+        profile_summary = ", ".join(f"{name}: {count}" for name, count in report["by_profile"].items())
+        print(f"✅ Split into {len(splits)} text chunks ({profile_summary})")
+        if duplicates["files"] or duplicates["chunks"]:
+            print(f"♻️ Collapsed {len(duplicates['files'])} near-duplicate files and {duplicates['chunks']} "
+                  f"near-duplicate chunks ({self.duplicate_policy})")
+        if not splits:
+            self.duplicate_index.merge(pending)
+            print("✅ Nothing new to store")
+            return True
+        
+        # Optional section and document summaries, stored as extra nodes next to the chunks
+        summary_nodes = {}
+        if self.summary_nodes:
+            with self.tracer.span("summarize", method=self.summary_nodes) as span:
+                summary_nodes = self._build_summary_nodes(source_chunks)
+                report["summary_nodes"] = sum(len(nodes) for nodes in summary_nodes.values())
+                span["attributes"]["nodes"] = report["summary_nodes"]
+            print(f"✅ Built {report['summary_nodes']} summary nodes")
+        stored = splits + [node for nodes in summary_nodes.values() for node in nodes]
+        
+        # Create vector store
+        with self.tracer.span("embed_and_store", chunks=len(stored), backend=self.vector_backend):
+            start = time.perf_counter()
+            if self.vector_backend == "mmap":
+                texts = [doc.page_content for doc in stored]
+                vectors = self.embeddings.embed_documents(texts)
+                if self.vector_store is None:
+                    self.vector_store = MMapVectorIndex(
+                        self.chroma_persist_directory,
+                        dtype=self.vector_dtype,
+                        nlist=self.ivf_nlist,
+                        nprobe=self.ivf_nprobe
+                    )
+                self.vector_store.add(texts, [doc.metadata for doc in stored], vectors)
+            else:
+                self.vector_store = Chroma.from_documents(
+                    documents=stored,
+                    embedding=self.embeddings,
+                    persist_directory=self.chroma_persist_directory
+                )
+            elapsed = time.perf_counter() - start
+        if self.vector_backend == "mmap":
+            self.retriever = self.vector_store  # searched directly by _search_by_vector
+        else:
+            self.retriever = self.vector_store.as_retriever(search_kwargs={"k": self.retrieval_k})
+        self.duplicate_index.merge(pending)
+        
+        self.lexical_index.add(doc.page_content for doc in splits)
+        for file_info in report["files"]:
+            entry = self.corpus_profile.add(file_info["source"], self.source_texts[file_info["source"]],
+                                            file_info["doc_type"], self.lexical_index, upload_batch)
+            entry["summary_nodes"] = len(summary_nodes.get(file_info["source"], []))
+            if file_info.get("version_of"):
+                entry["version_of"] = file_info["version_of"]
+        self._record_index_model()
+        
+        self.metrics.ingested_chunks.inc(len(stored))
+        if elapsed > 0:
+            self.metrics.ingestion_rate.set(round(len(stored) / elapsed, 2))
+        self.metrics.vector_store_chunks.set(self.get_document_count(), collection=self._base_persist_directory)
+        
+        print(f"✅ Created vector store with {len(stored)} embeddings")
+        return True
+    
+    def _collapse_duplicate_files(self, loaded_sources, duplicates, pending, in_memory=()):
+        """Apply duplicate_policy to files that nearly repeat one already ingested or earlier in the batch.
+        
+        Signatures of the files kept go into pending, the batch's own NearDuplicateIndex. Returns the
+        files to ingest and, for "link_version", which earlier file each new version belongs to.
+        """
+        kept, versions = [], {}
+        for file_path, loaded in loaded_sources:
+            signature = minhash_signature(self.source_texts[file_path])
+            # In-memory uploads count as modified now
+            modified = time.time() if file_path in in_memory else os.path.getmtime(file_path)
+            match = max(filter(None, (self.duplicate_index.match_file(signature), pending.match_file(signature))),
+                        key=lambda candidate: candidate[1], default=None)
+            action = None
+            if match:
+                original, similarity = match
+                if self.duplicate_policy == POLICY_LINK_VERSION:
+                    if original != file_path:
+                        # Chain versions to the first file, so every version points at the same original
+                        versions[file_path] = versions.get(original) or self.corpus_profile.sources.get(
+                            original, {}).get("version_of") or original
+                    action = "linked"
+                elif (self.duplicate_policy == POLICY_KEEP_NEWEST
+                        and modified >= ((pending.files.get(original) or self.duplicate_index.files[original])
+                                         ["modified"] or 0)):
+                    # The incoming file is newer: the earlier one goes, whether stored or still in this batch
+                    text = self.source_texts[file_path]
+                    if original in pending.files:
+                        kept = [(path, docs) for path, docs in kept if path != original]
+                        pending.remove(original)
+                        self.source_texts.pop(original, None)
+                    else:
+                        self.delete_source(original)
+                    self.source_texts[file_path] = text
+                    action = "replaced"
                 else:
-                    loader = TextLoader(file_path)
-                documents.extend(loader.load())
+                    action = "skipped"
+                duplicates["files"].append({"source": file_path, "duplicate_of": original,
+                                            "similarity": round(similarity, 3), "action": action})
+                self.metrics.near_duplicates.inc(level="file", action=action)
+            if action == "skipped":
+                if original != file_path:
+                    self.source_texts.pop(file_path, None)
+                continue
+            pending.add_file(file_path, signature, modified)
+            kept.append((file_path, loaded))
+        return kept, versions
+    
+    def _collapse_duplicate_chunks(self, file_path, chunks, duplicates, pending):
+        """Drop chunks within a few SimHash bits of a stored chunk or of an earlier one in this batch"""
+        kept = []
+        for chunk in chunks:
+            fingerprint = simhash(chunk.page_content)
+            original = self.duplicate_index.match_chunk(fingerprint)
+            if original is None:
+                original = pending.match_chunk(fingerprint)
+            if original is not None:
+                duplicates["chunks"] += 1
+                if len(duplicates["chunk_examples"]) < 10:
+                    duplicates["chunk_examples"].append({"source": file_path, "duplicate_of": original,
+                                                         "text": chunk.page_content[:120]})
+                self.metrics.near_duplicates.inc(level="chunk", action="skipped")
+                continue
+            pending.add_chunk(file_path, fingerprint)
+            kept.append(chunk)
+        return kept
+    
+    def _build_summary_nodes(self, source_chunks):
+        """Summary nodes per source; LLM summaries run at batch priority, a few sources at a time"""
+        summarize = self._summarize_with_llm if self.summary_nodes == "llm" else None
+        
+        def build(source):
+            return build_summary_nodes(source, source_chunks[source], os.path.basename(source), summarize)
+        
+        if summarize is None:
+            return {source: build(source) for source in source_chunks}
+        context_token = _request_context.set({"tenant": "ingest", "interactive": False, "priority": PRIORITY_BATCH})
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = {source: executor.submit(contextvars.copy_context().run, build, source)
+                           for source in source_chunks}
+                return {source: future.result() for source, future in futures.items()}
+        finally:
+            _request_context.reset(context_token)
+    
+    def _summarize_with_llm(self, texts, kind, name):
+        """LLM summary of a section's chunks or of a document's section summaries"""
+        prompt = f"""Summarize the following {kind} ({name}) in at most {4 if kind == NODE_SECTION else 6} sentences.
+Keep names, dates, numbers, skills and requirements. Do not add anything that is not in the text.
+
+{chr(10).join(texts)}
+"""
+        return str(self.llm.invoke(prompt)).strip()
+    
+    def _has_summary_nodes(self):
+        return any(entry.get("summary_nodes") for entry in self.corpus_profile.sources.values())
+    
+    def node_children(self, node_id):
+        """Documents whose parent is node_id: the sections of a document node, the chunks of a section node"""
+        if not self.vector_store:
+            return []
+        from langchain_core.documents import Document
+        
+        if self.vector_backend == "mmap":
+            texts, metadatas = self.vector_store.get({"parent_id": [node_id]})
+        else:
+            results = self.vector_store.get(where={"parent_id": node_id}, include=["documents", "metadatas"])
+            texts, metadatas = results["documents"], results["metadatas"]
+        return [Document(page_content=text, metadata=dict(metadata or {})) for text, metadata in zip(texts, metadatas)]
+    
+    def query_documents(self, query, k=None, score_threshold=None, use_mmr=None, filters=None, decompose=None):
+        """Retrieve relevant document chunks with their similarity in metadata['relevance_score']
+        
+        filters restricts the search to chunks whose metadata matches, e.g.
+        {"source": "jane_cv.pdf", "doc_type": ["cv", "job_description"]};
+        see METADATA_FILTER_FIELDS. Sources may be given by file name.
+        decompose overrides decompose_queries for this call.
+        """
+        if not self.retriever:
+            raise ValueError("Documents not loaded. Call load_and_process_documents first.")
+        with self._swap_lock.shared():
+            where = self._resolve_filters(filters)
+            processed = self._process_query(query)
+            results = self._retrieve_for_query(query, processed, k, score_threshold, use_mmr, where, decompose)
+            return [doc for doc, _ in results]
+    
+    def _retrieve_for_query(self, query, processed, k=None, score_threshold=None, use_mmr=None, where=None,
+                            decompose=None):
+        """Retrieval for a whole question: sub-queries searched concurrently when it decomposes,
+        merged and deduplicated within retrieval_k chunks and context_budget_chars.
+        
+        With summary nodes in the index, the question's granularity picks
+        document summaries, section summaries or raw chunks; summaries fall
+        back to chunks when none match.
+        """
+        k = k or self.retrieval_k
+        if self._has_summary_nodes() and not (where and "node_type" in where):
+            for level in dict.fromkeys([granularity_for(query), NODE_CHUNK]):
+                level_k = min(k, self.summary_k) if level == NODE_DOCUMENT else k
+                results = self._retrieve_nodes(query, processed, level_k, score_threshold, use_mmr,
+                                               _combine_filters(where, {"node_type": [level]}), decompose)
+                if results:
+                    break
+        else:
+            level = NODE_CHUNK
+            results = self._retrieve_nodes(query, processed, k, score_threshold, use_mmr, where, decompose)
+        self.last_granularity = level
+        request_context = _request_context.get()
+        if request_context and "details" in request_context:
+            request_context["details"]["granularity"] = level
+        return results
+    
+    def _retrieve_nodes(self, query, processed, k, score_threshold, use_mmr, where, decompose):
+        decompose = self.decompose_queries if decompose is None else decompose
+        sub_queries = [{"query": query, "filters": None}]
+        if decompose:
+            with self.tracer.span("decompose") as span:
+                doc_types = {entry["doc_type"] for entry in self.corpus_profile.sources.values()}
+                decomposition = self.query_decomposer.decompose(
+                    query, doc_types, llm=self.llm if self.llm_decomposition else None
+                )
+                sub_queries = decomposition["sub_queries"]
+                span["attributes"].update(sub_queries=len(sub_queries), method=decomposition["method"])
+            self.last_decomposition = decomposition
+            if len(sub_queries) > 1:
+                self.metrics.query_decompositions.inc(method=decomposition["method"])
+                print(f"🪓 Decomposed into {len(sub_queries)} sub-queries: "
+                      f"{'; '.join(sub_query['query'] for sub_query in sub_queries[1:])}")
+        
+        def search(sub_query):
+            sub_where = _combine_filters(where, self._resolve_filters(sub_query["filters"]))
+            if sub_where and not all(sub_where.values()):
+                return []  # the sub-query's scope lies outside the caller's filters
+            vector = processed["vector"] if sub_query["query"] == query else \
+                self._process_query(sub_query["query"])["vector"]
+            return self._retrieve(vector, k, score_threshold, use_mmr, sub_where)
+        
+        if len(sub_queries) == 1:
+            result_lists = [search(sub_queries[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(sub_queries)) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, search, sub_query)
+                           for sub_query in sub_queries]
+                result_lists = [future.result() for future in futures]
+        return _merge_ranked(result_lists, k, self.context_budget_chars)
+    
+    def _resolve_filters(self, filters):
+        """Normalise metadata filters to {field: [values]}, mapping file names to source paths"""
+        if not filters:
+            return None
+        where = {}
+        for field, values in filters.items():
+            if field not in METADATA_FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on {field}; use one of {', '.join(METADATA_FILTER_FIELDS)}")
+            if values is None:
+                continue
+            values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+            if field == "source":
+                known = list(self.source_texts) or self.list_sources()
+                values = sorted({source for source in known for value in values
+                                 if source == value or os.path.basename(source) == value}) or values
+            where[field] = values
+        return where or None
+    
+    def _sources_matching(self, where):
+        """Loaded sources with at least one chunk that can match where, or None when unfiltered"""
+        if not where:
+            return None
+        source_fields = {field: values for field, values in where.items() if field != "page"}
+        return {source for source, entry in self.corpus_profile.sources.items()
+                if metadata_matches(dict(entry, source=source), source_fields)}
+    
+    def _process_query(self, query):
+        """Embed a query through the shared processor and count vector cache hits"""
+        processed = self.query_processor.process(query)
+        self.metrics.cache_requests.inc(cache="query_vector", result="hit" if processed["cached"] else "miss")
+        return processed
+    
+    def _retrieve(self, vector, k=None, score_threshold=None, use_mmr=None, where=None):
+        """Score-aware retrieval within the chunks matching where: optional MMR re-ranking, then a similarity cutoff"""
+        k = k or self.retrieval_k
+        score_threshold = self.score_threshold if score_threshold is None else score_threshold
+        use_mmr = self.use_mmr if use_mmr is None else use_mmr
+        
+        fetch_k = max(k, self.mmr_fetch_k) if use_mmr else k
+        documents, doc_vectors, similarities = self._search_by_vector(vector, fetch_k, where)
+        if not documents:
+            return []
+        
+        if use_mmr:
+            order = _mmr_select(similarities, doc_vectors, k, self.mmr_lambda)
+        else:
+            order = list(np.argsort(-similarities)[:k])
+        
+        results = []
+        for i in order:
+            score = float(similarities[i])
+            if score_threshold is not None and score < score_threshold:
+                continue
+            doc = documents[i]
+            doc.metadata["relevance_score"] = round(score, 3)
+            results.append((doc, score))
+        return results
+    
+    def _search_by_vector(self, vector, k, where=None):
+        """Dense search with a precomputed query vector, restricted to chunks matching where.
+        
+        Returns (documents, normalised document vectors, cosine similarities).
+        """
+        from langchain_core.documents import Document
+        
+        if self.vector_backend == "mmap":
+            texts, metadatas, doc_vectors, similarities = self.vector_store.search(vector, k, where)
+            documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+            return documents, doc_vectors, similarities
+        
+        results = self.vector_store._collection.query(
+            query_embeddings=[vector.tolist()],
+            n_results=k,
+            where=_chroma_where(where) if where else None,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        texts = results["documents"][0]
+        if not texts:
+            return [], np.zeros((0, len(vector)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        doc_vectors = _normalize_vectors(results["embeddings"][0])
+        documents = [
+            Document(page_content=text, metadata=dict(metadata or {}))
+            for text, metadata in zip(texts, results["metadatas"][0])
+        ]
+        return documents, doc_vectors, doc_vectors @ vector
+    
+    def get_document_count(self):
+        """Get the number of documents in the vector store"""
+        if not self.vector_store:
+            return 0
+        if self.vector_backend == "mmap":
+            return self.vector_store.count()
+        return self.vector_store._collection.count()
+    
+    def list_sources(self):
+        """Return the source paths that currently have chunks in the vector store"""
+        if not self.vector_store:
+            return []
+        if self.vector_backend == "mmap":
+            metadatas = self.vector_store.metadatas()
+        else:
+            metadatas = self.vector_store.get(include=["metadatas"])["metadatas"]
+        return sorted({metadata["source"] for metadata in metadatas if metadata and metadata.get("source")})
+    
+    def delete_source(self, source):
+        """Remove every chunk of a source (full path or file name); returns the number of chunks deleted"""
+        matches = [s for s in self.list_sources() if s == source or os.path.basename(s) == source]
+        if not matches:
+            return 0
+        self._index_version += 1
+        if self.vector_backend == "mmap":
+            deleted = self.vector_store.delete_sources(matches)
+        else:
+            ids = self.vector_store.get(where={"source": {"$in": matches}}, include=[])["ids"]
+            if ids:
+                self.vector_store.delete(ids=ids)
+            deleted = len(ids)
+        for match in matches:
+            self.source_texts.pop(match, None)
+            self.corpus_profile.remove(match)
+            self.duplicate_index.remove(match)
+        self.lexical_index = LexicalIndex()
+        for texts, metadatas, _ in self._stored_chunks():
+            # Summary nodes repeat their chunks' words and stay out of the term statistics
+            self.lexical_index.add(text for text, metadata in zip(texts, metadatas)
+                                   if metadata.get("node_type", NODE_CHUNK) == NODE_CHUNK)
+        self._coverage_report = None
+        self.response_cache.clear()
+        self.metrics.vector_store_chunks.set(self.get_document_count(), collection=self._base_persist_directory)
+        print(f"🗑️ Deleted {deleted} chunks from {', '.join(os.path.basename(m) for m in matches)}")
+        return deleted
+    
+    def _stored_chunks(self, block_size=5000):
+        """Yield (texts, metadatas, float32 vectors) blocks of everything in the vector store"""
+        count = self.get_document_count()
+        if self.vector_backend == "mmap":
+            index = self.vector_store
+            metadatas = index.metadatas() if count else []
+            for start in range(0, count, block_size):
+                end = min(start + block_size, count)
+                yield ([index.text(row) for row in range(start, end)],
+                       [dict(metadata) for metadata in metadatas[start:end]],
+                       index.vectors(slice(start, end)))
+            return
+        for start in range(0, count, block_size):
+            results = self.vector_store._collection.get(
+                limit=block_size, offset=start, include=["documents", "metadatas", "embeddings"]
+            )
+            yield (results["documents"], [dict(metadata or {}) for metadata in results["metadatas"]],
+                   np.asarray(results["embeddings"], dtype=np.float32))
+    
+    def export_snapshot(self, path, dtype="float16"):
+        """Write chunks, metadata, vectors, source texts and the lexical index to one file.
+        
+        dtype sets the vector precision in the file: "float16" (default),
+        "int8" or "float32". Returns True on success.
+        """
+        if not self.vector_store or not self.get_document_count():
+            print("❌ Nothing to export: no documents loaded")
+            return False
+        start = time.perf_counter()
+        writer = None
+        try:
+            writer = SnapshotWriter(path)
+            metadata_table, metadata_ids = [], {}
+            offsets, meta_ids, scales = [np.zeros(1, dtype=np.int64)], [], []
             
-            print(f"✅ Loaded {len(documents)} document chunks")
+            def vector_blocks():
+                # First pass streams the vectors and collects the small per-row arrays
+                position = 0
+                for texts, metadatas, vectors in self._stored_chunks():
+                    lengths = np.cumsum([len(text.encode("utf-8")) for text in texts], dtype=np.int64)
+                    offsets.append(position + lengths)
+                    position += int(lengths[-1]) if len(lengths) else 0
+                    ids = []
+                    for metadata in metadatas:
+                        key = json.dumps(metadata, sort_keys=True, default=str)
+                        if key not in metadata_ids:
+                            metadata_ids[key] = len(metadata_table)
+                            metadata_table.append(json.loads(key))
+                        ids.append(metadata_ids[key])
+                    meta_ids.append(np.array(ids, dtype=np.int32))
+                    stored, block_scales = quantize(_normalize_vectors(vectors), dtype)
+                    if block_scales is not None:
+                        scales.append(block_scales)
+                    yield stored
             
-            # Split documents
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            splits = text_splitter.split_documents(documents)
+            def text_blocks():
+                # Second pass streams the chunk texts
+                for texts, _, _ in self._stored_chunks():
+                    yield np.frombuffer("".join(texts).encode("utf-8"), dtype=np.uint8)
+            
+            writer.add_array("vectors", vector_blocks(), STORAGE_DTYPES[dtype])
+            writer.add_array("texts", text_blocks(), np.uint8)
+            writer.add_array("offsets", np.concatenate(offsets), np.int64)
+            writer.add_array("meta_ids", np.concatenate(meta_ids), np.int32)
+            if scales:
+                writer.add_array("scales", np.concatenate(scales), np.float32)
+            writer.close({
+                "embedding_model": self.embedding_model,
+                "vector_dtype": dtype,
+                "rows": self.get_document_count(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "metadata": metadata_table,
+                "source_texts": self.source_texts,
+                "lexical_index": self.lexical_index.to_dict(),
+                "corpus_profile": self.corpus_profile.to_dict(),
+                "near_duplicates": self.duplicate_index.to_dict()
+            })
+        except Exception as e:
+            if writer:
+                writer.abort()
+            print(f"❌ Error exporting snapshot: {e}")
+            return False
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"📦 Exported {self.get_document_count()} chunks to {path} "
+              f"({size_mb:.1f} MB in {time.perf_counter() - start:.1f}s)")
+        return True
+    
+    def import_snapshot(self, path, clear_existing=True, block_size=5000):
+        """Load a snapshot written by export_snapshot without re-embedding anything.
+        
+        The snapshot must come from the same embedding model as this RAGCrew.
+        Its arrays are memory-mapped and streamed into the vector store block
+        by block. Returns True on success.
+        """
+        try:
+            start = time.perf_counter()
+            header, arrays = read_snapshot(path)
+            if header["embedding_model"] != self.embedding_model:
+                print(f"❌ Snapshot was embedded with {header['embedding_model']}, "
+                      f"but this RAGCrew uses {self.embedding_model}")
+                return False
             
-            print(f"✅ Split into {len(splits)} text chunks")
+            if clear_existing:
+                self.clear_documents()
+            self._index_version += 1
+            self._check_index_model()
+            if self.vector_store is None:
+                if self.vector_backend == "mmap":
+                    self.vector_store = MMapVectorIndex(
+                        self.chroma_persist_directory,
+                        dtype=self.vector_dtype,
+                        nlist=self.ivf_nlist,
+                        nprobe=self.ivf_nprobe
+                    )
+                else:
+                    from langchain_community.vectorstores import Chroma
+                    self.vector_store = Chroma(
+                        persist_directory=self.chroma_persist_directory,
+                        embedding_function=self.embeddings
+                    )
             
-            # Create vector store
-            self.vector_store = Chroma.from_documents(
-                documents=splits,
-                embedding=self.embeddings,
-                persist_directory=self.chroma_persist_directory
-            )
-            self.retriever = self.vector_store.as_retriever()
+            vectors, offsets, texts = arrays["vectors"], arrays["offsets"], arrays["texts"]
+            for begin in range(0, header["rows"], block_size):
+                end = min(begin + block_size, header["rows"])
+                block = np.asarray(vectors[begin:end], dtype=np.float32)
+                if "scales" in arrays:
+                    block *= np.asarray(arrays["scales"][begin:end])[:, None]
+                chunk_texts = [bytes(texts[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(begin, end)]
+                metadatas = [dict(header["metadata"][i]) for i in arrays["meta_ids"][begin:end]]
+                if self.vector_backend == "mmap":
+                    # Train the IVF index once at the end rather than while it grows
+                    self.vector_store.add(chunk_texts, metadatas, block, train=False)
+                else:
+                    self.vector_store._collection.add(
+                        ids=[str(uuid.uuid4()) for _ in chunk_texts],
+                        embeddings=block.tolist(),
+                        documents=chunk_texts,
+                        metadatas=[metadata or None for metadata in metadatas]
+                    )
             
-            print(f"✅ Created vector store with {len(splits)} embeddings")
-            return True
+            if self.vector_backend == "mmap":
+                if self.vector_store.count() >= self.vector_store.ivf_min_rows:
+                    self.vector_store.train()
+                self.retriever = self.vector_store
+            else:
+                self.retriever = self.vector_store.as_retriever(search_kwargs={"k": self.retrieval_k})
             
+            self.source_texts.update(header.get("source_texts", {}))
+            self.lexical_index.merge(LexicalIndex.from_dict(header.get("lexical_index", {})))
+            self.corpus_profile.merge(CorpusProfile.from_dict(header.get("corpus_profile", {})))
+            self.duplicate_index.merge(NearDuplicateIndex.from_dict(header.get("near_duplicates", {})))
+            self._record_index_model()
+            self._coverage_report = None
+            self.response_cache.clear()
+            self.metrics.vector_store_chunks.set(self.get_document_count(), collection=self._base_persist_directory)
+            print(f"📥 Imported {header['rows']} chunks from {path} in {time.perf_counter() - start:.1f}s")
+            return True
         except Exception as e:
-            print(f"❌ Error processing documents: {e}")
+            print(f"❌ Error importing snapshot: {e}")
             return False
     
-    def query_documents(self, query):
-        """Retrieve relevant document chunks"""
-        if not self.retriever:
-            raise ValueError("Documents not loaded. Call load_and_process_documents first.")
-        return self.retriever.get_relevant_documents(query)
+    def indexed_embedding_model(self, directory=None):
+        """Embedding model recorded for the index in directory (default: the active one), or None"""
+        path = os.path.join(directory or self.chroma_persist_directory, INDEX_MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f).get("embedding_model")
     
-    def get_document_count(self):
-        """Get the number of documents in the vector store"""
-        if self.vector_store:
-            return len(self.vector_store.get()['documents'])
-        return 0
+    def _record_index_model(self, directory=None, embedding_model=None):
+        directory = directory or self.chroma_persist_directory
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, INDEX_MANIFEST), "w") as f:
+            json.dump({
+                "embedding_model": embedding_model or self.embedding_model,
+                "vector_backend": self.vector_backend,
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            }, f)
+    
+    def _check_index_model(self):
+        """Refuse to add chunks to an index that was embedded with a different model"""
+        recorded = self.indexed_embedding_model()
+        if recorded and recorded != self.embedding_model:
+            raise ValueError(f"The index in {self.chroma_persist_directory} was embedded with {recorded}, "
+                             f"not {self.embedding_model}; clear it or run migrate_embeddings")
+    
+    def migrate_embeddings(self, embedding_model, background=True, block_size=256):
+        """Re-embed every stored chunk with another embedding model.
+        
+        The new index is built in a directory next to the current one while
+        questions keep using the old index; once it is complete the two are
+        swapped in one step and the old directory is removed. Progress is in
+        migration_status. If documents are ingested or deleted meanwhile, the
+        new index is discarded and the migration has to be run again.
+        With background=True this returns as soon as the migration starts.
+        """
+        if self.migration_status["state"] == "running":
+            print("⚠️ An embedding migration is already running")
+            return False
+        if not self.vector_store or not self.get_document_count():
+            # Nothing to re-embed, so switching the model is enough
+            self.embedding_model = embedding_model
+            self.embeddings.embeddings = PooledOllamaEmbeddings(embedding_model, self.embedding_pool,
+                                                                keep_alive=self.keep_alive)
+            self.query_processor.clear()
+            if hasattr(self.router, "reset"):
+                self.router.reset()
+            return True
+        self.migration_status = {
+            "state": "running",
+            "from_model": self.embedding_model,
+            "to_model": embedding_model,
+            "embedded": 0,
+            "total": self.get_document_count()
+        }
+        if not background:
+            return self._migrate_embeddings(embedding_model, block_size)
+        threading.Thread(
+            target=self._migrate_embeddings, args=(embedding_model, block_size),
+            name="embedding-migration", daemon=True
+        ).start()
+        return True
+    
+    def _migrate_embeddings(self, embedding_model, block_size):
+        status = self.migration_status
+        start = time.perf_counter()
+        version = self._index_version
+        old_directory = self.chroma_persist_directory
+        old_store = self.vector_store
+        # Alternate between the configured directory and one sibling so repeated migrations don't pile up
+        base_directory = self._base_persist_directory
+        model_slug = re.sub(r"[^A-Za-z0-9]+", "-", embedding_model).strip("-")
+        new_directory = base_directory if old_directory != base_directory else f"{base_directory}.{model_slug}"
+        shutil.rmtree(new_directory, ignore_errors=True)
+        new_embeddings = PooledOllamaEmbeddings(embedding_model, self.embedding_pool, keep_alive=self.keep_alive)
+        try:
+            with self.tracer.trace("migrate_embeddings", to_model=embedding_model, chunks=status["total"]):
+                embedder = InstrumentedEmbeddings(new_embeddings, self.metrics)
+                if self.vector_backend == "mmap":
+                    store = MMapVectorIndex(new_directory, dtype=self.vector_dtype,
+                                            nlist=self.ivf_nlist, nprobe=self.ivf_nprobe)
+                else:
+                    from langchain_community.vectorstores import Chroma
+                    store = Chroma(persist_directory=new_directory, embedding_function=self.embeddings)
+                for texts, metadatas, _ in self._stored_chunks(block_size):
+                    if self._index_version != version:
+                        break
+                    vectors = embedder.embed_documents(texts)
+                    if self.vector_backend == "mmap":
+                        store.add(texts, metadatas, vectors, train=False)
+                    else:
+                        store._collection.add(
+                            ids=[str(uuid.uuid4()) for _ in texts],
+                            embeddings=[list(vector) for vector in vectors],
+                            documents=texts,
+                            metadatas=[metadata or None for metadata in metadatas]
+                        )
+                    status["embedded"] += len(texts)
+                if self.vector_backend == "mmap" and store.count() >= store.ivf_min_rows:
+                    store.train()
+                self._record_index_model(new_directory, embedding_model)
+                
+                with self._swap_lock.exclusive():
+                    if self._index_version != version:
+                        raise RuntimeError("documents changed during the migration; run it again")
+                    self.vector_store = store
+                    self.retriever = store if self.vector_backend == "mmap" else store.as_retriever(
+                        search_kwargs={"k": self.retrieval_k})
+                    self.chroma_persist_directory = new_directory
+                    self.embedding_model = embedding_model
+                    # Router, requirement matcher and query processor share self.embeddings
+                    self.embeddings.embeddings = new_embeddings
+                    self.query_processor.clear()
+                    self.response_cache.clear()
+                    self._coverage_report = None
+                    if hasattr(self.router, "reset"):
+                        self.router.reset()
+        except Exception as e:
+            if self.vector_backend == "mmap" and "store" in locals():
+                store.clear()
+            shutil.rmtree(new_directory, ignore_errors=True)
+            status.update(state="failed", error=str(e))
+            print(f"❌ Embedding migration to {embedding_model} failed: {e}")
+            return False
+        
+        if self.vector_backend == "mmap":
+            old_store.clear()
+        shutil.rmtree(old_directory, ignore_errors=True)
+        elapsed = time.perf_counter() - start
+        status.update(state="done", directory=new_directory, seconds=round(elapsed, 1))
+        print(f"✅ Re-embedded {status['embedded']} chunks with {embedding_model} in {elapsed:.1f}s; "
+              f"index now in {new_directory}")
+        return True
 
-    def check_relevance(self, query, relevant_docs, threshold=0.3):
+    def assess_requirement_coverage(self, job_text=None, cv_text=None, sources=None):
+        """Match job requirements against CV evidence and return a coverage report.
+        
+        When no texts are given, the first job description and CV among the
+        loaded sources (or among sources, if given) are used. Returns None if
+        either document is missing.
+        """
+        use_loaded_sources = job_text is None and cv_text is None and sources is None
+        if use_loaded_sources and self._coverage_report is not None:
+            return self._coverage_report
+        
+        if job_text is None or cv_text is None:
+            for source, text in self.source_texts.items():
+                if sources is not None and source not in sources:
+                    continue
+                doc_type = detect_document_type(text, source)
+                if doc_type == "job_description" and job_text is None:
+                    job_text = text
+                elif doc_type == "cv" and cv_text is None:
+                    cv_text = text
+        
+        if not job_text or not cv_text:
+            return None
+        
+        report = self.requirement_matcher.match(job_text, cv_text)
+        print(f"✅ Matched {len(report['rows'])} requirements in {report['elapsed_ms']:.0f} ms")
+        
+        if use_loaded_sources:
+            self._coverage_report = report
+        return report
+
+    def check_relevance(self, query, relevant_docs, threshold=0.3, similarities=None):
         """Check if the retrieved documents are relevant to the query"""
         if not relevant_docs:
             return False, "No documents found"
         
+        # Vector similarities from retrieval give a fast negative answer without text scanning
+        if similarities is None:
+            similarities = [doc.metadata["relevance_score"] for doc in relevant_docs
+                            if isinstance(doc.metadata.get("relevance_score"), (int, float))]
+        if similarities:
+            best_similarity = max(similarities)
+            if best_similarity < self.min_similarity:
+                return False, f"Best chunk similarity {best_similarity:.2f} is below {self.min_similarity:.2f}"
+        
         # Check if any document contains the key terms from the query
         query_terms = query.lower().split()
         key_terms = [term for term in query_terms if len(term) > 3]  # Focus on meaningful terms
@@ -172,20 +1972,37 @@ class RAGCrew:
         
         if not is_relevant:
             missing_info = f"Query terms not found in documents: {', '.join(key_terms)}"
+            # The lexical index tells terms missing from the whole corpus apart from unlucky retrieval
+            absent_terms = [term for term in key_terms if not self.lexical_index.contains(term)]
+            if self.lexical_index.chunks and absent_terms:
+                missing_info += f"\nNot in any loaded document: {', '.join(absent_terms)}"
             if named_entities:
                 missing_info += f"\nNamed entities not found: {', '.join(named_entities)}"
             return False, missing_info
         
         return True, f"Relevance score: {relevance_score:.2f}"
 
-    def generate_out_of_context_response(self, query, missing_info):
-        """Generate a response for out-of-context questions"""
+    def generate_out_of_context_response(self, query, missing_info, use_llm=None):
+        """Generate a response for out-of-context questions
+        
+        The reply is assembled from the corpus profile without an LLM call.
+        use_llm=True (default: llm_out_of_context) has the LLM write it instead,
+        from the same profile.
+        """
+        use_llm = self.llm_out_of_context if use_llm is None else use_llm
+        if not use_llm:
+            self.metrics.out_of_context_replies.inc(method="template")
+            return self.corpus_profile.out_of_context_reply(query, missing_info)
+        
         out_of_context_prompt = f"""
         The user asked: "{query}"
         
         However, this information is not available in the uploaded documents. 
         Missing information: {missing_info}
         
+        The uploaded documents are:
+{self.corpus_profile.describe() or "(no documents loaded)"}
+        
         Please provide a helpful response that:
         1. Acknowledges that the requested information is not in the uploaded documents
         2. Explains what information is available in the documents
@@ -196,47 +2013,205 @@ class RAGCrew:
         """
         
         try:
-            # Use the writer agent to generate a helpful response
             response = self.llm.predict(out_of_context_prompt)
+            self.metrics.out_of_context_replies.inc(method="llm")
             return response
         except Exception as e:
-            return f"I apologize, but I cannot find information about '{query}' in the uploaded documents. The documents I have access to don't contain this information. Please check if you have uploaded the correct documents or try asking about information that might be available in the current documents."
+            print(f"⚠️ LLM out-of-context reply failed, using the template: {e}")
+            self.metrics.out_of_context_replies.inc(method="template")
+            return self.corpus_profile.out_of_context_reply(query, missing_info)
+
+    def generate_fast_answer(self, query, document_context):
+        """Answer a simple factual question with a single LLM call instead of a crew"""
+        fast_prompt = f"""{document_context}
+
+Answer the question using ONLY the documents above. Be brief and factual.
+If the documents do not contain the answer, say so.
 
-    def generate_response(self, query):
-        """Generate response using CrewAI agents with enhanced analytical capabilities and out-of-context handling"""
+QUESTION: {query}
+"""
+        return self.llm.invoke(fast_prompt)
+
+    @property
+    def last_trace(self):
+        """Spans of the most recently completed request, for timing displays"""
+        return self.tracer.last_trace
+
+    def generate_response(self, query, tenant="default", interactive=True, timeout=None, max_tokens=None,
+                          filters=None, return_details=False, k=None, score_threshold=None, progress=None):
+        """Generate response using CrewAI agents with enhanced analytical capabilities and out-of-context handling
+        
+        tenant and interactive feed the LLM scheduler: batch jobs should pass
+        interactive=False so they never delay users' questions. timeout and
+        max_tokens override request_timeout and request_max_tokens; when a
+        limit runs out the answer starts with PARTIAL_ANSWER_MARKER. filters,
+        k and score_threshold shape the retrieval, as in query_documents.
+        
+        With return_details=True a dict is returned instead of the answer:
+        {"answer", "route", "route_decision", "partial", "documents",
+        "granularity"}. route is "cached" for a reused answer, partial is None
+        or the reason, message and stage of a cut-short answer, and documents
+        are the chunks the answer was built from. The details belong to this
+        call alone, so concurrent questions on one RAGCrew never see each
+        other's. progress, if given, is called from the answering thread with
+        an event dict as each stage finishes ("route", "retrieved", "agent").
+        """
         if not self.retriever:
             raise ValueError("Documents not loaded. Call load_and_process_documents first.")
         
+        self.metrics.questions.inc()
+        start = time.perf_counter()
+        timeout = self.request_timeout if timeout is None else timeout
+        details = {"answer": None, "route": "cached", "route_decision": None, "partial": None, "documents": [],
+                   "granularity": None}
+        context_token = _request_context.set({
+            "tenant": tenant,
+            "interactive": interactive,
+            "priority": PRIORITY_INTERACTIVE if interactive else PRIORITY_BATCH,
+            "timeout": timeout,
+            "deadline": start + timeout if timeout else None,
+            "max_tokens": self.request_max_tokens if max_tokens is None else max_tokens,
+            "tokens_used": 0,
+            "details": details,
+            "progress": progress
+        })
+        try:
+            with self._swap_lock.shared(), self.tracer.trace("generate_response", query=query) as trace:
+                result = self._generate_response(query, trace, self._resolve_filters(filters), k, score_threshold)
+        finally:
+            _request_context.reset(context_token)
+        route = trace.get("route", "cached")
+        self.metrics.routes.inc(route=route)
+        self.metrics.question_latency.observe(time.perf_counter() - start, route=route)
+        details["answer"] = result
+        return details if return_details else result
+
+    def _report(self, request_context, event, **data):
+        """Record details of the running request and pass them to the caller's progress callback"""
+        if event != "agent":
+            request_context["details"].update(data)
+        if request_context.get("progress"):
+            request_context["progress"](dict(data, event=event))
+    
+    def _generate_response(self, query, trace, where=None, k=None, score_threshold=None):
+        request_context = _request_context.get()
+        # Embed the query once and reuse the vector for caching and retrieval
+        with self.tracer.span("embed_query") as span:
+            processed = self._process_query(query)
+            span["attributes"]["cached"] = processed["cached"]
+        with self.tracer.span("cache_lookup") as span:
+            # Answers retrieved with other filters, k or cutoff are cached apart
+            scope = {name: value for name, value in (("filters", where), ("k", k), ("score_threshold", score_threshold))
+                     if value is not None}
+            scope = json.dumps(scope, sort_keys=True) if scope else None
+            cached = self.response_cache.lookup(processed["vector"], query, scope)
+            span["attributes"]["hit"] = cached is not None
+        self.metrics.cache_requests.inc(cache="response", result="hit" if cached else "miss")
+        if cached:
+            entry, similarity, cached_query = cached
+            print(f"♻️ Reusing answer for similar question ({similarity:.2f}): {cached_query}")
+            request_context["details"]["documents"] = entry["documents"]
+            return entry["answer"]
+        
+        def remember(response, documents=()):
+            self.response_cache.store(processed["vector"], query, {"answer": response, "documents": list(documents)},
+                                      scope)
+            return response
+        
+        # Route the query; the route decides how much LLM work the answer gets
+        with self.tracer.span("route") as span:
+            route_decision = self.router.route(query, processed["vector"])
+            span["attributes"].update(route=route_decision["route"], method=route_decision["method"])
+        request_context["priority"] = _route_priority(route_decision["route"], request_context["interactive"])
+        print(f"🧭 Route: {route_decision['route']} ({route_decision['method']}, "
+              f"confidence {route_decision['confidence']:.2f})")
+        
+        # The router only compares the question with generic exemplars, so an out-of-context
+        # guess is accepted only once retrieval finds nothing relevant in the documents either
+        router_out_of_context = route_decision["route"] == ROUTE_OUT_OF_CONTEXT
+        
         # Retrieve relevant documents for the query
-        relevant_docs = self.query_documents(query)
+        with self.tracer.span("retrieve") as span:
+            relevant_docs = [doc for doc, _ in self._retrieve_for_query(query, processed, k, score_threshold, where=where)]
+            span["attributes"]["chunks"] = len(relevant_docs)
         
         # Check if the retrieved documents are relevant to the query
-        is_relevant, relevance_info = self.check_relevance(query, relevant_docs)
+        with self.tracer.span("check_relevance") as span:
+            is_relevant, relevance_info = self.check_relevance(query, relevant_docs)
+            span["attributes"]["relevant"] = is_relevant
         
         if not is_relevant:
             print(f"⚠️ Out-of-context query detected: {query}")
             print(f"📊 Relevance info: {relevance_info}")
-            return self.generate_out_of_context_response(query, relevance_info)
+            trace["route"] = ROUTE_OUT_OF_CONTEXT
+            self._report(request_context, "route", route=ROUTE_OUT_OF_CONTEXT, route_decision=dict(
+                route_decision, route=ROUTE_OUT_OF_CONTEXT,
+                method=route_decision["method"] if router_out_of_context else "relevance"))
+            request_context["priority"] = _route_priority(ROUTE_OUT_OF_CONTEXT, request_context["interactive"])
+            with self.tracer.span("out_of_context"):
+                response = self.generate_out_of_context_response(query, relevance_info)
+            return remember(response)
+        if router_out_of_context:
+            # Rules pick the depth of the answer, since the exemplars already judged the question unlike the others
+            fallback = getattr(self.router, "fallback", None) or KeywordRouter()
+            route_decision = dict(route_decision, route=fallback.route(query)["route"], method="relevance_override")
+            print(f"🧭 Documents answer the question after all, rerouted to {route_decision['route']}")
+        trace["route"] = route_decision["route"]
+        self._report(request_context, "route", route=route_decision["route"], route_decision=route_decision)
+        request_context["priority"] = _route_priority(route_decision["route"], request_context["interactive"])
+        self._report(request_context, "retrieved", documents=relevant_docs)
         
-        # Format the retrieved documents for context
-        document_context = "\n\n".join([f"Document {i+1}:\n{doc.page_content}" for i, doc in enumerate(relevant_docs)])
+        # One documents block shared verbatim by every prompt of this question (see format_document_context)
+        document_context = format_document_context(relevant_docs)
         
-        # Determine if this is an analytical/recommendation query
-        analytical_keywords = [
-            'recommend', 'recommendation', 'fit', 'suitable', 'appropriate', 'evaluate', 'assessment',
-            'analysis', 'compare', 'match', 'experience', 'worked', 'employment', 'qualifications',
-            'skills', 'requirements', 'candidate', 'position', 'job', 'role', 'company', 'employer'
-        ]
+        if route_decision["route"] == ROUTE_FAST:
+            with self.tracer.span("fast_answer"):
+                try:
+                    response = self._run_within_deadline(
+                        lambda: self.generate_fast_answer(query, document_context), request_context
+                    )
+                except RequestLimitExceeded as e:
+                    return self._partial_response(e, [], request_context, trace)
+            return remember(response, relevant_docs)
         
-        is_analytical = any(keyword in query.lower() for keyword in analytical_keywords)
+        is_analytical = route_decision["route"] == ROUTE_ANALYTICAL
+        crewai = _crewai()
+        Task, Crew, Process = crewai.Task, crewai.Crew, crewai.Process
+        
+        # Sequential tasks: each one runs from the previous task's end to its own callback,
+        # which also keeps its output in case a later task runs out of time
+        task_agents = ["researcher", "analyst", "writer", "qa_agent"] if is_analytical else ["researcher", "writer", "qa_agent"]
+        completed = []  # (agent role, output) of finished tasks
+        task_marks = [time.perf_counter()]
+        def task_timer(task_output):
+            now = time.perf_counter()
+            self.tracer.record_span(f"task:{task_output.agent}", task_marks[0], now)
+            self.metrics.agent_latency.observe(now - task_marks[0], agent=task_output.agent)
+            task_marks[0] = now
+            completed.append((task_output.agent, str(getattr(task_output, "raw", task_output))))
+            self._report(request_context, "agent", agent=task_output.agent)
+            if len(completed) < len(task_agents):
+                self._start_agent_clock(request_context, task_agents[len(completed)])
         
         if is_analytical:
+            # A precomputed coverage table replaces most of the analyst's matching work
+            with self.tracer.span("requirement_coverage"):
+                coverage_report = self.assess_requirement_coverage(sources=self._sources_matching(where))
+            coverage_context = ""
+            if coverage_report and coverage_report["rows"]:
+                coverage_context = f"""
+REQUIREMENT COVERAGE TABLE (computed from document embeddings):
+{format_coverage_table(coverage_report)}
+
+Treat the table as the authoritative requirement-by-requirement match. Do not re-derive it;
+interpret it, weigh the missing and partial items, and cite the supporting evidence it lists.
+"""
+            
             # Enhanced analytical workflow for recommendations and evaluations
             research_task = Task(
-                description=f"""Analyze the following documents and extract ALL relevant information for: {query}
+                description=f"""{document_context}
 
-DOCUMENTS:
-{document_context}
+Analyze the documents above and extract ALL relevant information for: {query}
 
 Focus on:
 1. Specific qualifications, skills, and experiences
@@ -254,7 +2229,7 @@ Extract information that could be relevant for evaluation, comparison, or recomm
 
             analysis_task = Task(
                 description=f"""Based on the research findings, conduct a thorough analysis for: {query}
-
+{coverage_context}
 Consider:
 1. How well do the qualifications match the requirements?
 2. What are the strengths and weaknesses?
@@ -287,10 +2262,9 @@ Make your response actionable and well-supported by evidence.""",
             )
 
             qa_task = Task(
-                description=f"""Verify the accuracy and completeness of the analysis and recommendations against the original documents.
+                description=f"""{document_context}
 
-ORIGINAL DOCUMENTS:
-{document_context}
+Verify the accuracy and completeness of the analysis and recommendations against the documents above.
 
 Ensure:
 1. All claims are supported by evidence from the documents
@@ -309,16 +2283,16 @@ Ensure:
                 agents=[self.researcher, self.analyst, self.writer, self.qa_agent],
                 tasks=[research_task, analysis_task, recommendation_task, qa_task],
                 process=Process.sequential,
-                verbose=True
+                verbose=True,
+                task_callback=task_timer
             )
 
         else:
             # Standard information retrieval workflow
             research_task = Task(
-                description=f"""Analyze the following documents and extract relevant information about: {query}
+                description=f"""{document_context}
 
-DOCUMENTS:
-{document_context}
+Analyze the documents above and extract relevant information about: {query}
 
 Focus only on information that is explicitly stated in these documents. Do not use external knowledge.""",
                 agent=self.researcher,
@@ -337,10 +2311,9 @@ Use ONLY the information from the research findings. Do not add external knowled
             )
 
             qa_task = Task(
-                description=f"""Verify the accuracy and completeness of the response against the original documents.
+                description=f"""{document_context}
 
-ORIGINAL DOCUMENTS:
-{document_context}
+Verify the accuracy and completeness of the response against the documents above.
 
 Ensure the response is factually accurate and complete based on the source documents.""",
                 agent=self.qa_agent,
@@ -354,9 +2327,67 @@ Ensure the response is factually accurate and complete based on the source docum
                 agents=[self.researcher, self.writer, self.qa_agent],
                 tasks=[research_task, writing_task, qa_task],
                 process=Process.sequential,
-                verbose=True
+                verbose=True,
+                task_callback=task_timer
             )
 
-        result = crew.kickoff()
-        return result
+        with self.tracer.span("crew", route=route_decision["route"]) as span:
+            task_marks[0] = time.perf_counter()
+            self._start_agent_clock(request_context, task_agents[0])
+            try:
+                result = self._run_within_deadline(crew.kickoff, request_context)
+            except Exception as e:
+                # CrewAI may wrap the limit error; the request context says whether a limit caused it
+                if not request_context.get("expired"):
+                    raise
+                span["attributes"]["partial"] = request_context["expired"][0]
+                return self._partial_response(e, completed, request_context, trace)
+            if request_context.get("expired"):
+                # The crew swallowed the limit error, so its final output is not trustworthy
+                return self._partial_response(None, completed, request_context, trace)
+        return remember(result, relevant_docs)
+    
+    def _start_agent_clock(self, request_context, name):
+        """Start the wall-clock budget of the agent whose task runs next"""
+        timeout = self.agent_models[name].get("timeout")
+        request_context.update(
+            agent_role=self.AGENT_PROFILES[name]["role"],
+            agent_timeout=timeout,
+            agent_deadline=time.perf_counter() + timeout if timeout else None
+        )
+    
+    def _run_within_deadline(self, fn, request_context):
+        """Run fn, giving up at the request deadline even if an LLM call is still waiting for Ollama.
+        
+        fn runs in a worker thread with a copy of the current context; once the
+        deadline passes, its remaining LLM calls fail fast.
+        """
+        if not request_context.get("deadline"):
+            return fn()
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(contextvars.copy_context().run, fn)
+        executor.shutdown(wait=False)
+        try:
+            return future.result(timeout=max(0.0, request_context["deadline"] - time.perf_counter()))
+        except FutureTimeoutError:
+            request_context["expired"] = ("deadline", f"time limit of {request_context['timeout']:g}s reached")
+            raise RequestLimitExceeded(*request_context["expired"])
+    
+    def _partial_response(self, error, completed, request_context, trace):
+        """Best intermediate output of a request that ran out of time or tokens, marked as partial"""
+        kind, reason = request_context.get("expired") or (getattr(error, "kind", "deadline"), str(error))
+        if completed:
+            stage, text = completed[-1]
+            shown = f"showing the {stage}'s output; later steps did not finish"
+        elif request_context.get("partial_output"):
+            stage, text = request_context.get("agent_role"), request_context["partial_output"]
+            shown = "showing an unfinished draft"
+        else:
+            stage, text = None, "No step finished in time. Ask a narrower question or raise the limit."
+            shown = "nothing to show yet"
+        request_context["details"]["partial"] = {"reason": kind, "message": reason, "stage": stage}
+        trace["partial"] = kind
+        self.metrics.partial_answers.inc(reason=kind)
+        print(f"⏱️ Returning a partial answer: {reason}")
+        return f"{PARTIAL_ANSWER_MARKER} ({reason}; {shown})\n\n{text}"
     
\ No newline at end of file
@@ -0,0 +1,193 @@
+# requirement_matcher.py
+import re
+import time
+
+import numpy as np
+
+# Headings in a job description whose bullet points are treated as requirements
+REQUIREMENT_HEADINGS = [
+    'requirements', 'required', 'qualifications', 'preferred qualifications',
+    'responsibilities', 'must have', 'nice to have', 'what you bring',
+    'skills', 'experience'
+]
+
+# Headings in a job description that never contain requirements
+IGNORED_HEADINGS = ['benefits', 'perks', 'about us', 'company', 'location', 'salary']
+
+BULLET_PATTERN = re.compile(r'^\s*(?:[-*•▪◦●]|\d+[.)])\s+')
+HEADING_PATTERN = re.compile(r'^\s*([A-Z][A-Za-z &/()\'-]{2,60}):?\s*$')
+
+
+def _clean_line(line):
+    """Strip bullet markers and surrounding whitespace from a line"""
+    return BULLET_PATTERN.sub('', line).strip()
+
+
+def heading_of(line):
+    """Return the normalised heading text if the line looks like a section heading"""
+    stripped = line.strip()
+    if not stripped or BULLET_PATTERN.match(stripped):
+        return None
+    match = HEADING_PATTERN.match(stripped)
+    if not match:
+        return None
+    text = match.group(1).strip()
+    # Headings are either ALL CAPS or end with a colon ("Skills:")
+    if text.isupper() or stripped.endswith(':'):
+        return text.lower()
+    return None
+
+
+def split_requirements(job_text):
+    """Split a job description into individual requirement items"""
+    requirements = []
+    current_heading = None
+    fallback_bullets = []
+
+    for raw_line in job_text.splitlines():
+        heading = heading_of(raw_line)
+        if heading is not None:
+            current_heading = heading
+            continue
+
+        line = _clean_line(raw_line)
+        if len(line.split()) < 2:
+            continue
+
+        is_bullet = bool(BULLET_PATTERN.match(raw_line))
+        if current_heading and any(h in current_heading for h in IGNORED_HEADINGS):
+            continue
+        if current_heading and any(h in current_heading for h in REQUIREMENT_HEADINGS):
+            requirements.append({"text": line, "section": current_heading})
+        elif is_bullet:
+            fallback_bullets.append({"text": line, "section": current_heading or "general"})
+
+    # Job descriptions without recognisable headings: use every bullet point
+    return requirements or fallback_bullets
+
+
+def split_evidence(cv_text, min_words=3):
+    """Split a CV into evidence items (bullets, skill lines and role headers)"""
+    evidence = []
+    current_heading = "general"
+    entry_title = None
+    new_block = True
+
+    for raw_line in cv_text.splitlines():
+        heading = heading_of(raw_line)
+        if heading is not None:
+            current_heading = heading
+            entry_title = None
+            new_block = True
+            continue
+
+        line = _clean_line(raw_line)
+        if not line:
+            new_block = True
+            continue
+
+        is_bullet = bool(BULLET_PATTERN.match(raw_line))
+        if not is_bullet and new_block:
+            # First line of a block is the entry title (e.g. the job title of a role)
+            entry_title = line
+        new_block = False
+
+        if len(line.split()) >= min_words or ':' in line:
+            # Attach the entry title to bullets so evidence keeps its context
+            text = f"{line} ({entry_title})" if is_bullet and entry_title else line
+            evidence.append({"text": text, "section": current_heading})
+
+    return evidence
+
+
+class RequirementMatcher:
+    """Deterministic requirement-to-evidence matching using one embedding batch"""
+
+    def __init__(self, embeddings, matched_threshold=0.75, partial_threshold=0.6):
+        if partial_threshold > matched_threshold:
+            raise ValueError(f"partial_threshold {partial_threshold} is above matched_threshold {matched_threshold}")
+        self.embeddings = embeddings
+        self.matched_threshold = matched_threshold
+        self.partial_threshold = partial_threshold
+
+    def similarity_matrix(self, requirement_texts, evidence_texts):
+        """Embed both sides in a single batch and return the cosine similarity matrix"""
+        vectors = np.asarray(
+            self.embeddings.embed_documents(list(requirement_texts) + list(evidence_texts)),
+            dtype=np.float32
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        split = len(requirement_texts)
+        return vectors[:split] @ vectors[split:].T
+
+    def match(self, job_text, cv_text):
+        """Build a coverage report for the requirements of job_text against cv_text"""
+        start = time.perf_counter()
+        requirements = split_requirements(job_text)
+        evidence = split_evidence(cv_text)
+
+        if not requirements or not evidence:
+            return {
+                "rows": [],
+                "summary": {"matched": 0, "partial": 0, "missing": len(requirements), "coverage": 0.0},
+                "elapsed_ms": (time.perf_counter() - start) * 1000
+            }
+
+        matrix = self.similarity_matrix(
+            [r["text"] for r in requirements],
+            [e["text"] for e in evidence]
+        )
+        best_idx = matrix.argmax(axis=1)
+        best_scores = matrix[np.arange(len(requirements)), best_idx]
+
+        statuses = np.where(
+            best_scores >= self.matched_threshold, "matched",
+            np.where(best_scores >= self.partial_threshold, "partial", "missing")
+        )
+
+        rows = []
+        for i, requirement in enumerate(requirements):
+            status = str(statuses[i])
+            supporting = evidence[int(best_idx[i])]
+            rows.append({
+                "requirement": requirement["text"],
+                "section": requirement["section"],
+                "status": status,
+                "score": float(best_scores[i]),
+                "evidence": supporting["text"] if status != "missing" else None,
+                "evidence_section": supporting["section"] if status != "missing" else None
+            })
+
+        matched = int((statuses == "matched").sum())
+        partial = int((statuses == "partial").sum())
+        missing = int((statuses == "missing").sum())
+        coverage = (matched + 0.5 * partial) / len(requirements)
+
+        return {
+            "rows": rows,
+            "summary": {"matched": matched, "partial": partial, "missing": missing, "coverage": coverage},
+            "elapsed_ms": (time.perf_counter() - start) * 1000
+        }
+
+
+def format_coverage_table(report):
+    """Render a coverage report as a markdown table for prompts and the UI"""
+    status_icons = {"matched": "✅ matched", "partial": "🟡 partial", "missing": "❌ missing"}
+    lines = [
+        "| Requirement | Status | Score | Supporting evidence |",
+        "|---|---|---|---|"
+    ]
+    for row in report["rows"]:
+        evidence = (row["evidence"] or "—").replace("|", "/")
+        lines.append(
+            f"| {row['requirement'].replace('|', '/')} | {status_icons[row['status']]} "
+            f"| {row['score']:.2f} | {evidence} |"
+        )
+    summary = report["summary"]
+    lines.append("")
+    lines.append(
+        f"**Coverage:** {summary['coverage']:.0%} "
+        f"({summary['matched']} matched, {summary['partial']} partial, {summary['missing']} missing)"
+    )
+    return "\n".join(lines)
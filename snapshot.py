@@ -0,0 +1,107 @@
+# snapshot.py
+"""
+Single-file container for a processed index.
+
+Layout: an 8-byte magic and format version, the raw arrays back to back
+(each aligned to 64 bytes so it can be memory-mapped in place), a JSON
+header describing the arrays and any other state, and a trailer holding
+the header's offset and length. Arrays can be written block by block, so
+neither exporting nor importing has to hold the whole corpus in memory.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"ONBIQSNP"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+TRAILER = struct.Struct("<QQ8s")  # header offset, header length, magic
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a readable snapshot"""
+
+
+class SnapshotWriter:
+    """Write arrays and a JSON header into one snapshot file.
+
+    The file is written next to path and moved into place on close, so a
+    failed export never leaves a truncated snapshot behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._temp_path = f"{path}.partial"
+        self._file = open(self._temp_path, "wb")
+        self._arrays = {}
+        try:
+            self._file.write(MAGIC + struct.pack("<II", FORMAT_VERSION, 0))
+        except Exception:
+            self.abort()
+            raise
+
+    def _align(self):
+        padding = -self._file.tell() % ALIGNMENT
+        self._file.write(b"\0" * padding)
+
+    def add_array(self, name, blocks, dtype):
+        """Append an array given as one array or an iterable of row blocks with matching trailing shape"""
+        if isinstance(blocks, np.ndarray):
+            blocks = [blocks]
+        self._align()
+        offset = self._file.tell()
+        rows, trailing = 0, None
+        for block in blocks:
+            block = np.ascontiguousarray(block, dtype=dtype)
+            trailing = block.shape[1:] if trailing is None else trailing
+            rows += len(block)
+            self._file.write(block.tobytes())
+        self._arrays[name] = {
+            "offset": offset,
+            "dtype": np.dtype(dtype).str,
+            "shape": [rows] + list(trailing or ())
+        }
+
+    def close(self, header):
+        """Write the header and trailer and move the file into place"""
+        header = dict(header, format_version=FORMAT_VERSION, arrays=self._arrays)
+        body = json.dumps(header).encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(body)
+        self._file.write(TRAILER.pack(offset, len(body), MAGIC))
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+def read_snapshot(path):
+    """Return (header, arrays) for a snapshot; arrays are read-only memory maps"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC or size < len(MAGIC) + 8 + TRAILER.size:
+            raise SnapshotError(f"{path} is not an index snapshot")
+        version, _ = struct.unpack("<II", f.read(8))
+        if version > FORMAT_VERSION:
+            raise SnapshotError(f"Snapshot format {version} is newer than supported ({FORMAT_VERSION})")
+        f.seek(size - TRAILER.size)
+        offset, length, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is truncated")
+        f.seek(offset)
+        header = json.loads(f.read(length))
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if not shape[0]:
+            arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+            continue
+        arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=spec["offset"], shape=shape)
+    return header, arrays
@@ -0,0 +1,118 @@
+# summary_tree.py
+"""
+Summary nodes over the chunks of a document.
+
+An optional ingestion stage groups each source's chunks into sections (by
+section heading, else by PDF page, else a few consecutive chunks) and adds
+one summary node per section and one per document. They are stored in the
+vector store next to the raw chunks: every node's metadata has a node_type
+("chunk", "section" or "document"), and chunks and sections carry the
+parent_id of the node above them. Broad questions ("summarize this
+candidate") are answered from the document node, questions about a part of
+a document from section nodes, and everything else from raw chunks.
+"""
+
+from corpus_profile import shorten
+from requirement_matcher import BULLET_PATTERN
+import re
+
+NODE_CHUNK = "chunk"
+NODE_SECTION = "section"
+NODE_DOCUMENT = "document"
+
+SECTION_SUMMARY_CHARS = 600
+DOCUMENT_SUMMARY_CHARS = 1200
+
+# Questions about a whole document, and about one part of it
+DOCUMENT_QUESTION_PATTERN = re.compile(
+    r'\b(summari[sz]e|summary|overview|overall|in general|in short|tl;?dr|what (?:does|do) (?:the |this |these )?'
+    r'\w+(?: \w+)? (?:cover|contain|say overall)|what is (?:this|the) (?:document|file|handbook|policy) about|'
+    r'tell me about (?:the |this )?(?:candidate|document|handbook|role|job)|describe (?:the |this )?(?:candidate|document|role|job))\b',
+    re.IGNORECASE
+)
+SECTION_QUESTION_PATTERN = re.compile(
+    r'\b(section|chapter|part|sections|chapters|parts|outline|main points|key points|highlights)\b',
+    re.IGNORECASE
+)
+
+
+def granularity_for(query):
+    """"document", "section" or "chunk": the node level that best answers query"""
+    if DOCUMENT_QUESTION_PATTERN.search(query):
+        return NODE_DOCUMENT
+    if SECTION_QUESTION_PATTERN.search(query):
+        return NODE_SECTION
+    return NODE_CHUNK
+
+
+def extractive_summary(texts, limit):
+    """Lead sentence of each line, every text getting an equal share of limit characters"""
+    share = max(limit // max(len(texts), 1), 120)
+    pieces = []
+    for text in texts:
+        piece = ""
+        for line in text.splitlines():
+            line = BULLET_PATTERN.sub("", line).strip()
+            if not line:
+                continue
+            sentence = re.split(r"(?<=[.!?])\s+", line, maxsplit=1)[0].rstrip(".:")
+            if piece and len(piece) + len(sentence) + 2 > share:
+                break
+            piece = f"{piece}; {sentence}" if piece else sentence
+        if piece:
+            pieces.append(piece + ".")
+    return shorten(" ".join(pieces), limit)
+
+
+def _body(chunk):
+    """Chunk text without the section heading that section-profile chunks start with"""
+    if chunk.metadata.get("section"):
+        return chunk.page_content.split("\n", 1)[-1]
+    return chunk.page_content
+
+
+def _section_key(chunk, position, chunks_per_section):
+    metadata = chunk.metadata
+    if metadata.get("section"):
+        return metadata["section"]
+    if isinstance(metadata.get("page"), int):
+        return f"page {metadata['page'] + 1}"
+    return f"part {position // chunks_per_section + 1}"
+
+
+def build_summary_nodes(source, chunks, title, summarize=None, chunks_per_section=4):
+    """Section and document summary nodes (Documents) for one source's chunks.
+
+    Sets node_type and parent_id on the chunks in place. summarize(texts,
+    kind, name) returns the summary of a list of texts, kind being
+    "section" or "document"; the default is extractive and needs no LLM.
+    """
+    from langchain_core.documents import Document
+
+    summarize = summarize or (lambda texts, kind, name: extractive_summary(
+        texts, SECTION_SUMMARY_CHARS if kind == NODE_SECTION else DOCUMENT_SUMMARY_CHARS))
+    document_id = f"{source}#document"
+    sections = {}  # section name -> chunks, in document order
+    for position, chunk in enumerate(chunks):
+        sections.setdefault(_section_key(chunk, position, chunks_per_section), []).append(chunk)
+
+    nodes, section_summaries = [], []
+    for index, (name, members) in enumerate(sections.items()):
+        section_id = f"{source}#section{index}"
+        for chunk in members:
+            chunk.metadata.update(node_type=NODE_CHUNK, parent_id=section_id)
+        summary = summarize([_body(chunk) for chunk in members], NODE_SECTION, name)
+        section_summaries.append((name, summary))
+        metadata = {key: value for key, value in members[0].metadata.items() if key not in ("section", "page")}
+        metadata.update(node_type=NODE_SECTION, node_id=section_id, parent_id=document_id,
+                        section=name, children=len(members))
+        nodes.append(Document(page_content=f"Summary of {name} in {title}:\n{summary}", metadata=metadata))
+
+    if nodes:
+        summary = summarize([f"{name}: {summary}" for name, summary in section_summaries], NODE_DOCUMENT, title)
+        metadata = {key: value for key, value in nodes[0].metadata.items() if key not in ("section", "parent_id")}
+        metadata.update(node_type=NODE_DOCUMENT, node_id=document_id, children=len(nodes))
+        outline = ", ".join(name for name, _ in section_summaries)
+        nodes.append(Document(page_content=f"Summary of {title} (sections: {outline}):\n{summary}",
+                              metadata=metadata))
+    return nodes
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-agent model, temperature and max token settings against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+
+def test_agent_models():
+    """Test that each agent calls Ollama with its own model and follows main model changes"""
+    mock = MockOllamaServer(generate_latency=0.0, models=("llama3.2:latest", "llama3.2:1b"))
+    try:
+        base_url = mock.start()
+        rag_crew = RAGCrew(base_url=base_url, agent_models={
+            "researcher": {"model": "llama3.2:1b"},
+            "qa_agent": {"model": "llama3.2:1b", "max_tokens": 256}
+        })
+
+        # Test 1: extraction and QA use the small model, the others the main model
+        settings = {name: rag_crew.agent_model(name)["model"] for name in rag_crew.AGENT_PROFILES}
+        if settings != {"researcher": "llama3.2:1b", "analyst": "llama3.2:latest",
+                        "writer": "llama3.2:latest", "qa_agent": "llama3.2:1b"}:
+            print(f"❌ Unexpected agent models: {settings}")
+            return False
+        if rag_crew.qa_agent.llm._ollama_kwargs.get("num_predict") != 256:
+            print("❌ QA agent max_tokens should be passed to Ollama as num_predict")
+            return False
+        print(f"✅ Agent models resolved: {settings}")
+
+        # Test 2: each agent's calls reach Ollama with its own model
+        for name in ("researcher", "writer", "qa_agent"):
+            rag_crew._agent(name).llm.invoke(f"Say hello as the {name}")
+        if mock.generated_by_model != {"llama3.2:1b": 2, "llama3.2:latest": 1}:
+            print(f"❌ Unexpected generation requests per model: {mock.generated_by_model}")
+            return False
+        print(f"✅ Generation requests per model: {mock.generated_by_model}")
+
+        # Test 3: changing the main model rebuilds only the agents that follow it
+        researcher = rag_crew.researcher
+        rag_crew.model_name = "mistral"
+        if rag_crew.writer.llm.model_name != "mistral" or rag_crew.researcher is not researcher:
+            print("❌ Main model change should move the writer but keep the researcher")
+            return False
+        print("✅ Main model change applied to the agents that use it")
+
+        # Test 4: unknown agents are rejected
+        try:
+            RAGCrew(base_url=base_url, agent_models={"reviewer": {"model": "phi3"}})
+            print("❌ Unknown agent name should be rejected")
+            return False
+        except ValueError:
+            print("✅ Unknown agent name rejected")
+
+        print("\n✅ All agent model tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Agent model test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+
+if __name__ == "__main__":
+    test_agent_models()
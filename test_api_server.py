@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the HTTP API (admission queue, index lock, query and stream) against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from query_router import ROUTE_FAST, ROUTE_STANDARD
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+HANDBOOK = """EMPLOYEE HANDBOOK
+
+Employees receive thirty days of paid holiday per year and may carry five days into the next year.
+
+New joiners get a laptop of their choice, a home office allowance and a mentor for their first six months.
+
+Expenses are reimbursed within ten working days when the receipt is uploaded to the finance portal.
+"""
+
+JOB_DESCRIPTION = """DATA ENGINEER
+
+RESPONSIBILITIES:
+Design the ingestion platform, run the warehouse and review every new pipeline.
+
+REQUIREMENTS:
+Five years of data engineering, strong SQL and Python, and production Apache Kafka.
+"""
+
+class KeywordRouter:
+    """Fast route for holiday questions, standard crew for everything else"""
+
+    def route(self, query, query_vector=None):
+        route = ROUTE_FAST if "holiday" in query.lower() else ROUTE_STANDARD
+        return {"route": route, "method": "keyword", "confidence": 1.0}
+
+def check_work_queue(WorkQueue, HTTPException):
+    """One call running and one waiting fill a queue of one; the next call is refused with 429"""
+    async def run():
+        queue = WorkQueue(max_concurrency=1, max_queue=1)
+        release = threading.Event()
+        first = asyncio.ensure_future(queue.run("test", release.wait))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(queue.run("test", lambda: "second"))
+        await asyncio.sleep(0.05)
+        rejected = None
+        try:
+            await queue.run("test", lambda: "third")
+        except HTTPException as e:
+            rejected = e
+        waiting = queue.waiting
+        release.set()
+        results = await asyncio.gather(first, second)
+        return rejected, waiting, results, queue.in_flight
+
+    return asyncio.run(run())
+
+def check_lock_order(ReadWriteLock):
+    """Order in which a running query, a waiting upload and a later query get the index"""
+    async def run():
+        lock = ReadWriteLock()
+        order = []
+
+        async def writer():
+            await lock.acquire_write()
+            order.append("write")
+            await asyncio.sleep(0.05)
+            order.append("write done")
+            await lock.release_write()
+
+        async def reader(name):
+            await lock.acquire_read()
+            order.append(name)
+            await lock.release_read()
+
+        await lock.acquire_read()
+        write = asyncio.ensure_future(writer())
+        await asyncio.sleep(0.02)
+        late_read = asyncio.ensure_future(reader("late read"))
+        await asyncio.sleep(0.02)
+        order.append("first read done")
+        await lock.release_read()
+        await asyncio.gather(write, late_read)
+        return order
+
+    return asyncio.run(run())
+
+def test_api_server():
+    """Test admission control, lock order and that /query and /query/stream report their own answer's details"""
+    work_dir = tempfile.mkdtemp(prefix="api_server_test_")
+    mock = MockOllamaServer(generate_latency=0.05, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        # api_server builds its RAGCrew at import, from the environment
+        os.environ.update(ONBOARDIQ_OLLAMA_URL=base_url, ONBOARDIQ_PERSIST_DIR=os.path.join(work_dir, "db"),
+                          ONBOARDIQ_VECTOR_BACKEND="mmap", ONBOARDIQ_PRELOAD="0", ONBOARDIQ_MAX_CONCURRENCY="2")
+        from fastapi import HTTPException
+        from fastapi.testclient import TestClient
+        import api_server
+
+        # Test 1: a full queue answers 429 with Retry-After
+        rejected, waiting, results, in_flight = check_work_queue(api_server.WorkQueue, HTTPException)
+        if rejected is None or rejected.status_code != 429 or rejected.headers.get("Retry-After") != "5":
+            print(f"❌ Expected a 429 with Retry-After once the queue is full, got {rejected}")
+            return False
+        if waiting != 1 or results != [True, "second"] or in_flight != 0:
+            print(f"❌ Admitted calls should still complete: waiting {waiting}, results {results}")
+            return False
+        print("✅ Full queue refused with 429, admitted calls completed")
+
+        # Test 2: an upload waits for running queries, and queries arriving after it wait for the upload
+        order = check_lock_order(api_server.ReadWriteLock)
+        if order != ["first read done", "write", "write done", "late read"]:
+            print(f"❌ Unexpected lock order: {order}")
+            return False
+        print("✅ Index lock lets a waiting upload in before later queries")
+
+        with TestClient(api_server.app) as client:
+            response = client.post("/ingest", data={"clear_existing": "true"},
+                                   files=[("files", ("handbook.txt", HANDBOOK.encode("utf-8"))),
+                                          ("files", ("data_engineer_job.txt", JOB_DESCRIPTION.encode("utf-8")))])
+            if response.status_code != 200 or response.json()["chunks"] < 2:
+                print(f"❌ Ingestion failed: {response.status_code} {response.text}")
+                return False
+            api_server.rag_crew.router = KeywordRouter()
+            chunks = response.json()["chunks"]
+
+            # Test 3: two uploads with the same file name are refused with 400 instead of one being lost
+            response = client.post("/ingest", files=[("files", ("cv.txt", b"Alice Smith, data engineer.")),
+                                                     ("files", ("cv.txt", b"Bob Jones, frontend developer."))])
+            if response.status_code != 400 or "cv.txt" not in response.json()["detail"] or \
+                    api_server.rag_crew.get_document_count() != chunks:
+                print(f"❌ Clashing upload names should be refused with 400: {response.status_code} {response.text}")
+                return False
+            print("✅ Uploads sharing a file name refused with 400")
+
+            # Test 4: /query returns the route and the sources of its own answer, retrieved once with k
+            embedded = mock.embedded_by_model.get(api_server.EMBEDDING_MODEL, 0)
+            response = client.post("/query", json={"question": "How many days of paid holiday do employees get?", "k": 1})
+            result = response.json()
+            if response.status_code != 200 or result["route"] != ROUTE_FAST or result["partial"] is not None:
+                print(f"❌ Unexpected /query result: {response.status_code} {result}")
+                return False
+            if len(result["sources"]) != 1 or result["sources"][0]["source"] != "handbook.txt":
+                print(f"❌ Expected the one handbook chunk the answer used: {result['sources']}")
+                return False
+            if mock.embedded_by_model[api_server.EMBEDDING_MODEL] - embedded != 1:
+                print("❌ The question should be embedded once")
+                return False
+            print(f"✅ /query answered via {result['route']} from {result['sources'][0]['source']}")
+
+            # Test 5: filters on fields the index does not record are refused with 400 by both query endpoints
+            for path in ("/query", "/query/stream"):
+                response = client.post(path, json={"question": "Who wrote the handbook?", "filters": {"author": "x"}})
+                if response.status_code != 400 or "author" not in response.json()["detail"]:
+                    print(f"❌ {path} should refuse an unknown filter field with 400, got {response.status_code}")
+                    return False
+            print("✅ Unknown filter fields refused with 400")
+
+            # Test 6: concurrent questions each report their own route
+            questions = {"Is paid holiday carried into the next year?": ROUTE_FAST,
+                         "Which requirements does the data engineer job list?": ROUTE_STANDARD}
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                responses = dict(zip(questions, executor.map(
+                    lambda question: client.post("/query", json={"question": question}).json(), questions)))
+            routes = {question: response["route"] for question, response in responses.items()}
+            if routes != questions:
+                print(f"❌ Concurrent questions reported the wrong routes: {routes}")
+                return False
+            print("✅ Concurrent questions report their own routes")
+
+            # Test 7: /query/stream sends progress events, then the whole answer
+            question = {"question": "What does the data engineer do with the warehouse and pipelines?"}
+            with client.stream("POST", "/query/stream", json=question) as response:
+                events = [json.loads(line) for line in response.iter_lines() if line]
+            names = [event["event"] for event in events]
+            if names[:3] != ["queued", "route", "retrieved"] or names[-2:] != ["answer", "done"] \
+                    or "agent" not in names:
+                print(f"❌ Unexpected stream events: {names}")
+                return False
+            retrieved, answer = events[2], events[-2]
+            if retrieved["sources"] != answer["sources"] or answer["route"] != ROUTE_STANDARD or not answer["text"]:
+                print(f"❌ Streamed answer does not match its progress events: {answer}")
+                return False
+            print(f"✅ Stream events: {', '.join(names)}")
+
+            # Test 8: both query endpoints answer 429 when no request can be admitted
+            api_server.work_queue = api_server.WorkQueue(max_concurrency=1, max_queue=0)
+            for path in ("/query", "/query/stream"):
+                response = client.post(path, json=question)
+                if response.status_code != 429 or response.headers.get("Retry-After") != "5":
+                    print(f"❌ {path} should answer 429 under overload, got {response.status_code}")
+                    return False
+            print("✅ Overloaded server answers 429 with Retry-After")
+
+        print("\n✅ All API server tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ API server test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_api_server()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script to verify section-aware chunking profiles
+"""
+
+from chunking import CHUNKING_PROFILES, profile_name_for, split_sections
+from test_analytical_rag import create_sample_cv, create_job_description
+import os
+
+def test_chunking():
+    """Test that CV and job description chunks follow section boundaries"""
+    cv_path = create_sample_cv()
+    job_path = create_job_description()
+    try:
+        with open(cv_path) as f:
+            cv_text = f.read()
+        with open(job_path) as f:
+            job_text = f.read()
+
+        # Test 1: profiles are chosen by document type and file format
+        choices = [profile_name_for("cv"), profile_name_for("job_description", is_pdf=True),
+                   profile_name_for("other", is_pdf=True), profile_name_for("other")]
+        if choices != ["cv", "job_description", "pdf", "default"]:
+            print(f"❌ Unexpected profile choices: {choices}")
+            return False
+        print("✅ Profiles chosen by document type, then by file format")
+
+        # Test 2: every CV chunk starts with its section heading and job entries stay whole
+        profile = CHUNKING_PROFILES["cv"]
+        chunks = split_sections(cv_text, profile["chunk_size"], profile["chunk_overlap"], profile["min_chunk_size"])
+        print(f"📊 CV: {len(cv_text)} characters -> {len(chunks)} chunks")
+        for _, text, heading in chunks:
+            if heading and not text.startswith(heading):
+                print(f"❌ Chunk does not start with its heading {heading}")
+                return False
+            if len(text) > profile["chunk_size"]:
+                print(f"❌ Chunk of {len(text)} characters exceeds the profile size")
+                return False
+        experience = [text for _, text, heading in chunks if heading and "EXPERIENCE" in heading]
+        if not experience or "Senior Software Engineer" not in experience[0] or "TechCorp" not in experience[0]:
+            print("❌ Job title and employer of a role were split apart")
+            return False
+        print("✅ CV chunks start at section headings and keep job entries together")
+
+        # Test 3: requirement bullets are not split from their heading
+        chunks = split_sections(job_text, 1200, 0, 300)
+        requirements = [text for _, text, heading in chunks if heading and heading.startswith("REQUIREMENTS")]
+        if not requirements or "5+ years of experience" not in requirements[0]:
+            print("❌ Requirements section lost its bullets")
+            return False
+        print(f"✅ Job description split into {len(chunks)} section chunks")
+
+        print("\n✅ All chunking tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Chunking test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        os.remove(cv_path)
+        os.remove(job_path)
+
+if __name__ == "__main__":
+    test_chunking()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the corpus profile and template out-of-context replies against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+import time
+
+CV_TEXT = """JANE SMITH - DATA ENGINEER
+
+PROFESSIONAL SUMMARY:
+Data engineer with 6 years of experience building batch and streaming pipelines.
+
+WORK EXPERIENCE:
+Data Engineer - Northwind Analytics (2019-2024)
+- Built streaming pipelines on Apache Kafka and Spark
+- Migrated the warehouse to Snowflake
+
+EDUCATION:
+MSc in Computer Science, University of Edinburgh
+"""
+
+JOB_TEXT = """SENIOR DATA ENGINEER
+
+RESPONSIBILITIES:
+We are seeking a Senior Data Engineer to own our ingestion platform.
+- Design streaming pipelines with Apache Kafka
+
+REQUIREMENTS:
+- 5+ years of data engineering experience
+- Experience with Snowflake or BigQuery
+"""
+
+def test_corpus_profile():
+    """Test that ingestion profiles each source and out-of-context replies need no LLM call"""
+    work_dir = tempfile.mkdtemp(prefix="corpus_profile_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        file_paths = []
+        for name, text in (("jane_smith_cv.txt", CV_TEXT), ("senior_data_engineer_job.txt", JOB_TEXT)):
+            path = os.path.join(work_dir, name)
+            with open(path, "w") as f:
+                f.write(text)
+            file_paths.append(path)
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap")
+        if not rag_crew.load_and_process_documents(file_paths):
+            print("❌ Failed to load documents")
+            return False
+
+        # Test 1: every source gets a title, sections, topics, names and a summary
+        cv = rag_crew.corpus_profile.sources[file_paths[0]]
+        if cv["title"] != "Jane Smith - Data Engineer" or cv["doc_type"] != "cv":
+            print(f"❌ Unexpected CV title or type: {cv['title']} ({cv['doc_type']})")
+            return False
+        if "work experience" not in cv["sections"] or "Apache Kafka" not in cv["entities"]:
+            print(f"❌ CV sections or names missing: {cv['sections']}, {cv['entities']}")
+            return False
+        if not cv["summary"].startswith("Data engineer with 6 years") or not cv["topics"]:
+            print(f"❌ CV summary or topics missing: {cv['summary']}")
+            return False
+        print(f"✅ Profiled {len(rag_crew.corpus_profile.sources)} sources "
+              f"(CV topics: {', '.join(cv['topics'][:4])})")
+
+        # Test 2: the out-of-context reply comes from the profile without an LLM call
+        generate_calls = mock.request_counts.get("/api/generate", 0)
+        start = time.perf_counter()
+        reply = rag_crew.generate_out_of_context_response("What is the vacation policy?", "Query terms not found")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if mock.request_counts.get("/api/generate", 0) != generate_calls:
+            print("❌ Template reply should not call the LLM")
+            return False
+        if "Jane Smith - Data Engineer" not in reply or "Senior Data Engineer" not in reply:
+            print(f"❌ Reply does not describe the loaded documents:\n{reply}")
+            return False
+        print(f"✅ Template reply in {elapsed_ms:.2f} ms")
+
+        # Test 3: opting in asks the LLM
+        rag_crew.generate_out_of_context_response("What is the vacation policy?", "Query terms not found", use_llm=True)
+        if mock.request_counts.get("/api/generate", 0) == generate_calls:
+            print("❌ use_llm=True should call the LLM")
+            return False
+        if rag_crew.metrics.out_of_context_replies.value(method="llm") != 1:
+            print("❌ LLM reply was not counted")
+            return False
+        print("✅ LLM reply on request")
+
+        # Test 4: the profile follows deletions and travels in snapshots
+        snapshot_path = os.path.join(work_dir, "index.snapshot")
+        rag_crew.export_snapshot(snapshot_path)
+        rag_crew.delete_source("jane_smith_cv.txt")
+        if file_paths[0] in rag_crew.corpus_profile.sources:
+            print("❌ Deleted source is still profiled")
+            return False
+        replica = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "replica_db"),
+                          vector_backend="mmap")
+        if not replica.import_snapshot(snapshot_path) or set(replica.corpus_profile.sources) != set(file_paths):
+            print("❌ Snapshot did not restore the corpus profile")
+            return False
+        print("✅ Profile follows deletions and snapshots")
+
+        print("\n✅ All corpus profile tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Corpus profile test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_corpus_profile()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the dedicated embedding model and re-embedding migration against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+from benchmark_rag import build_synthetic_corpus, synthetic_queries
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+def test_embedding_migration():
+    """Test that chunks use the embedding model and that a migration swaps indexes without downtime"""
+    work_dir = tempfile.mkdtemp(prefix="embedding_migration_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.001)
+    try:
+        base_url = mock.start()
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        file_paths = build_synthetic_corpus(200, corpus_dir)
+
+        for backend in ("chroma", "mmap"):
+            persist_directory = os.path.join(work_dir, f"{backend}_db")
+            rag_crew = RAGCrew(base_url=base_url, persist_directory=persist_directory, vector_backend=backend)
+
+            # Test 1: chunks are embedded by the embedding model, not the chat model
+            if not rag_crew.load_and_process_documents(file_paths):
+                print(f"❌ {backend}: ingestion failed")
+                return False
+            if mock.embedded_by_model.get("llama3.2:latest") or rag_crew.indexed_embedding_model() != "nomic-embed-text":
+                print(f"❌ {backend}: expected chunks embedded and recorded as nomic-embed-text, "
+                      f"got {mock.embedded_by_model}")
+                return False
+            print(f"✅ {backend}: {rag_crew.get_document_count()} chunks embedded with nomic-embed-text")
+
+            # Test 2: questions keep working while the migration runs in the background
+            expected = [rag_crew.query_documents(query, k=1)[0].page_content for query in synthetic_queries(5)]
+            errors, stop = [], threading.Event()
+
+            def ask():
+                while not stop.is_set():
+                    try:
+                        rag_crew.query_documents(synthetic_queries(1)[0], k=1)
+                    except Exception as e:
+                        errors.append(e)
+
+            reader = threading.Thread(target=ask)
+            reader.start()
+            rag_crew.migrate_embeddings("all-minilm")
+            while rag_crew.migration_status["state"] == "running":
+                time.sleep(0.05)
+            stop.set()
+            reader.join()
+            if rag_crew.migration_status["state"] != "done" or errors:
+                print(f"❌ {backend}: migration {rag_crew.migration_status}, query errors {errors[:3]}")
+                return False
+
+            # Test 3: the new index replaced the old one and answers the same questions
+            found = [rag_crew.query_documents(query, k=1)[0].page_content for query in synthetic_queries(5)]
+            if (rag_crew.embedding_model != "all-minilm" or rag_crew.indexed_embedding_model() != "all-minilm"
+                    or os.path.exists(persist_directory) or found != expected):
+                print(f"❌ {backend}: index was not swapped cleanly")
+                return False
+            print(f"✅ {backend}: re-embedded {rag_crew.migration_status['embedded']} chunks with all-minilm "
+                  f"while answering questions")
+
+            # Test 4: a new RAGCrew refuses to add chunks from another model to the migrated index
+            other = RAGCrew(base_url=base_url, persist_directory=rag_crew.chroma_persist_directory,
+                            vector_backend=backend)
+            if other.load_and_process_documents(file_paths[:1], clear_existing=False):
+                print(f"❌ {backend}: chunks from a different embedding model were mixed into the index")
+                return False
+            print(f"✅ {backend}: index from a different embedding model was not appended to")
+
+        print("\n✅ All embedding migration tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Embedding migration test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_embedding_migration()
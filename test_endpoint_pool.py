@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script to verify Ollama endpoint pool balancing and failover using local mock servers
+"""
+
+from mock_ollama import MockOllamaServer
+from ollama_pool import OllamaEndpointPool, NoHealthyEndpointError, shared_pool
+from rag_crew import RAGCrew
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.request
+
+def embed(base_url, text="hello pool"):
+    """Call the embed endpoint of one Ollama node"""
+    request = urllib.request.Request(
+        f"{base_url}/api/embed",
+        data=json.dumps({"model": "llama3.2:latest", "input": [text]}).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())["embeddings"][0]
+
+def test_endpoint_pool():
+    """Test least-outstanding balancing, failover and health checks"""
+    node_a = MockOllamaServer(embed_latency=0.02)
+    node_b = MockOllamaServer(embed_latency=0.02)
+    try:
+        pool = OllamaEndpointPool([node_a.start(), node_b.start()], name="embedding")
+
+        # Test 1: concurrent requests spread over both nodes
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: pool.call(lambda url: embed(url, f"text {i}")), range(20)))
+        counts = [node_a.request_counts.get("/api/embed", 0), node_b.request_counts.get("/api/embed", 0)]
+        print(f"📊 Requests per node: {counts}")
+        if min(counts) == 0:
+            print("❌ Load was not balanced across nodes")
+            return False
+        print("✅ Requests balanced across nodes")
+
+        # Test 2: crews built for the same endpoints share one pool and one health-check thread
+        work_dir = tempfile.mkdtemp(prefix="endpoint_pool_test_")
+        try:
+            crews = [RAGCrew(base_url=node_a.base_url, embedding_urls=[node_a.base_url, node_b.base_url],
+                             persist_directory=os.path.join(work_dir, "db")) for _ in range(3)]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        health_threads = [t for t in threading.enumerate() if t.name == "embedding-health" and t.is_alive()]
+        if len({id(crew.embedding_pool) for crew in crews}) != 1 or len(health_threads) != 1:
+            print(f"❌ Expected one shared pool and health thread, got {len(health_threads)} threads")
+            return False
+        if shared_pool([node_a.base_url, node_b.base_url], name="embedding") is not crews[0].embedding_pool:
+            print("❌ shared_pool should return the crews' pool")
+            return False
+        print("✅ Crews share one pool and one health-check thread")
+
+        # Test 3: a stopped node fails over to the other one
+        node_a.stop()
+        for i in range(5):
+            pool.call(lambda url: embed(url, f"failover {i}"))
+        down = [e for e in pool.stats() if e["url"] == node_a.base_url][0]
+        if down["healthy"]:
+            print("❌ Stopped node should be marked unhealthy")
+            return False
+        print("✅ Failed over to the healthy node and marked the stopped one unhealthy")
+
+        # Test 4: health checks report the current state
+        health = pool.check_health()
+        if health != {node_a.base_url: False, node_b.base_url: True}:
+            print(f"❌ Unexpected health report: {health}")
+            return False
+        print("✅ Health check reports node states correctly")
+
+        # Test 5: when every node is down the pool raises
+        node_b.stop()
+        try:
+            pool.call(lambda url: embed(url))
+            print("❌ Should have raised when all nodes are down")
+            return False
+        except NoHealthyEndpointError:
+            print("✅ Correctly raised when all nodes are down")
+
+        print("\n✅ All endpoint pool tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Endpoint pool test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        node_a.stop()
+        node_b.stop()
+
+if __name__ == "__main__":
+    test_endpoint_pool()
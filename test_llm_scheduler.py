@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script to verify LLM scheduler priority order, tenant fairness, aging and prompt coalescing
+"""
+
+from rag_crew import LLMScheduler, RAGMetrics, PRIORITY_FAST, PRIORITY_INTERACTIVE, PRIORITY_ANALYTICAL, PRIORITY_BATCH
+from metrics import MetricsRegistry
+import threading
+import time
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("condition not reached")
+        time.sleep(0.005)
+
+def hold_slot(scheduler):
+    """Start a call that occupies a slot until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+    blocker = threading.Thread(target=scheduler.submit, args=(lambda: started.set() or release.wait(),))
+    blocker.start()
+    started.wait(timeout=5)
+    return blocker, release
+
+def run_queued(scheduler, calls):
+    """Hold the only slot, queue calls one by one (name, priority, tenant), then release; returns the run order"""
+    order, threads = [], []
+    blocker, release = hold_slot(scheduler)
+    for name, priority, tenant in calls:
+        thread = threading.Thread(target=scheduler.submit, args=(lambda name=name: order.append(name),),
+                                  kwargs={"priority": priority, "tenant": tenant})
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.queued() == len(threads))
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join(timeout=5)
+    return order
+
+def test_llm_scheduler():
+    """Test priority order, tenant round-robin, aging promotion, the in-flight cap and coalescing"""
+    try:
+        # Test 1: queued calls run by priority class, whatever order they arrived in
+        order = run_queued(LLMScheduler(max_in_flight=1), [
+            ("batch", PRIORITY_BATCH, "default"), ("analytical", PRIORITY_ANALYTICAL, "default"),
+            ("interactive", PRIORITY_INTERACTIVE, "default"), ("fast", PRIORITY_FAST, "default")])
+        if order != ["fast", "interactive", "analytical", "batch"]:
+            print(f"❌ Unexpected priority order: {order}")
+            return False
+        print(f"✅ Priority order: {' > '.join(order)}")
+
+        # Test 2: tenants of one priority take turns, so a busy tenant cannot starve another
+        order = run_queued(LLMScheduler(max_in_flight=1), [
+            ("a1", PRIORITY_INTERACTIVE, "a"), ("a2", PRIORITY_INTERACTIVE, "a"), ("a3", PRIORITY_INTERACTIVE, "a"),
+            ("b1", PRIORITY_INTERACTIVE, "b"), ("b2", PRIORITY_INTERACTIVE, "b")])
+        if order != ["a1", "b1", "a2", "b2", "a3"]:
+            print(f"❌ Tenants should alternate: {order}")
+            return False
+        print(f"✅ Tenants alternate: {', '.join(order)}")
+
+        # Test 3: a batch call waiting longer than aging_seconds is promoted ahead of interactive work
+        scheduler = LLMScheduler(max_in_flight=1, aging_seconds=0.1)
+        blocker, release = hold_slot(scheduler)
+        order = []
+        old_batch = threading.Thread(target=scheduler.submit, args=(lambda: order.append("aged batch"),),
+                                     kwargs={"priority": PRIORITY_BATCH, "tenant": "nightly"})
+        old_batch.start()
+        wait_until(lambda: scheduler.queued() == 1)
+        time.sleep(0.2)
+        interactive = threading.Thread(target=scheduler.submit, args=(lambda: order.append("interactive"),),
+                                       kwargs={"priority": PRIORITY_INTERACTIVE, "tenant": "user"})
+        interactive.start()
+        wait_until(lambda: scheduler.queued() == 2)
+        release.set()
+        for thread in (blocker, old_batch, interactive):
+            thread.join(timeout=5)
+        if order != ["aged batch", "interactive"]:
+            print(f"❌ Aged batch call should be promoted: {order}")
+            return False
+        print("✅ Aged batch call promoted ahead of a newer interactive call")
+
+        # Test 4: never more than max_in_flight calls run at once
+        scheduler = LLMScheduler(max_in_flight=2)
+        running, peak, lock = [0], [0], threading.Lock()
+        def call():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.03)
+            with lock:
+                running[0] -= 1
+        threads = [threading.Thread(target=scheduler.submit, args=(call,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        if peak[0] != 2:
+            print(f"❌ Expected at most 2 calls in flight, saw {peak[0]}")
+            return False
+        print("✅ In-flight cap respected")
+
+        # Test 5: identical prompts in flight share one call, errors included
+        metrics = RAGMetrics(MetricsRegistry())
+        scheduler = LLMScheduler(max_in_flight=2, metrics=metrics)
+        calls, results = [0], []
+        def generate():
+            calls[0] += 1
+            time.sleep(0.2)
+            return "shared answer"
+        threads = [threading.Thread(target=lambda: results.append(scheduler.submit(generate, key="same prompt")))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(timeout=5)
+        if calls[0] != 1 or results != ["shared answer"] * 5 or metrics.llm_coalesced.value() != 4:
+            print(f"❌ Expected one call shared by five callers: {calls[0]} calls, {results}")
+            return False
+        errors = []
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("model not found")
+        def submit_failing():
+            try:
+                scheduler.submit(failing, key="bad prompt")
+            except RuntimeError as e:
+                errors.append(str(e))
+        threads = [threading.Thread(target=submit_failing) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(timeout=5)
+        if errors != ["model not found"] * 3:
+            print(f"❌ A failed call should fail every coalesced caller once: {errors}")
+            return False
+        if scheduler.submit(lambda: "retried", key="bad prompt") != "retried":
+            print("❌ A finished call should not be reused by a later identical prompt")
+            return False
+        print("✅ Identical prompts coalesced into one call, failures shared")
+
+        print("\n✅ All LLM scheduler tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ LLM scheduler test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    test_llm_scheduler()
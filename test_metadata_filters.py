@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script to verify chunk metadata and filtered retrieval against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew
+from query_router import ROUTE_FAST
+from benchmark_rag import build_synthetic_corpus, synthetic_queries
+import os
+import shutil
+import tempfile
+
+class FixedRouter:
+    """Sends every question down one route"""
+
+    def __init__(self, route):
+        self.fixed_route = route
+
+    def route(self, query, query_vector=None):
+        return {"route": self.fixed_route, "method": "fixed", "confidence": 1.0}
+
+def test_metadata_filters():
+    """Test that filters restrict retrieval and answers to the selected chunks"""
+    work_dir = tempfile.mkdtemp(prefix="metadata_filters_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        file_paths = build_synthetic_corpus(300, corpus_dir)
+        query = synthetic_queries(1)[0]
+
+        for backend in ("chroma", "mmap"):
+            rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, f"{backend}_db"),
+                               vector_backend=backend, router=FixedRouter(ROUTE_FAST),
+                               metrics_registry=MetricsRegistry())
+            if not (rag_crew.load_and_process_documents(file_paths[:2], upload_batch="batch-a")
+                    and rag_crew.load_and_process_documents(file_paths[2:], clear_existing=False)):
+                print(f"❌ {backend}: failed to load documents")
+                return False
+            second_batch = rag_crew.last_ingestion_report["upload_batch"]
+
+            # Test 1: every chunk carries its source, type and upload batch
+            docs = rag_crew.query_documents(query, k=12)
+            if any(set(doc.metadata) < {"source", "doc_type", "upload_batch"} for doc in docs):
+                print(f"❌ {backend}: chunk metadata incomplete: {docs[0].metadata}")
+                return False
+            print(f"✅ {backend}: chunks carry source, doc_type and upload_batch")
+
+            # Test 2: a source filter (by file name) keeps k results, all from that source
+            name = os.path.basename(file_paths[1])
+            docs = rag_crew.query_documents(query, k=5, filters={"source": name})
+            if len(docs) != 5 or any(os.path.basename(doc.metadata["source"]) != name for doc in docs):
+                print(f"❌ {backend}: source filter returned {[doc.metadata['source'] for doc in docs]}")
+                return False
+            docs = rag_crew.query_documents(query, k=5, filters={"upload_batch": second_batch})
+            if len(docs) != 5 or any(doc.metadata["source"] != file_paths[2] for doc in docs):
+                print(f"❌ {backend}: upload batch filter returned other batches")
+                return False
+            print(f"✅ {backend}: source and upload batch filters restrict retrieval")
+
+            # Test 3: unknown filter fields are rejected
+            try:
+                rag_crew.query_documents(query, filters={"author": "someone"})
+                print(f"❌ {backend}: unknown filter field was accepted")
+                return False
+            except ValueError:
+                pass
+
+            # Test 4: scoped answers only see the selected document and are cached apart
+            rag_crew.generate_response(query)
+            rag_crew.generate_response(query, filters={"source": name})
+            prompt = mock._last_prompt["llama3.2:latest"]
+            if any(os.path.basename(path) in prompt for path in file_paths if os.path.basename(path) != name):
+                print(f"❌ {backend}: scoped answer was given chunks of other documents")
+                return False
+            if rag_crew.metrics.cache_requests.value(cache="response", result="hit"):
+                print(f"❌ {backend}: scoped question reused the unscoped answer")
+                return False
+            print(f"✅ {backend}: scoped answer uses only {name}")
+
+        print("\n✅ All metadata filter tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Metadata filter test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_metadata_filters()
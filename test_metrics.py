@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the metrics registry, Prometheus text rendering and the localhost exporter
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry, start_metrics_server
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+
+EXPECTED = """# HELP test_requests_total Requests served
+# TYPE test_requests_total counter
+test_requests_total{path="/a\\"b"} 1
+test_requests_total{path="/query"} 3
+# HELP test_queue_depth Calls waiting
+# TYPE test_queue_depth gauge
+test_queue_depth 2
+# HELP test_latency_seconds Request latency
+# TYPE test_latency_seconds histogram
+test_latency_seconds_bucket{route="fast",le="0.1"} 1
+test_latency_seconds_bucket{route="fast",le="1.0"} 2
+test_latency_seconds_bucket{route="fast",le="+Inf"} 3
+test_latency_seconds_sum{route="fast"} 5.55
+test_latency_seconds_count{route="fast"} 3
+"""
+
+def test_metrics():
+    """Test registry lookups, label checks, the text exposition format and per-collection store sizes"""
+    work_dir = tempfile.mkdtemp(prefix="metrics_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        registry = MetricsRegistry()
+        requests = registry.counter("test_requests_total", "Requests served", ["path"])
+        queue = registry.gauge("test_queue_depth", "Calls waiting")
+        latency = registry.histogram("test_latency_seconds", "Request latency", ["route"], buckets=(1, 0.1))
+
+        # Test 1: asking again returns the same metric; kind clashes and missing labels are errors
+        if registry.counter("test_requests_total", "Requests served", ["path"]) is not requests:
+            print("❌ Registering a metric twice should return the existing one")
+            return False
+        for attempt in (lambda: registry.gauge("test_requests_total", "Clash"), lambda: requests.inc()):
+            try:
+                attempt()
+                print("❌ A kind clash or missing label was accepted")
+                return False
+            except ValueError:
+                pass
+        print("✅ Registry reuses metrics and rejects clashes and missing labels")
+
+        # Test 2: the text exposition has HELP/TYPE headers, escaped labels and cumulative buckets
+        requests.inc(2, path="/query")
+        requests.inc(path="/query")
+        requests.inc(path='/a"b')
+        queue.set(5)
+        queue.set(2)
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, route="fast")
+        if requests.value(path="/query") != 3 or latency.count(route="fast") != 3:
+            print("❌ Counter or histogram values are wrong")
+            return False
+        if registry.render() != EXPECTED:
+            print(f"❌ Unexpected rendering:\n{registry.render()}")
+            return False
+        print("✅ Rendered in the Prometheus text format")
+
+        # Test 3: crews on different persist directories report their store sizes side by side
+        base_url = mock.start()
+        crew_registry = MetricsRegistry()
+        crews = []
+        for name, count in (("one", 1), ("two", 2)):
+            paths = []
+            for index in range(count):
+                paths.append(os.path.join(work_dir, f"{name}_{index}.txt"))
+                with open(paths[-1], "w") as f:
+                    f.write(f"Document {index} of collection {name} describes office number {index}.")
+            crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, f"{name}_db"),
+                           vector_backend="mmap", metrics_registry=crew_registry)
+            if not crew.load_and_process_documents(paths):
+                print(f"❌ Failed to load collection {name}")
+                return False
+            crews.append(crew)
+        gauge = crews[0].metrics.vector_store_chunks
+        sizes = [gauge.value(collection=os.path.join(work_dir, f"{name}_db")) for name in ("one", "two")]
+        if sizes != [1, 2]:
+            print(f"❌ Expected one series per collection with 1 and 2 chunks, got {sizes}")
+            return False
+        print("✅ Vector store size reported per collection")
+
+        # Test 4: the exporter listens on localhost and serves only /metrics
+        server = start_metrics_server(port=0, registry=registry)
+        host, port = server.server_address
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode("utf-8")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+                print("❌ Paths other than /metrics should answer 404")
+                return False
+            except urllib.error.HTTPError as e:
+                if e.code != 404:
+                    raise
+        finally:
+            server.shutdown()
+            server.server_close()
+        if host != "127.0.0.1" or body != EXPECTED:
+            print(f"❌ Exporter bound to {host} or served other text")
+            return False
+        print(f"✅ Exporter served the registry on {host}:{port}")
+
+        print("\n✅ All metrics tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Metrics test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_metrics()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Test script to verify near-duplicate detection at ingestion against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+import time
+
+CV_TEXT = """JANE SMITH - DATA ENGINEER
+
+PROFESSIONAL SUMMARY:
+Data engineer with 6 years of experience building batch and streaming pipelines for retail analytics.
+She has led migrations to cloud warehouses and mentored three junior engineers.
+
+WORK EXPERIENCE:
+Data Engineer - Northwind Analytics (2019-2024)
+- Built streaming pipelines on Apache Kafka and Spark processing two billion events a day
+- Migrated the warehouse from on-premise Oracle to Snowflake with no downtime
+- Introduced data quality checks that cut incident tickets by half
+
+Junior Data Engineer - Contoso Retail (2017-2019)
+- Maintained nightly ETL jobs feeding the sales dashboards used by two hundred store managers
+- Rewrote the customer deduplication job in Spark, reducing its run time from six hours to forty minutes
+- Documented the data model and ran onboarding sessions for new analysts
+
+EDUCATION:
+MSc in Computer Science, University of Edinburgh (2017)
+BSc in Mathematics, University of Leeds (2015)
+
+SKILLS:
+Python, SQL, Scala, Apache Kafka, Spark, Airflow, Snowflake, dbt, Terraform
+"""
+
+BENEFITS = """BENEFITS:
+Remote-first team, a yearly learning budget of two thousand euros, private health insurance for the whole family,
+thirty days of paid holiday and a four-day week during the summer months for everyone in the company.
+Every new joiner gets a laptop of their choice, a home office allowance and a mentor for their first six months.
+"""
+
+def job_text(title, responsibilities, requirements):
+    return f"""{title}
+
+RESPONSIBILITIES:
+We are seeking a {title.title()} to join a small team and own a product area end to end.
+{responsibilities}
+
+REQUIREMENTS:
+{requirements}
+
+{BENEFITS}"""
+
+def write_documents(directory):
+    documents = {
+        "jane_cv.txt": CV_TEXT,
+        # The same CV saved again with different spacing and capitalisation
+        "jane_cv_copy.txt": CV_TEXT.replace("\n\n", "\n\n\n").replace("Data engineer with", "DATA ENGINEER WITH"),
+        # A revised CV with one achievement replaced
+        "jane_cv_v2.txt": CV_TEXT.replace("Introduced data quality checks that cut incident tickets by half",
+                                          "Built a fraud scoring service on Flink"),
+        "data_engineer_job.txt": job_text(
+            "SENIOR DATA ENGINEER",
+            "You will design the ingestion platform, run the warehouse and its cost controls, and review every new pipeline.",
+            "- 5+ years of data engineering in a product company\n- Strong SQL and Python, and production Apache Kafka\n"
+            "- Experience running Snowflake or BigQuery at terabyte scale\n- Comfortable on call for the data platform"),
+        "ml_engineer_job.txt": job_text(
+            "MACHINE LEARNING ENGINEER",
+            "You will train and ship ranking models, own the feature store and keep offline and online metrics in step.",
+            "- PyTorch models in production for at least three years\n- Experience with feature stores and model monitoring\n"
+            "- Solid statistics and experiment design\n- Python and one compiled language such as Go or Rust"),
+    }
+    paths = {}
+    for name, text in documents.items():
+        paths[name] = os.path.join(directory, name)
+        with open(paths[name], "w") as f:
+            f.write(text)
+    return paths
+
+def test_near_duplicates():
+    """Test that repeated files and chunks are collapsed according to the duplicate policy"""
+    work_dir = tempfile.mkdtemp(prefix="near_duplicates_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        paths = write_documents(work_dir)
+
+        def crew(name, policy):
+            return RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, name), vector_backend="mmap",
+                           duplicate_policy=policy, metrics_registry=MetricsRegistry())
+
+        # Test 1: "skip" leaves out a re-saved copy and a lightly revised version of a loaded CV
+        rag_crew = crew("skip_db", "skip")
+        if not rag_crew.load_and_process_documents([paths["jane_cv.txt"], paths["data_engineer_job.txt"]]):
+            print("❌ Failed to load documents")
+            return False
+        count = rag_crew.get_document_count()
+        rag_crew.load_and_process_documents([paths["jane_cv_copy.txt"], paths["jane_cv_v2.txt"]], clear_existing=False)
+        collapsed = rag_crew.last_ingestion_report["duplicates"]["files"]
+        if rag_crew.get_document_count() != count or [entry["action"] for entry in collapsed] != ["skipped", "skipped"]:
+            print(f"❌ Expected both CV copies to be skipped: {collapsed}")
+            return False
+        if any(entry["duplicate_of"] != paths["jane_cv.txt"] or entry["similarity"] < 0.8 for entry in collapsed):
+            print(f"❌ Copies should be reported as duplicates of the original CV: {collapsed}")
+            return False
+        if rag_crew.metrics.near_duplicates.value(level="file", action="skipped") != 2:
+            print("❌ Skipped files were not counted")
+            return False
+        print(f"✅ Copy and revision skipped (similarity {', '.join(str(e['similarity']) for e in collapsed)})")
+
+        # Test 2: "link_version" stores only the revised chunk, linked to the original
+        rag_crew = crew("link_db", "link_version")
+        rag_crew.load_and_process_documents([paths["jane_cv.txt"]])
+        original_chunks = rag_crew.get_document_count()
+        rag_crew.load_and_process_documents([paths["jane_cv_v2.txt"]], clear_existing=False)
+        report = rag_crew.last_ingestion_report
+        if not 0 < report["chunks"] < original_chunks or report["duplicates"]["chunks"] != original_chunks - report["chunks"]:
+            print(f"❌ Expected only the changed chunks of the new version: {report['chunks']} of {original_chunks}")
+            return False
+        docs = rag_crew.query_documents("fraud scoring", filters={"version_of": paths["jane_cv.txt"]})
+        if not docs or "fraud scoring" not in docs[0].page_content:
+            print("❌ Revised chunk should be stored with version_of pointing at the original")
+            return False
+        print(f"✅ New version linked to the original, {report['chunks']} changed chunk(s) stored, "
+              f"{report['duplicates']['chunks']} repeated chunk(s) collapsed")
+
+        # Test 3: "keep_newest" replaces an older file and refuses an older one
+        rag_crew = crew("newest_db", "keep_newest")
+        old = time.time() - 3600
+        os.utime(paths["jane_cv.txt"], (old, old))
+        rag_crew.load_and_process_documents([paths["jane_cv.txt"]])
+        rag_crew.load_and_process_documents([paths["jane_cv_v2.txt"]], clear_existing=False)
+        if rag_crew.list_sources() != [paths["jane_cv_v2.txt"]]:
+            print(f"❌ Newer version should replace the original: {rag_crew.list_sources()}")
+            return False
+        rag_crew.load_and_process_documents([paths["jane_cv.txt"]], clear_existing=False)
+        if (rag_crew.list_sources() != [paths["jane_cv_v2.txt"]]
+                or rag_crew.last_ingestion_report["duplicates"]["files"][0]["action"] != "skipped"):
+            print("❌ Older version should not replace the newer one")
+            return False
+        print("✅ Newest version kept")
+
+        # Test 4: shared boilerplate chunks are stored once, unless detection is turned off
+        rag_crew = crew("chunks_db", "skip")
+        rag_crew.load_and_process_documents([paths["data_engineer_job.txt"], paths["ml_engineer_job.txt"]])
+        deduplicated = rag_crew.last_ingestion_report
+        plain = crew("plain_db", None)
+        plain.load_and_process_documents([paths["data_engineer_job.txt"], paths["ml_engineer_job.txt"]])
+        if deduplicated["duplicates"]["files"] or deduplicated["duplicates"]["chunks"] != 1:
+            print(f"❌ Expected one repeated benefits chunk: {deduplicated['duplicates']}")
+            return False
+        if plain.get_document_count() != rag_crew.get_document_count() + 1:
+            print("❌ Detection turned off should store every chunk")
+            return False
+        print("✅ Benefits section shared by two job descriptions stored once")
+
+        # Test 5: fingerprints travel in snapshots
+        snapshot_path = os.path.join(work_dir, "corpus.snapshot")
+        replica = crew("replica_db", "skip")
+        if not (rag_crew.export_snapshot(snapshot_path) and replica.import_snapshot(snapshot_path)):
+            print("❌ Snapshot round trip failed")
+            return False
+        replica.load_and_process_documents([paths["ml_engineer_job.txt"]], clear_existing=False)
+        if replica.last_ingestion_report["duplicates"]["files"][:1] != [
+                {"source": paths["ml_engineer_job.txt"], "duplicate_of": paths["ml_engineer_job.txt"],
+                 "similarity": 1.0, "action": "skipped"}]:
+            print("❌ Imported replica did not recognise an already ingested file")
+            return False
+        print("✅ Imported replica recognises files from the snapshot")
+
+        # Test 6: a file whose ingestion failed is not treated as a duplicate of itself on retry
+        rag_crew = crew("retry_db", "skip")
+        rag_crew.load_and_process_documents([paths["data_engineer_job.txt"]])
+
+        def embedding_outage(texts):
+            raise ConnectionError("embedding endpoint unavailable")
+
+        rag_crew.embeddings.embed_documents = embedding_outage
+        failed = rag_crew.load_and_process_documents([paths["jane_cv.txt"]], clear_existing=False)
+        del rag_crew.embeddings.embed_documents
+        retried = rag_crew.load_and_process_documents([paths["jane_cv.txt"]], clear_existing=False)
+        report = rag_crew.last_ingestion_report
+        if failed or not retried or report["duplicates"]["files"] or report["duplicates"]["chunks"]:
+            print(f"❌ Retry after a failed ingestion was collapsed: {report['duplicates']}")
+            return False
+        if paths["jane_cv.txt"] not in rag_crew.list_sources():
+            print("❌ The CV was not stored on retry")
+            return False
+        print("✅ Failed ingestion left no fingerprints behind; the retry stored the CV")
+
+        print("\n✅ All near-duplicate tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Near-duplicate test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_near_duplicates()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script to verify PDF extractors and the parsed-text cache against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+from document_loaders import DocumentLoader, PyPDFExtractor, register_extractor
+from benchmark_extraction import write_sample_pdf
+import os
+import shutil
+import tempfile
+
+PAGES = [
+    ["EMPLOYEE HANDBOOK", "Welcome to Northwind Bank. This handbook covers onboarding and compliance."],
+    ["LEAVE POLICY", "Employees receive thirty days of paid holiday per year."],
+    ["SECURITY", "Badges must be worn at all times inside the branch offices."],
+]
+
+class CountingExtractor(PyPDFExtractor):
+    """pypdf that counts how many pages it was asked to extract"""
+    name = "counting-pypdf"
+    pages_extracted = 0
+
+    def extract(self, path, start, end):
+        CountingExtractor.pages_extracted += end - start
+        return super().extract(path, start, end)
+
+def test_parsed_text_cache():
+    """Test that PDFs are parsed once per content and that extractors can be swapped"""
+    work_dir = tempfile.mkdtemp(prefix="parsed_text_cache_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        pdf_path = write_sample_pdf(os.path.join(work_dir, "handbook.pdf"), PAGES)
+        register_extractor(CountingExtractor())
+
+        # Test 1: pages are extracted once, with their page numbers
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap",
+                           pdf_extractor="counting-pypdf")
+        if not rag_crew.load_and_process_documents([pdf_path]):
+            print("❌ Failed to load the PDF")
+            return False
+        extraction = rag_crew.last_ingestion_report["extraction"]
+        if extraction["pdf_pages"] != 3 or extraction["cache_misses"] != 1 or CountingExtractor.pages_extracted != 3:
+            print(f"❌ Expected three freshly extracted pages: {extraction}")
+            return False
+        if "thirty days of paid holiday" not in rag_crew.source_texts[pdf_path]:
+            print("❌ Page text missing from the extracted document")
+            return False
+        print(f"✅ Extracted {extraction['pdf_pages']} pages with {extraction['extractor']}")
+
+        # Test 2: the same file under another name is served from the cache
+        copy_path = os.path.join(work_dir, "handbook_copy.pdf")
+        shutil.copy(pdf_path, copy_path)
+        rag_crew.load_and_process_documents([copy_path])
+        extraction = rag_crew.last_ingestion_report["extraction"]
+        if extraction["cache_hits"] != 1 or CountingExtractor.pages_extracted != 3:
+            print(f"❌ Expected the copy to come from the cache: {extraction}")
+            return False
+        docs = rag_crew.query_documents("paid holiday", k=1)
+        if docs[0].metadata.get("page") != 1 or docs[0].metadata["source"] != copy_path:
+            print(f"❌ Cached pages should keep their page number and take the new source: {docs[0].metadata}")
+            return False
+        print("✅ Identical PDF served from the parsed-text cache without re-extraction")
+
+        # Test 3: page ranges extracted in worker processes give the same pages
+        serial, _ = DocumentLoader("pypdf", workers=1).load([pdf_path])
+        parallel, stats = DocumentLoader("pypdf", workers=2, min_parallel_pages=1).load([pdf_path])
+        if stats["parallel_files"] != 1 or [d.page_content for d in serial[0][1]] != [d.page_content for d in parallel[0][1]]:
+            print("❌ Parallel extraction differs from serial extraction")
+            return False
+        print("✅ Parallel page ranges match serial extraction")
+
+        # Test 4: unknown extractors are rejected up front
+        try:
+            RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "other_db"), pdf_extractor="nope")
+            print("❌ Unknown extractor was accepted")
+            return False
+        except ValueError:
+            print("✅ Unknown extractor rejected")
+
+        print("\n✅ All parsed-text cache tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Parsed-text cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_parsed_text_cache()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script to verify model warm-up, keep-alive, cold-load metrics and shared prompt prefixes against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew, format_document_context
+from langchain_core.documents import Document
+import time
+
+def llm_call_attributes(rag_crew, messages):
+    """Attributes of the llm span recorded for one CrewAI-style call"""
+    with rag_crew.tracer.trace("test"):
+        rag_crew.llm.call(messages)
+    return [span for span in rag_crew.last_trace["spans"] if span["name"].startswith("llm")][0]["attributes"]
+
+def test_prompt_cache():
+    """Test that preloading avoids cold loads and that agents share the documents prefix"""
+    mock = MockOllamaServer(generate_latency=0.0, load_latency=1.1)
+    try:
+        base_url = mock.start()
+
+        # Test 1: the first call on an unloaded model is recorded as a cold load
+        rag_crew = RAGCrew(base_url=base_url, metrics_registry=MetricsRegistry(), keep_alive="1h")
+        rag_crew.llm.invoke("Hello")
+        if rag_crew.metrics.llm_cold_loads.value(model="llama3.2:latest") != 1:
+            print("❌ Cold model load was not counted")
+            return False
+        print("✅ Cold model load counted")
+
+        # Test 2: keep_alive is sent with every call, embedding requests included
+        rag_crew.embeddings.embed_query("Hello")
+        for model in ("llama3.2:latest", "nomic-embed-text"):
+            remaining = mock._loaded[model] - time.monotonic()
+            if remaining < 1800:
+                print(f"❌ {model} should stay loaded for an hour, expires in {remaining:.0f}s")
+                return False
+        print("✅ keep_alive passed to Ollama for chat and embedding models")
+
+        # Test 3: warm-up loads every agent model and the embedding model before the first question
+        warmed = RAGCrew(base_url=base_url, metrics_registry=MetricsRegistry(),
+                         agent_models={"researcher": {"model": "llama3.2:1b"}})
+        report = warmed.warm_up(background=False)
+        if set(report) != {"llama3.2:latest", "llama3.2:1b", "nomic-embed-text"}:
+            print(f"❌ Unexpected warm-up report: {report}")
+            return False
+        warmed._llm_for(model="llama3.2:1b").invoke("Hello")
+        if warmed.metrics.llm_cold_loads.value(model="llama3.2:1b") != 0:
+            print("❌ Call after warm-up still waited for a model load")
+            return False
+        print(f"✅ Warm-up preloaded {', '.join(report)}")
+
+        # Test 4: the documents block is ordered stably and leads every agent's prompt
+        docs = [
+            Document(page_content="Jane Doe, Senior Software Engineer with 5 years of Python and AWS.",
+                     metadata={"source": "cv.txt"}),
+            Document(page_content="Requirements: Python, Kubernetes, 3+ years of backend development.",
+                     metadata={"source": "job.txt"})
+        ]
+        context = format_document_context(docs)
+        if format_document_context(list(reversed(docs))) != context:
+            print("❌ Document context depends on retrieval order")
+            return False
+        first = llm_call_attributes(rag_crew, [
+            {"role": "system", "content": "You are a Research Analyst."},
+            {"role": "user", "content": f"{context}\n\nExtract the candidate's skills."}
+        ])
+        second = llm_call_attributes(rag_crew, [
+            {"role": "system", "content": "You are a Quality Assurance specialist."},
+            {"role": "user", "content": f"{context}\n\nVerify the answer against the documents."}
+        ])
+        print(f"📊 Prompt tokens evaluated: first agent {first['prompt_tokens']}, second agent {second['prompt_tokens']}")
+        if second["prompt_tokens"] * 3 > first["prompt_tokens"]:
+            print("❌ Second agent did not reuse the shared documents prefix")
+            return False
+        print("✅ Agents share the documents prefix")
+
+        print("\n✅ All prompt cache tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Prompt cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+
+if __name__ == "__main__":
+    test_prompt_cache()
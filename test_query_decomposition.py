@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script to verify query decomposition and merged multi-query retrieval against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+
+QUESTION = "Compare the candidate's experience with the job requirements"
+
+def write_documents(directory):
+    """A CV whose every section talks about the candidate's experience, and a job description"""
+    sections = []
+    for employer in ["ACME", "GLOBEX", "INITECH", "UMBRELLA", "HOOLI", "STARK"]:
+        body = (f"The candidate gained experience at {employer.title()} building services. "
+                f"This experience covered Python, deployment and on-call duties. "
+                f"The candidate describes the experience as hands-on and compares well with peers. ") * 2
+        sections.append(f"EXPERIENCE AT {employer}\n{body}")
+    job = """BACKEND ENGINEER
+
+ABOUT US:
+We build payment infrastructure for small businesses across Europe and value calm, careful engineering.
+
+REQUIREMENTS:
+Job requirements: five years of backend development in Python, production Kubernetes, and PostgreSQL tuning.
+
+BENEFITS:
+Remote work, a learning budget, and four weeks of paid holiday every year for the whole team.
+"""
+    paths = []
+    for name, text in (("jane_cv.txt", "JANE DOE\n\n" + "\n\n".join(sections)), ("backend_job.txt", job)):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+def test_query_decomposition():
+    """Test that comparison questions retrieve evidence from both documents within one budget"""
+    work_dir = tempfile.mkdtemp(prefix="query_decomposition_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0,
+                            response_text="skills listed by the candidate\nsalary offered for the role")
+    try:
+        base_url = mock.start()
+        cv_path, job_path = write_documents(work_dir)
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap",
+                           retrieval_k=3, metrics_registry=MetricsRegistry())
+        if not rag_crew.load_and_process_documents([cv_path, job_path]):
+            print("❌ Failed to load documents")
+            return False
+
+        # Test 1: one dense query only finds the CV
+        single = rag_crew.query_documents(QUESTION, decompose=False)
+        if {doc.metadata["source"] for doc in single} != {cv_path}:
+            print("❌ Expected the undecomposed question to retrieve only CV chunks")
+            return False
+        print(f"✅ Single query retrieves {len(single)} chunks, all from the CV")
+
+        # Test 2: decomposed, the same k covers both documents without duplicates
+        merged = rag_crew.query_documents(QUESTION)
+        sources = {doc.metadata["source"] for doc in merged}
+        if sources != {cv_path, job_path} or len(merged) != 3:
+            print(f"❌ Expected 3 chunks from both documents, got {[os.path.basename(s) for s in sources]}")
+            return False
+        if len({doc.page_content for doc in merged}) != len(merged):
+            print("❌ Merged results contain duplicate chunks")
+            return False
+        if rag_crew.last_decomposition["method"] != "rules" or rag_crew.metrics.query_decompositions.value(method="rules") != 1:
+            print(f"❌ Unexpected decomposition: {rag_crew.last_decomposition}")
+            return False
+        print(f"✅ Decomposed into {len(rag_crew.last_decomposition['sub_queries'])} sub-queries covering both documents")
+
+        # Test 3: the context budget caps the merged chunks, and caller filters still apply
+        rag_crew.context_budget_chars = 1
+        if len(rag_crew.query_documents(QUESTION)) != 1:
+            print("❌ Context budget was not applied to merged results")
+            return False
+        rag_crew.context_budget_chars = None
+        scoped = rag_crew.query_documents(QUESTION, filters={"doc_type": "cv"})
+        if {doc.metadata["source"] for doc in scoped} != {cv_path}:
+            print("❌ Sub-queries escaped the caller's filters")
+            return False
+        print("✅ Context budget and caller filters respected")
+
+        # Test 4: questions no rule splits can be decomposed by the LLM on request
+        question = "Tell me everything that matters about this person for the backend engineering team"
+        rag_crew.llm_decomposition = True
+        rag_crew.query_documents(question)
+        sub_queries = [sub_query["query"] for sub_query in rag_crew.last_decomposition["sub_queries"]]
+        if rag_crew.last_decomposition["method"] != "llm" or "salary offered for the role" not in sub_queries:
+            print(f"❌ Expected LLM sub-queries, got {rag_crew.last_decomposition}")
+            return False
+        print(f"✅ LLM-assisted decomposition: {sub_queries[1:]}")
+
+        print("\n✅ All query decomposition tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Query decomposition test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_query_decomposition()
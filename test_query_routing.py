@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script to verify query routing between fast, standard, analytical and out-of-context paths
+"""
+
+from query_router import (KeywordRouter, EmbeddingRouter, ROUTE_FAST, ROUTE_STANDARD, ROUTE_ANALYTICAL,
+                          ROUTE_OUT_OF_CONTEXT)
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+from langchain_ollama import OllamaEmbeddings
+import os
+import shutil
+import tempfile
+
+OFFICE_GUIDE = """OFFICE GUIDE
+
+Office party: every Friday the team bakes for the whole office. To bake a chocolate cake, melt the chocolate
+with butter, fold in eggs, sugar and flour, and bake it for thirty minutes.
+
+Badges must be worn inside the branch offices at all times, and visitors sign in at reception.
+"""
+
+def test_keyword_routing():
+    """Test the keyword fallback router (no model required)"""
+    router = KeywordRouter()
+    cases = [
+        ("What is the candidate's email?", ROUTE_FAST),
+        ("Describe the responsibilities of the role at the company", ROUTE_STANDARD),
+        ("Is this candidate a good fit for the position?", ROUTE_ANALYTICAL),
+        ("What experience does the candidate have with Python and cloud platforms in past jobs?", ROUTE_STANDARD),
+    ]
+    passed = True
+    for query, expected in cases:
+        decision = router.route(query)
+        status = "✅" if decision["route"] == expected else "❌"
+        passed = passed and decision["route"] == expected
+        print(f"{status} {query} -> {decision['route']} (expected {expected})")
+    return passed
+
+def test_embedding_routing():
+    """Test the embedding router against a mock Ollama, whose embeddings follow shared words"""
+    mock = MockOllamaServer(embed_latency=0.0)
+    try:
+        router = EmbeddingRouter(OllamaEmbeddings(model="nomic-embed-text", base_url=mock.start()))
+        cases = [
+            ("What is the candidate's phone number?", ROUTE_FAST),
+            ("Describe the candidate's work history and education.", ROUTE_STANDARD),
+            ("Is this candidate a good fit for the job requirements?", ROUTE_ANALYTICAL),
+            ("What is the weather like in Paris today?", ROUTE_OUT_OF_CONTEXT),
+        ]
+        passed = True
+        for query, expected in cases:
+            decision = router.route(query)
+            status = "✅" if decision["route"] == expected else "❌"
+            passed = passed and decision["route"] == expected
+            print(f"{status} {query} -> {decision['route']} via {decision['method']} "
+                  f"(confidence {decision['confidence']:.2f}, expected {expected})")
+        return passed
+    except Exception as e:
+        print(f"❌ Embedding routing test failed: {e}")
+        return False
+    finally:
+        mock.stop()
+
+def test_out_of_context_confirmation():
+    """Test that an out-of-context route is only taken when the documents have nothing relevant either"""
+    work_dir = tempfile.mkdtemp(prefix="query_routing_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        path = os.path.join(work_dir, "office_guide.txt")
+        with open(path, "w") as f:
+            f.write(OFFICE_GUIDE)
+        rag_crew = RAGCrew(base_url=mock.start(), persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap")
+        if not rag_crew.load_and_process_documents([path]):
+            print("❌ Failed to load documents")
+            return False
+
+        # The question matches an out-of-context exemplar word for word, but the guide answers it
+        question = "How do I bake a chocolate cake?"
+        if rag_crew.router.route(question)["route"] != ROUTE_OUT_OF_CONTEXT:
+            print("❌ The router should guess out-of-context for this question")
+            return False
+        details = rag_crew.generate_response(question, return_details=True)
+        if details["route"] == ROUTE_OUT_OF_CONTEXT or details["route_decision"]["method"] != "relevance_override":
+            print(f"❌ Question answered by the documents was refused: {details['route_decision']}")
+            return False
+        print(f"✅ {question} -> {details['route']} (router guess overridden by retrieval)")
+
+        # A question the documents cannot answer still gets the out-of-context reply
+        details = rag_crew.generate_response("What is the capital of France?", return_details=True)
+        if details["route"] != ROUTE_OUT_OF_CONTEXT or details["documents"]:
+            print(f"❌ Unrelated question should be out of context: {details['route_decision']}")
+            return False
+        print("✅ Unrelated question confirmed out of context")
+        return True
+    except Exception as e:
+        print(f"❌ Out-of-context confirmation test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    print("Testing query routing...")
+    if test_keyword_routing() and test_embedding_routing() and test_out_of_context_confirmation():
+        print("\n✅ All query routing tests passed!")
+    else:
+        print("\n❌ Query routing tests failed")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-request and per-agent time and token limits against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew, PARTIAL_ANSWER_MARKER
+from query_router import ROUTE_FAST, ROUTE_STANDARD
+from benchmark_rag import build_synthetic_corpus, synthetic_queries
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import time
+
+LONG_RESPONSE = "Final Answer: " + " ".join(f"word{i}" for i in range(300))
+
+class FixedRouter:
+    """Sends every question down one route"""
+
+    def __init__(self, route):
+        self.fixed_route = route
+
+    def route(self, query, query_vector=None):
+        return {"route": self.fixed_route, "method": "fixed", "confidence": 1.0}
+
+def timed_answer(rag_crew, query, **limits):
+    start = time.perf_counter()
+    details = rag_crew.generate_response(query, return_details=True, **limits)
+    return str(details["answer"]), details["partial"], time.perf_counter() - start
+
+def test_request_limits():
+    """Test that limits cut answers short, mark them as partial and keep the best output"""
+    work_dir = tempfile.mkdtemp(prefix="request_limits_test_")
+    mock = MockOllamaServer(generate_latency=0.0, token_latency=0.02, response_text=LONG_RESPONSE)
+    try:
+        base_url = mock.start()
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        file_paths = build_synthetic_corpus(50, corpus_dir)
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"),
+                           vector_backend="mmap", router=FixedRouter(ROUTE_FAST))
+        if not rag_crew.load_and_process_documents(file_paths):
+            print("❌ Failed to load documents")
+            return False
+        queries = synthetic_queries(5)
+
+        # Test 1: without limits the full answer comes back unmarked
+        answer, partial, _ = timed_answer(rag_crew, queries[0])
+        if answer.startswith(PARTIAL_ANSWER_MARKER) or partial:
+            print("❌ Unlimited answer should not be partial")
+            return False
+        print("✅ Unlimited answer is complete")
+
+        # Test 2: a token budget stops generation and keeps the text produced so far
+        answer, partial, _ = timed_answer(rag_crew, queries[1], max_tokens=20)
+        if not answer.startswith(PARTIAL_ANSWER_MARKER) or partial["reason"] != "token_budget":
+            print(f"❌ Expected a partial answer at the token budget, got: {answer[:120]}")
+            return False
+        if "word10" not in answer or "word50" in answer:
+            print("❌ Partial answer should hold only the first tokens")
+            return False
+        print("✅ Token budget returns the draft so far, marked as partial")
+
+        # Test 3: a request deadline returns on time even while the model is still loading
+        mock.load_latency = 3.0
+        mock._loaded.pop("llama3.2:latest", None)
+        answer, partial, elapsed = timed_answer(rag_crew, queries[2], timeout=0.5)
+        mock.load_latency = 0.0
+        if not answer.startswith(PARTIAL_ANSWER_MARKER) or partial["reason"] != "deadline":
+            print(f"❌ Expected a partial answer at the deadline, got: {answer[:120]}")
+            return False
+        if elapsed > 1.5:
+            print(f"❌ Deadline of 0.5s was not enforced ({elapsed:.1f}s)")
+            return False
+        print(f"✅ Request deadline enforced ({elapsed:.2f}s for a 0.5s limit)")
+
+        # Test 4: a slow QA agent is cut off and the writer's draft is returned instead
+        rag_crew.router = FixedRouter(ROUTE_STANDARD)
+        rag_crew.agent_models["qa_agent"]["timeout"] = 0.5
+        answer, partial, _ = timed_answer(rag_crew, queries[3])
+        if not answer.startswith(PARTIAL_ANSWER_MARKER) or partial["reason"] != "agent_deadline":
+            print(f"❌ Expected a partial answer from the QA time limit, got: {answer[:120]}")
+            return False
+        if partial["stage"] != rag_crew.AGENT_PROFILES["writer"]["role"]:
+            print(f"❌ Expected the writer's draft, got output from {partial['stage']}")
+            return False
+        print("✅ QA time limit returns the writer's draft, marked as partial")
+
+        # Test 5: concurrent questions each get their own partial status
+        rag_crew.router = FixedRouter(ROUTE_FAST)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            limited = executor.submit(timed_answer, rag_crew, queries[4], max_tokens=20)
+            unlimited = executor.submit(timed_answer, rag_crew, queries[3])
+            (limited_answer, limited_partial, _), (full_answer, full_partial, _) = limited.result(), unlimited.result()
+        if not limited_partial or limited_partial["reason"] != "token_budget" or full_partial is not None:
+            print(f"❌ Partial status leaked between concurrent questions: {limited_partial}, {full_partial}")
+            return False
+        if full_answer.startswith(PARTIAL_ANSWER_MARKER) or not limited_answer.startswith(PARTIAL_ANSWER_MARKER):
+            print("❌ Concurrent answers were marked wrongly")
+            return False
+        print("✅ Concurrent questions report their own partial status")
+
+        if rag_crew.metrics.partial_answers.value(reason="deadline") < 1:
+            print("❌ Partial answers should be counted in the metrics")
+            return False
+
+        print("\n✅ All request limit tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Request limit test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_request_limits()
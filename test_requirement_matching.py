@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the requirement-to-evidence coverage table
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew, detect_document_type
+from requirement_matcher import split_requirements, split_evidence, format_coverage_table
+from test_analytical_rag import create_sample_cv, create_job_description
+import os
+import shutil
+import tempfile
+
+def test_requirement_matching():
+    """Test requirement splitting, document detection, the coverage table and its thresholds"""
+    work_dir = tempfile.mkdtemp(prefix="requirement_matching_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    cv_path = job_path = None
+    try:
+        base_url = mock.start()
+        cv_path = create_sample_cv()
+        job_path = create_job_description()
+        with open(cv_path) as f:
+            cv_text = f.read()
+        with open(job_path) as f:
+            job_text = f.read()
+
+        # Splitting is pure text processing and needs no model
+        requirements = split_requirements(job_text)
+        evidence = split_evidence(cv_text)
+        print(f"✅ Split job description into {len(requirements)} requirements")
+        print(f"✅ Split CV into {len(evidence)} evidence items")
+        if any("salary" in r["text"].lower() for r in requirements):
+            print("❌ Benefits should not be treated as requirements")
+            return False
+
+        if detect_document_type(cv_text) != "cv" or detect_document_type(job_text) != "job_description":
+            print("❌ Document type detection failed")
+            return False
+        print("✅ Detected CV and job description")
+
+        # Full matching embeds both sides in one batch through (mock) Ollama
+        def crew(name, **options):
+            return RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, name),
+                           vector_backend="mmap", metrics_registry=MetricsRegistry(), **options)
+
+        rag_crew = crew("default_db")
+        rag_crew.load_and_process_documents([cv_path, job_path])
+        embed_calls = mock.request_counts.get("/api/embed", 0)
+        report = rag_crew.assess_requirement_coverage()
+        if not report or len(report["rows"]) != len(requirements):
+            print("❌ No coverage report produced for the loaded CV and job description")
+            return False
+        if mock.request_counts.get("/api/embed", 0) - embed_calls != 1:
+            print("❌ Requirements and evidence should be embedded in one batch")
+            return False
+        for row in report["rows"]:
+            expected = "matched" if row["score"] >= 0.75 else "partial" if row["score"] >= 0.6 else "missing"
+            if row["status"] != expected:
+                print(f"❌ Score {row['score']:.2f} marked {row['status']} with the default thresholds")
+                return False
+
+        print(format_coverage_table(report))
+        print(f"✅ Coverage computed in {report['elapsed_ms']:.0f} ms")
+
+        # The met/partial thresholds are RAGCrew parameters
+        for name, matched, partial, status in (("lenient_db", 0.0, 0.0, "matched"),
+                                               ("strict_db", 1.1, 1.1, "missing"),
+                                               ("partial_db", 1.1, 0.0, "partial")):
+            report = crew(name, requirement_matched_threshold=matched,
+                          requirement_partial_threshold=partial).assess_requirement_coverage(job_text, cv_text)
+            statuses = {row["status"] for row in report["rows"]}
+            if statuses != {status}:
+                print(f"❌ Thresholds {matched}/{partial} should mark every requirement {status}: {statuses}")
+                return False
+        try:
+            crew("inverted_db", requirement_matched_threshold=0.5, requirement_partial_threshold=0.7)
+            print("❌ A partial threshold above the matched threshold was accepted")
+            return False
+        except ValueError:
+            pass
+        print("✅ Met and partial thresholds follow the RAGCrew parameters")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Requirement matching test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for path in (cv_path, job_path):
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+if __name__ == "__main__":
+    print("Testing requirement coverage matching...")
+    test_requirement_matching()
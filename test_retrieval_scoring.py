@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the query vector cache and score-aware retrieval (k, cutoff, MMR) against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+
+DOCUMENTS = {
+    "holiday_1.txt": "Employees receive thirty days of paid holiday per year.",
+    "holiday_2.txt": "Employees receive thirty days of paid holiday every year.",
+    "holiday_3.txt": "All employees receive thirty days of paid holiday per year.",
+    "holiday_portal.txt": "The HR portal shows how many days of paid holiday you have left.",
+    "badges.txt": "Badges must be worn inside the branch offices at all times.",
+}
+QUESTION = "How many days of paid holiday do employees receive per year?"
+
+def write_documents(directory):
+    paths = []
+    for name, text in DOCUMENTS.items():
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], "w") as f:
+            f.write(text)
+    return paths
+
+def names(docs):
+    return [os.path.basename(doc.metadata["source"]) for doc in docs]
+
+def test_retrieval_scoring():
+    """Test query vector LRU hits and eviction, and that k, score_threshold and MMR change the chunks returned"""
+    work_dir = tempfile.mkdtemp(prefix="retrieval_scoring_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        paths = write_documents(work_dir)
+
+        for backend in ("chroma", "mmap"):
+            # Duplicate detection is off so the three near-identical holiday chunks are all stored
+            rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, f"{backend}_db"),
+                               vector_backend=backend, vector_dtype="float32", duplicate_policy=None,
+                               metrics_registry=MetricsRegistry())
+            if not rag_crew.load_and_process_documents(paths):
+                print(f"❌ {backend}: failed to load documents")
+                return False
+
+            def search(question=QUESTION, **options):
+                return rag_crew.query_documents(question, decompose=False, **options)
+
+            # Test 1: a question is embedded once; respelled copies hit the cache until evicted
+            rag_crew.query_processor.cache_size = 2
+            embedded = mock.embedded_by_model.get(rag_crew.embedding_model, 0)
+            search()
+            search("  how many DAYS of paid holiday do employees receive per year?")
+            search("Where must badges be worn?")
+            search("What does the HR portal show?")  # evicts QUESTION, the least recently used
+            search()
+            processor = rag_crew.query_processor
+            if (processor.hits, processor.misses) != (1, 4) or \
+                    mock.embedded_by_model[rag_crew.embedding_model] - embedded != 4:
+                print(f"❌ {backend}: expected 1 hit and 4 misses, got {processor.hits} and {processor.misses}")
+                return False
+            if rag_crew.metrics.cache_requests.value(cache="query_vector", result="hit") != 1:
+                print(f"❌ {backend}: query vector hits were not counted")
+                return False
+            print(f"✅ {backend}: respelled question reused its vector, evicted one was embedded again")
+
+            # Test 2: k chunks come back best first, each with its similarity
+            docs = search(k=4)
+            scores = [doc.metadata["relevance_score"] for doc in docs]
+            if len(docs) != 4 or scores != sorted(scores, reverse=True) or "badges.txt" in names(docs):
+                print(f"❌ {backend}: expected the four holiday chunks best first: {list(zip(names(docs), scores))}")
+                return False
+            if len(search(k=1)) != 1:
+                print(f"❌ {backend}: k=1 should return one chunk")
+                return False
+            print(f"✅ {backend}: k chunks returned best first, scores {scores}")
+
+            # Test 3: score_threshold drops chunks below the cutoff
+            cutoff = (scores[2] + scores[3]) / 2
+            docs = search(k=4, score_threshold=cutoff)
+            if len(docs) != 3 or any(doc.metadata["relevance_score"] < cutoff for doc in docs):
+                print(f"❌ {backend}: cutoff {cutoff:.3f} should keep three chunks: {names(docs)}")
+                return False
+            if search(k=4, score_threshold=0.999):
+                print(f"❌ {backend}: no chunk should pass a 0.999 cutoff")
+                return False
+            print(f"✅ {backend}: score_threshold {cutoff:.3f} kept {len(docs)} of 4 chunks")
+
+            # Test 4: MMR trades a near-duplicate for a different chunk
+            plain = names(search(k=2))
+            diverse = names(search(k=2, use_mmr=True))
+            if not all(name.startswith("holiday_") and name != "holiday_portal.txt" for name in plain):
+                print(f"❌ {backend}: without MMR the two near-identical chunks should win: {plain}")
+                return False
+            if diverse[0] != plain[0] or diverse[1] != "holiday_portal.txt":
+                print(f"❌ {backend}: MMR should pick the portal chunk second: {diverse}")
+                return False
+            print(f"✅ {backend}: MMR returned {diverse} instead of {plain}")
+
+        print("\n✅ All retrieval scoring tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Retrieval scoring test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_retrieval_scoring()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the semantic response cache: similarity threshold, question signature, scope and invalidation
+"""
+
+from mock_ollama import MockOllamaServer
+from metrics import MetricsRegistry
+from rag_crew import RAGCrew, SemanticCache
+from query_router import ROUTE_FAST
+import numpy as np
+import os
+import shutil
+import tempfile
+
+HANDBOOK = "Employees receive thirty days of paid holiday per year and may carry five days into the next year."
+EXPENSES = "Expenses are reimbursed within ten working days when the receipt is uploaded to the finance portal."
+QUESTION = "How many days of paid holiday do employees receive?"
+
+class FixedRouter:
+    """Sends every question down one route"""
+
+    def __init__(self, route):
+        self.fixed_route = route
+
+    def route(self, query, query_vector=None):
+        return {"route": self.fixed_route, "method": "fixed", "confidence": 1.0}
+
+def unit_vector(cosine):
+    """A 2-d unit vector with the given cosine to (1, 0)"""
+    return np.array([cosine, np.sqrt(1 - cosine ** 2)], dtype=np.float32)
+
+def test_cache_keys():
+    """Test the 0.98 similarity threshold, the question signature and the scope"""
+    cache = SemanticCache()
+    cache.store(unit_vector(1.0), "What leave does Jane get in 2024?", "Jane: 30 days")
+    cache.store(unit_vector(1.0), "What leave does Jane get in 2024?", "Scoped", scope='{"k": 1}')
+
+    # Test 1: only vectors at or above the threshold reuse the answer
+    hit = cache.lookup(unit_vector(0.985), "What leave does Jane get in 2024?")
+    if hit is None or hit[0] != "Jane: 30 days" or abs(hit[1] - 0.985) > 1e-3:
+        print(f"❌ A similarity of 0.985 should reuse the answer, got {hit}")
+        return False
+    if cache.lookup(unit_vector(0.97), "What leave does Jane get in 2024?") is not None:
+        print("❌ A similarity of 0.97 should not reuse the answer")
+        return False
+    print(f"✅ Similarity threshold {cache.similarity_threshold} respected")
+
+    # Test 2: identical vectors still miss when names or numbers differ
+    for query in ("What leave does John get in 2024?", "What leave does Jane get in 2023?"):
+        if cache.lookup(unit_vector(1.0), query) is not None:
+            print(f"❌ '{query}' reused the answer of a question about someone or something else")
+            return False
+    if cache.lookup(unit_vector(1.0), "what leave does Jane get in 2024?") is None:
+        print("❌ A lower-case first word should not change the signature")
+        return False
+    print("✅ Questions naming other people or years are not served the cached answer")
+
+    # Test 3: answers are only reused within their scope
+    scoped = cache.lookup(unit_vector(1.0), "What leave does Jane get in 2024?", scope='{"k": 1}')
+    if scoped is None or scoped[0] != "Scoped" or \
+            cache.lookup(unit_vector(1.0), "What leave does Jane get in 2024?", scope='{"k": 2}') is not None:
+        print(f"❌ Scoped lookups mixed answers: {scoped}")
+        return False
+    if (cache.hits, cache.misses) != (3, 4):
+        print(f"❌ Expected 3 hits and 4 misses, got {cache.hits} and {cache.misses}")
+        return False
+    print("✅ Scoped answers are cached apart")
+    return True
+
+def test_cache_invalidation():
+    """Test that ingesting or deleting documents stops stale answers being reused"""
+    work_dir = tempfile.mkdtemp(prefix="semantic_cache_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        paths = []
+        for name, text in (("handbook.txt", HANDBOOK), ("expenses.txt", EXPENSES)):
+            paths.append(os.path.join(work_dir, name))
+            with open(paths[-1], "w") as f:
+                f.write(text)
+
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"),
+                           vector_backend="mmap", router=FixedRouter(ROUTE_FAST), metrics_registry=MetricsRegistry())
+        if not rag_crew.load_and_process_documents(paths[:1]):
+            print("❌ Failed to load documents")
+            return False
+
+        def ask():
+            """Route of the answer and the number of LLM calls it took"""
+            generated = sum(mock.generated_by_model.values())
+            details = rag_crew.generate_response(QUESTION, return_details=True)
+            return details["route"], sum(mock.generated_by_model.values()) - generated
+
+        # Test 4: a repeated question is answered from the cache, with its sources
+        first, repeat = ask(), ask()
+        if first != (ROUTE_FAST, 1) or repeat != ("cached", 0):
+            print(f"❌ Expected one LLM call then a cached answer, got {first} and {repeat}")
+            return False
+        sources = rag_crew.generate_response(QUESTION, return_details=True)["documents"]
+        if [os.path.basename(doc.metadata["source"]) for doc in sources] != ["handbook.txt"]:
+            print("❌ The cached answer lost its sources")
+            return False
+        print("✅ Repeated question answered from the cache")
+
+        # Test 5: adding documents or deleting one drops cached answers
+        for change, apply in (("ingestion", lambda: rag_crew.load_and_process_documents(paths[1:],
+                                                                                        clear_existing=False)),
+                              ("deletion", lambda: rag_crew.delete_source("expenses.txt"))):
+            apply()
+            after = ask()
+            if after != (ROUTE_FAST, 1) or ask() != ("cached", 0):
+                print(f"❌ After {change} the question should be answered again, got {after}")
+                return False
+            print(f"✅ Cached answers dropped after {change}")
+
+        print("\n✅ All semantic cache tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Semantic cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_cache_keys() and test_cache_invalidation()
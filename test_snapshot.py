@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script to verify index snapshot export and import against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+from benchmark_rag import build_synthetic_corpus, synthetic_queries
+import os
+import shutil
+import tempfile
+
+def test_snapshot():
+    """Test that a snapshot restores the same index without re-embedding"""
+    work_dir = tempfile.mkdtemp(prefix="snapshot_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        file_paths = build_synthetic_corpus(300, corpus_dir)
+        snapshot_path = os.path.join(work_dir, "index.snapshot")
+
+        # Test 1: export an ingested index to one file
+        source = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "source_db"))
+        if not source.load_and_process_documents(file_paths) or not source.export_snapshot(snapshot_path):
+            print("❌ Failed to ingest and export")
+            return False
+        print(f"✅ Exported {source.get_document_count()} chunks ({os.path.getsize(snapshot_path)} bytes)")
+
+        # Test 2: import into a fresh replica, on both vector backends, without embedding any chunk
+        for backend in ("chroma", "mmap"):
+            replica = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, f"{backend}_db"),
+                              vector_backend=backend)
+            embed_calls = mock.request_counts.get("/api/embed", 0)
+            if not replica.import_snapshot(snapshot_path):
+                print(f"❌ Import into the {backend} backend failed")
+                return False
+            if replica.get_document_count() != source.get_document_count():
+                print(f"❌ {backend}: expected {source.get_document_count()} chunks, got {replica.get_document_count()}")
+                return False
+            if mock.request_counts.get("/api/embed", 0) != embed_calls:
+                print(f"❌ {backend}: import should not re-embed chunks")
+                return False
+            if replica.list_sources() != source.list_sources() or replica.lexical_index.chunks != source.lexical_index.chunks:
+                print(f"❌ {backend}: sources or lexical index differ after import")
+                return False
+
+            # Retrieval on the replica matches the source
+            for query in synthetic_queries(5):
+                expected = [doc.page_content for doc in source.query_documents(query, k=3)]
+                found = [doc.page_content for doc in replica.query_documents(query, k=3)]
+                if expected[0] != found[0]:
+                    print(f"❌ {backend}: top result differs for '{query}'")
+                    return False
+            print(f"✅ {backend} replica restored without re-embedding and retrieves the same chunks")
+
+        # Test 3: a snapshot from a different embedding model is rejected
+        other = RAGCrew(embedding_model="other-embedder", base_url=base_url,
+                        persist_directory=os.path.join(work_dir, "other_db"))
+        if other.import_snapshot(snapshot_path):
+            print("❌ Snapshot from another embedding model should be rejected")
+            return False
+        print("✅ Snapshot from a different embedding model was rejected")
+
+        # Test 4: an unwritable path returns False and leaves no file behind
+        missing_dir = os.path.join(work_dir, "missing")
+        if source.export_snapshot(os.path.join(missing_dir, "index.snapshot")) or os.path.exists(missing_dir):
+            print("❌ Export to a missing directory should return False without writing")
+            return False
+        listed = sorted(os.listdir(work_dir))
+        if any(name.endswith(".partial") for name in listed):
+            print(f"❌ A partial snapshot was left behind: {listed}")
+            return False
+        print("✅ Export to an unwritable path returned False")
+
+        print("\n✅ All snapshot tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Snapshot test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_snapshot()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script to verify summary nodes and granularity selection against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+import os
+import shutil
+import tempfile
+
+CV_TEXT = """JANE SMITH - DATA ENGINEER
+
+PROFESSIONAL SUMMARY:
+Data engineer with 6 years of experience building batch and streaming pipelines for retail analytics.
+She has led migrations to cloud warehouses and mentored three junior engineers.
+
+WORK EXPERIENCE:
+Data Engineer - Northwind Analytics (2019-2024)
+- Built streaming pipelines on Apache Kafka and Spark processing two billion events a day
+- Migrated the warehouse from on-premise Oracle to Snowflake with no downtime
+- Introduced data quality checks that cut incident tickets by half
+
+EDUCATION:
+MSc in Computer Science, University of Edinburgh (2017)
+BSc in Mathematics, University of Leeds (2015)
+
+SKILLS:
+Python, SQL, Scala, Apache Kafka, Spark, Airflow, Snowflake, dbt, Terraform
+"""
+
+JOB_TEXT = """SENIOR DATA ENGINEER
+
+RESPONSIBILITIES:
+We are seeking a Senior Data Engineer to own our ingestion platform end to end.
+- Design streaming pipelines with Apache Kafka
+- Run the warehouse and its cost controls
+
+REQUIREMENTS:
+- 5+ years of data engineering experience
+- Experience with Snowflake or BigQuery
+- Strong SQL and Python
+
+BENEFITS:
+Remote-first team, learning budget and 30 days of paid holiday.
+"""
+
+def write_documents(directory):
+    paths = []
+    for name, text in (("jane_smith_cv.txt", CV_TEXT), ("senior_data_engineer_job.txt", JOB_TEXT)):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+def test_summary_tree():
+    """Test that summary nodes are linked, stored and picked for broad questions"""
+    work_dir = tempfile.mkdtemp(prefix="summary_tree_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0, response_text="A short LLM summary.")
+    try:
+        base_url = mock.start()
+        file_paths = write_documents(work_dir)
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap",
+                           summary_nodes="extractive")
+        if not rag_crew.load_and_process_documents(file_paths):
+            print("❌ Failed to load documents")
+            return False
+        report = rag_crew.last_ingestion_report
+
+        # Test 1: summaries are stored next to the chunks but stay out of the term statistics
+        if not report.get("summary_nodes") or rag_crew.get_document_count() != report["chunks"] + report["summary_nodes"]:
+            print(f"❌ Expected summary nodes in the index: {report}")
+            return False
+        if rag_crew.lexical_index.chunks != report["chunks"]:
+            print("❌ Summary nodes were added to the lexical index")
+            return False
+        print(f"✅ {report['summary_nodes']} summary nodes stored next to {report['chunks']} chunks")
+
+        # Test 2: each question gets the right granularity
+        cases = [
+            ("Summarize this candidate", "document"),
+            ("What are the main points of the job description?", "section"),
+            ("Which university did Jane attend?", "chunk"),
+        ]
+        for question, expected in cases:
+            docs = rag_crew.query_documents(question)
+            node_types = {doc.metadata.get("node_type") for doc in docs}
+            if rag_crew.last_granularity != expected or node_types != {expected}:
+                print(f"❌ '{question}': expected {expected} nodes, got {node_types}")
+                return False
+            if expected == "document" and len(docs) > rag_crew.summary_k:
+                print("❌ Broad question should use at most summary_k summaries")
+                return False
+        print("✅ Document, section and chunk granularity chosen per question")
+
+        # Test 3: parent/child links lead from a document summary down to its chunks
+        document = rag_crew.query_documents("Give me an overview of the candidate")[0]
+        sections = rag_crew.node_children(document.metadata["node_id"])
+        if len(sections) != document.metadata["children"] or any(s.metadata["node_type"] != "section" for s in sections):
+            print(f"❌ Document node should link to {document.metadata['children']} sections, found {len(sections)}")
+            return False
+        chunks = rag_crew.node_children(sections[0].metadata["node_id"])
+        if not chunks or any(chunk.metadata["node_type"] != "chunk" for chunk in chunks):
+            print("❌ Section node should link to its chunks")
+            return False
+        print(f"✅ Document summary → {len(sections)} sections → {len(chunks)} chunks in the first section")
+
+        # Test 4: LLM summaries are written at ingestion when requested
+        llm_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "llm_db"), vector_backend="mmap",
+                           summary_nodes="llm")
+        generate_calls = mock.request_counts.get("/api/generate", 0)
+        if not llm_crew.load_and_process_documents(file_paths):
+            print("❌ Failed to load documents with LLM summaries")
+            return False
+        calls = mock.request_counts.get("/api/generate", 0) - generate_calls
+        if calls != llm_crew.last_ingestion_report["summary_nodes"]:
+            print(f"❌ Expected one LLM call per summary node, got {calls}")
+            return False
+        if "A short LLM summary." not in llm_crew.query_documents("Summarize the job")[0].page_content:
+            print("❌ LLM summary was not stored")
+            return False
+        print(f"✅ {calls} LLM summaries written at ingestion")
+
+        print("\n✅ All summary tree tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Summary tree test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_summary_tree()
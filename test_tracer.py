@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script to verify trace spans nest across thread pools and are exported as JSON lines
+"""
+
+from rag_crew import Tracer
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+import time
+
+def test_tracer():
+    """Test parent ids, durations, re-parented LLM spans and the JSON lines export"""
+    work_dir = tempfile.mkdtemp(prefix="tracer_test_")
+    try:
+        export_path = os.path.join(work_dir, "traces.jsonl")
+        tracer = Tracer(export_path=export_path)
+
+        def search(sub_query):
+            with tracer.span("search", sub_query=sub_query):
+                with tracer.span("score"):
+                    time.sleep(0.05)
+
+        def untraced():
+            with tracer.span("lost") as span:
+                return span
+
+        with tracer.trace("question", tenant="test") as trace:
+            with tracer.span("retrieve"):
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    futures = [executor.submit(contextvars.copy_context().run, search, sub_query)
+                               for sub_query in ("a", "b", "c")]
+                    # Without the copied context the worker sees no active trace
+                    lost = executor.submit(untraced).result()
+                    for future in futures:
+                        future.result()
+            start = time.perf_counter()
+            with tracer.span("llm_call", prompt_tokens=10, completion_tokens=4):
+                time.sleep(0.01)
+            with tracer.span("llm_call", prompt_tokens=20, completion_tokens=6):
+                pass
+            agent = tracer.record_span("agent", start, time.perf_counter())
+            try:
+                with tracer.span("failing"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+
+        spans = {}
+        for span in trace["spans"]:
+            spans.setdefault(span["name"], []).append(span)
+        root, retrieve = spans["question"][0], spans["retrieve"][0]
+
+        # Test 1: spans opened in pool threads nest under the span that submitted them
+        if root["parent_id"] is not None or retrieve["parent_id"] != root["span_id"]:
+            print("❌ retrieve should be the only child of the root span")
+            return False
+        searches = spans["search"]
+        if len(searches) != 3 or any(span["parent_id"] != retrieve["span_id"] for span in searches):
+            print(f"❌ Pool searches were not parented to retrieve: {[span['parent_id'] for span in searches]}")
+            return False
+        search_ids = {span["span_id"] for span in searches}
+        if len(spans["score"]) != 3 or {span["parent_id"] for span in spans["score"]} != search_ids:
+            print("❌ Each score span should nest under its own search span")
+            return False
+        if "lost" in spans or lost["attributes"] != {}:
+            print("❌ A span outside the trace's context should not be recorded")
+            return False
+        print("✅ Spans from pool threads nest under the submitting span")
+
+        # Test 2: durations cover their children and the searches ran in parallel
+        if any(span["duration_ms"] < 50 for span in searches) or \
+                not max(span["duration_ms"] for span in searches) <= retrieve["duration_ms"] < 140 or \
+                retrieve["duration_ms"] > root["duration_ms"]:
+            print(f"❌ Unexpected durations: retrieve {retrieve['duration_ms']:.1f} ms, "
+                  f"searches {[round(span['duration_ms'], 1) for span in searches]}")
+            return False
+        print(f"✅ Three 50 ms searches took {retrieve['duration_ms']:.0f} ms in the pool")
+
+        # Test 3: LLM calls inside a recorded span are re-parented and their tokens summed
+        if any(span["parent_id"] != agent["span_id"] for span in spans["llm_call"]) or \
+                (agent["attributes"]["prompt_tokens"], agent["attributes"]["completion_tokens"]) != (30, 10):
+            print(f"❌ LLM calls were not gathered under the agent span: {agent['attributes']}")
+            return False
+        if spans["failing"][0]["attributes"].get("error") != "boom":
+            print("❌ A failing span should record its error")
+            return False
+        print("✅ LLM calls gathered under the agent span with 30 + 10 tokens")
+
+        # Test 4: the finished trace is exported as one JSON line per span
+        with open(export_path) as f:
+            exported = [json.loads(line) for line in f]
+        if [span["span_id"] for span in exported] != [span["span_id"] for span in trace["spans"]] or \
+                any(span["trace_id"] != trace["trace_id"] or span["trace_name"] != "question" for span in exported):
+            print(f"❌ Export does not match the trace: {len(exported)} lines for {len(trace['spans'])} spans")
+            return False
+        if exported[0]["attributes"] != {"tenant": "test"} or tracer.last_trace is not trace:
+            print("❌ Root span attributes or last_trace are wrong")
+            return False
+        print(f"✅ Exported {len(exported)} spans as JSON lines")
+
+        print("\n✅ All tracer tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Tracer test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_tracer()
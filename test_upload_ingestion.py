@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script to verify ingestion of in-memory uploads against a mock Ollama server
+"""
+
+from mock_ollama import MockOllamaServer
+from rag_crew import RAGCrew
+from document_loaders import PyPDFExtractor, register_extractor
+from benchmark_extraction import write_sample_pdf
+import glob
+import io
+import os
+import shutil
+import tempfile
+
+PAGES = [
+    ["EMPLOYEE HANDBOOK", "Welcome to Northwind Bank. This handbook covers onboarding and compliance."],
+    ["LEAVE POLICY", "Employees receive thirty days of paid holiday per year."],
+]
+NOTES = "Interview notes: the candidate prefers a hybrid schedule and can start in March.\n"
+
+class PathOnlyExtractor(PyPDFExtractor):
+    """pypdf restricted to files on disk, like a command-line backend"""
+    name = "path-only-pypdf"
+    reads_memory = False
+    fail = False
+
+    def extract(self, source, start, end):
+        if not isinstance(source, str):
+            raise TypeError("expected a path")
+        if PathOnlyExtractor.fail:
+            raise RuntimeError("extraction failed")
+        return super().extract(source, start, end)
+
+def spool_directories():
+    return glob.glob(os.path.join(tempfile.gettempdir(), "onboardiq_spool_*"))
+
+def test_upload_ingestion():
+    """Test that uploads are parsed from memory, and spooled only when needed and always cleaned up"""
+    work_dir = tempfile.mkdtemp(prefix="upload_ingestion_test_")
+    mock = MockOllamaServer(generate_latency=0.0, embed_latency=0.0)
+    try:
+        base_url = mock.start()
+        pdf_path = write_sample_pdf(os.path.join(work_dir, "handbook.pdf"), PAGES)
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        register_extractor(PathOnlyExtractor())
+        leftover = set(spool_directories())
+
+        # Test 1: buffers, bytes and real files are parsed in place; only an in-memory spooled stream is read
+        rag_crew = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "db"), vector_backend="mmap",
+                           pdf_extractor="pypdf", parsed_text_cache=False)
+        stream = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+        stream.write(NOTES.encode("utf-8"))
+        stream.seek(0)
+        with open(pdf_path, "rb") as pdf_file:
+            uploads = [("handbook.pdf", io.BytesIO(pdf_bytes)), ("policy_copy.pdf", pdf_file),
+                       ("notes.txt", stream), ("readme.txt", b"Badges must be worn inside the branch offices.")]
+            if not rag_crew.load_and_process_uploads(uploads):
+                print("❌ Failed to ingest uploads")
+                return False
+        extraction = rag_crew.last_ingestion_report["extraction"]
+        if extraction["bytes_copied"] != len(NOTES) or extraction["spooled_files"] != 0:
+            print(f"❌ Expected only the spooled-in-memory stream to be copied: {extraction}")
+            return False
+        if set(rag_crew.source_texts) != {"handbook.pdf", "notes.txt", "readme.txt"}:
+            print(f"❌ Sources should be the upload names: {sorted(rag_crew.source_texts)}")
+            return False
+        # The memory-mapped copy parses to exactly the same text, so it is collapsed as a duplicate
+        if rag_crew.last_ingestion_report["duplicates"]["files"][0]["similarity"] != 1.0:
+            print("❌ Mapped file should parse to the same text as the in-memory one")
+            return False
+        if "thirty days of paid holiday" not in rag_crew.source_texts["handbook.pdf"] or \
+                "hybrid schedule" not in rag_crew.source_texts["notes.txt"]:
+            print("❌ Upload text was not extracted")
+            return False
+        print(f"✅ {extraction['bytes_in_memory']} bytes parsed from memory, {extraction['bytes_copied']} copied")
+
+        # Test 2: an extractor that needs a path gets a spooled file, removed afterwards
+        spooling = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "spool_db"),
+                           vector_backend="mmap", pdf_extractor="path-only-pypdf", parsed_text_cache=False)
+        if not spooling.load_and_process_uploads([("handbook.pdf", memoryview(pdf_bytes))]):
+            print("❌ Failed to ingest through a spooled file")
+            return False
+        extraction = spooling.last_ingestion_report["extraction"]
+        if extraction["spooled_files"] != 1 or extraction["bytes_copied"] != len(pdf_bytes):
+            print(f"❌ Expected one spooled file: {extraction}")
+            return False
+        if spooling.source_texts["handbook.pdf"] != rag_crew.source_texts["handbook.pdf"]:
+            print("❌ Spooled extraction differs from in-memory extraction")
+            return False
+        if set(spool_directories()) - leftover:
+            print("❌ Spool directory was left behind")
+            return False
+        print(f"✅ Path-only extractor got a spooled file ({extraction['bytes_copied']} bytes), since removed")
+
+        # Test 3: the spool is removed when extraction fails too
+        PathOnlyExtractor.fail = True
+        if spooling.load_and_process_uploads([("handbook.pdf", pdf_bytes)]) or set(spool_directories()) - leftover:
+            print("❌ Failed ingestion should return False and leave nothing on disk")
+            return False
+        PathOnlyExtractor.fail = False
+        print("✅ Spool directory removed after a failed extraction")
+
+        # Test 4: two uploads with the same file name are refused rather than one replacing the other
+        count = rag_crew.get_document_count()
+        clashing = [("alice/cv.txt", b"Alice Smith, data engineer with Kafka and Spark experience."),
+                    ("bob/cv.txt", b"Bob Jones, frontend developer with React and TypeScript experience.")]
+        if rag_crew.load_and_process_uploads(clashing, clear_existing=False) or rag_crew.get_document_count() != count:
+            print("❌ Uploads sharing a file name should be refused")
+            return False
+        print("✅ Uploads sharing a file name refused")
+
+        # Test 5: an upper-case .PDF extension is chunked with the PDF profile it was parsed with
+        upper = RAGCrew(base_url=base_url, persist_directory=os.path.join(work_dir, "upper_db"),
+                        vector_backend="mmap", pdf_extractor="pypdf", parsed_text_cache=False)
+        if not upper.load_and_process_uploads([("HANDBOOK.PDF", pdf_bytes)]) or \
+                upper.last_ingestion_report["files"][0]["profile"] != "pdf":
+            print(f"❌ HANDBOOK.PDF should use the pdf profile: {upper.last_ingestion_report['files']}")
+            return False
+        print("✅ Upper-case .PDF chunked as a PDF")
+
+        print("\n✅ All upload ingestion tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Upload ingestion test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        mock.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_upload_ingestion()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the memory-mapped, quantised vector index
+"""
+
+from vector_index import MMapVectorIndex
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+
+def clustered_vectors(count, dim=128, clusters=50, seed=3):
+    """Synthetic embeddings grouped around random topic centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    return centres[rng.integers(0, clusters, count)] + rng.normal(scale=0.8, size=(count, dim))
+
+def recall_at_k(index, vectors, queries, k=10):
+    """Fraction of the exact top-k neighbours the index returns"""
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    found = 0
+    for query in queries:
+        exact = set(np.argsort(-(unit @ (query / np.linalg.norm(query))))[:k])
+        texts, _, _, _ = index.search(query, k)
+        found += len(exact & {int(text.split()[-1]) for text in texts})
+    return found / (k * len(queries))
+
+def test_vector_index():
+    """Test quantised storage size, IVF recall, persistence, filtering, deletion, metadata appends and deferred training"""
+    work_dir = tempfile.mkdtemp(prefix="vector_index_test_")
+    try:
+        vectors = clustered_vectors(12000)
+        texts = [f"chunk {i}" for i in range(len(vectors))]
+        metadatas = [{"source": f"doc_{i % 4}.txt"} for i in range(len(vectors))]
+        queries = vectors[np.random.default_rng(5).choice(len(vectors), 50)]
+
+        # Test 1: int8 and float16 storage shrink the vector matrix 4x and 2x
+        indexes = {}
+        for dtype in ("float32", "float16", "int8"):
+            index = MMapVectorIndex(os.path.join(work_dir, dtype), dtype=dtype, ivf_min_rows=5000, nprobe=8)
+            index.add(texts, metadatas, vectors)
+            indexes[dtype] = index
+        sizes = {dtype: os.path.getsize(os.path.join(work_dir, dtype, "vectors.bin")) for dtype in indexes}
+        print(f"📦 Vector matrix bytes: {sizes}")
+        if sizes["float32"] < 1.9 * sizes["float16"] or sizes["float32"] < 3.9 * sizes["int8"]:
+            print("❌ Quantised storage is not smaller as expected")
+            return False
+        print("✅ float16 and int8 storage are 2x and 4x smaller")
+
+        # Test 2: the IVF index over int8 vectors keeps recall high
+        if indexes["int8"].centroids is None:
+            print("❌ IVF index should be trained above ivf_min_rows")
+            return False
+        recall = recall_at_k(indexes["int8"], vectors, queries)
+        print(f"🎯 int8 + IVF recall@10: {recall:.3f}")
+        if recall < 0.9:
+            print("❌ Recall dropped too far")
+            return False
+        print("✅ Approximate search recall is within tolerance")
+
+        # Test 3: a reopened index returns the same results and metadata
+        reopened = MMapVectorIndex(os.path.join(work_dir, "int8"))
+        before = indexes["int8"].search(queries[0], 5)
+        after = reopened.search(queries[0], 5)
+        if reopened.count() != len(vectors) or before[0] != after[0] or before[1] != after[1]:
+            print("❌ Reopened index differs from the original")
+            return False
+        print("✅ Index persists and reopens from disk")
+
+        # Test 4: a metadata filter is applied before ranking, on the IVF index as well
+        for where in ({"source": ["doc_2.txt"]}, {"source": ["doc_0.txt", "doc_2.txt", "doc_3.txt"]}):
+            _, found_metadatas, _, similarities = reopened.search(queries[0], 10, where)
+            if len(found_metadatas) != 10 or any(m["source"] not in where["source"] for m in found_metadatas):
+                print(f"❌ Filtered search returned chunks outside {where['source']}")
+                return False
+        if reopened.search(queries[0], 10, {"source": ["missing.txt"]})[0]:
+            print("❌ A filter matching nothing should return no chunks")
+            return False
+        print("✅ Metadata filters restrict the search")
+
+        # Test 5: deleting a source removes only its chunks
+        deleted = reopened.delete_sources(["doc_1.txt"])
+        sources = {metadata["source"] for metadata in reopened.metadatas()}
+        if deleted != len(vectors) // 4 or "doc_1.txt" in sources or reopened.count() != len(vectors) - deleted:
+            print(f"❌ Unexpected deletion result: {deleted} deleted, sources {sorted(sources)}")
+            return False
+        _, found_metadatas, _, _ = reopened.search(queries[0], 10)
+        if any(metadata["source"] == "doc_1.txt" for metadata in found_metadatas):
+            print("❌ Deleted chunks are still returned by search")
+            return False
+        print("✅ Deleted source no longer appears in the index")
+
+        # Test 6: adds append only new metadata; an unfinished append and the old metadata.json format still open
+        path = os.path.join(work_dir, "incremental")
+        index = MMapVectorIndex(path, dtype="float32")
+        metadata_file = os.path.join(path, "metadata.jsonl")
+        index.add(texts[:10], metadatas[:10], vectors[:10])
+        size = os.path.getsize(metadata_file)
+        index.add(texts[10:20], metadatas[10:20], vectors[10:20])
+        unchanged = os.path.getsize(metadata_file) == size
+        index.add(texts[20:21], [{"source": "new.txt"}], vectors[20:21])
+        grown = os.path.getsize(metadata_file) - size == len('{"source": "new.txt"}\n')
+        if not unchanged or not grown:
+            print("❌ Adding chunks should append only metadata not stored before")
+            return False
+        with open(metadata_file, "a") as f:
+            f.write('{"source": "torn')
+        index = MMapVectorIndex(path)
+        index.add(texts[21:22], [{"source": "after.txt"}], vectors[21:22])
+        expected = metadatas[:20] + [{"source": "new.txt"}, {"source": "after.txt"}]
+        if MMapVectorIndex(path).metadatas() != expected:
+            print("❌ An unfinished metadata append corrupted the index")
+            return False
+        with open(metadata_file) as f:
+            table = [json.loads(line) for line in f]
+        os.remove(metadata_file)
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump(table, f)
+        legacy = MMapVectorIndex(path)
+        legacy.add(texts[22:23], [{"source": "doc_0.txt"}], vectors[22:23])
+        if MMapVectorIndex(path).metadatas() != expected + [{"source": "doc_0.txt"}] or \
+                os.path.exists(os.path.join(path, "metadata.json")):
+            print("❌ An index with metadata.json was not opened and converted")
+            return False
+        print("✅ Metadata is appended incrementally and older indexes still open")
+
+        # Test 7: bulk appends with train=False past 4x the trained rows stay searchable until train()
+        index = MMapVectorIndex(os.path.join(work_dir, "bulk"), dtype="int8", ivf_min_rows=1000)
+        index.add(texts[:1000], metadatas[:1000], vectors[:1000])
+        for start in range(1000, 5000, 1000):
+            index.add(texts[start:start + 1000], metadatas[start:start + 1000], vectors[start:start + 1000],
+                      train=False)
+        if index.trained_rows != 1000 or len(index.assignments) != index.count():
+            print(f"❌ {index.count()} rows but {len(index.assignments)} IVF assignments after deferred training")
+            return False
+        found, _, _, _ = index.search(vectors[4999], 1)
+        if found != [texts[4999]]:
+            print(f"❌ A row appended with train=False is not found: {found}")
+            return False
+        index.delete_sources(["doc_3.txt"])
+        index.train()
+        if index.trained_rows != index.count() or len(index.assignments) != index.count():
+            print("❌ train() should index every row")
+            return False
+        print("✅ Deferred training keeps appended rows in the IVF lists")
+
+        print("\n✅ All vector index tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Vector index test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_vector_index()
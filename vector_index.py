@@ -0,0 +1,405 @@
+# vector_index.py
+"""
+Memory-mapped vector index for corpora too large for Chroma's float32 storage.
+
+Normalised vectors are kept in one on-disk matrix that is memory-mapped
+instead of loaded, optionally quantised to float16 (2x smaller) or to int8
+with a per-row scale (4x smaller). Once the index holds ivf_min_rows
+vectors, an inverted-file (IVF) index of k-means centroids restricts each
+search to the rows of the nprobe closest lists. Chunk texts and metadata
+live in compact sidecar files next to the matrix:
+
+    manifest.json   dimension, storage dtype, row count, IVF settings
+    vectors.bin     (rows, dimension) matrix in the storage dtype
+    scales.bin      float32 scale per row (int8 only)
+    texts.bin       UTF-8 chunk texts back to back
+    offsets.bin     int64 start of each text in texts.bin (rows + 1 entries)
+    metadata.jsonl  distinct metadata dicts, one JSON line each, appended as new ones appear
+    meta_ids.bin    int32 line of metadata.jsonl for each row
+    ivf.npz         IVF centroids and the list each row belongs to
+"""
+
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+BLOCK_ROWS = 65536  # rows scored per step of a full scan, bounds temporary memory
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype):
+    """Storage representation of unit vectors in dtype, plus per-row scales for int8 (None otherwise)"""
+    if dtype == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(STORAGE_DTYPES[dtype]), None
+
+
+def _kmeans(data, clusters, iterations=10, seed=0):
+    """Spherical k-means; returns unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=clusters)
+        empty = counts == 0
+        # Re-seed empty clusters from random points so every list stays useful
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def metadata_matches(metadata, where):
+    """True if metadata holds one of the allowed values for every field of where ({field: [values]})"""
+    return all((metadata or {}).get(field) in values for field, values in where.items())
+
+
+class MMapVectorIndex:
+    """Quantised, memory-mapped vector store with an optional IVF index.
+
+    dtype is "int8", "float16" or "float32". nlist defaults to about
+    sqrt(rows) at training time; nprobe lists are scanned per query, trading
+    recall for speed.
+    """
+
+    def __init__(self, directory, dtype="int8", nlist=None, nprobe=8, ivf_min_rows=10000, train_size=50000):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}; use one of {', '.join(STORAGE_DTYPES)}")
+        self.directory = directory
+        self.dtype = dtype
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.train_size = train_size
+        self.trained_rows = 0
+        self.dimension = None
+        self.rows = 0
+        self.centroids = None
+        self.assignments = None
+        self._lists = None
+        self._metadata_table = []
+        self._metadata_lookup = {}
+        self._metadata_saved = 0  # entries of _metadata_table already in metadata.jsonl
+        self._maps = {}
+        self._lock = threading.RLock()
+        if os.path.exists(self._path("manifest.json")):
+            self._open()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        """Load the manifest and sidecars of an existing index"""
+        with open(self._path("manifest.json")) as f:
+            manifest = json.load(f)
+        self.dimension = manifest["dimension"]
+        self.dtype = manifest["dtype"]
+        self.rows = manifest["rows"]
+        self.nlist = manifest.get("nlist", self.nlist)
+        self.nprobe = manifest.get("nprobe", self.nprobe)
+        self.trained_rows = manifest.get("trained_rows", 0)
+        if os.path.exists(self._path("metadata.jsonl")):
+            with open(self._path("metadata.jsonl")) as f:
+                lines = f.read().splitlines()
+            self._metadata_table = [json.loads(line) for line in lines[:manifest["metadata_entries"]]]
+            # Lines past the manifest's count come from an add that never finished; the next save rewrites the file
+            self._metadata_saved = len(self._metadata_table) if len(lines) == len(self._metadata_table) else 0
+        else:
+            # Indexes written before metadata.jsonl kept the table in metadata.json
+            with open(self._path("metadata.json")) as f:
+                self._metadata_table = json.load(f)
+        self._metadata_lookup = {json.dumps(m, sort_keys=True): i for i, m in enumerate(self._metadata_table)}
+        if os.path.exists(self._path("ivf.npz")):
+            with np.load(self._path("ivf.npz")) as ivf:
+                self._set_ivf(ivf["centroids"], ivf["assignments"])
+        self._map()
+
+    def _map(self):
+        """(Re)open the memory maps over the data files"""
+        self._maps = {}
+        if not self.rows:
+            return
+        storage = STORAGE_DTYPES[self.dtype]
+        self._maps["vectors"] = np.memmap(self._path("vectors.bin"), dtype=storage, mode="r",
+                                          shape=(self.rows, self.dimension))
+        if self.dtype == "int8":
+            self._maps["scales"] = np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(self.rows,))
+        self._maps["offsets"] = np.memmap(self._path("offsets.bin"), dtype=np.int64, mode="r", shape=(self.rows + 1,))
+        self._maps["meta_ids"] = np.memmap(self._path("meta_ids.bin"), dtype=np.int32, mode="r", shape=(self.rows,))
+        self._maps["texts"] = np.memmap(self._path("texts.bin"), dtype=np.uint8, mode="r") \
+            if self._maps["offsets"][-1] else np.zeros(0, dtype=np.uint8)
+
+    def _save_metadata(self):
+        """Append metadata dicts interned since the last save, so an add costs its new entries only"""
+        new_entries = self._metadata_table[self._metadata_saved:]
+        if not new_entries and self._metadata_saved:
+            return
+        with open(self._path("metadata.jsonl"), "a" if self._metadata_saved else "w") as f:
+            f.write("".join(json.dumps(metadata) + "\n" for metadata in new_entries))
+        if not self._metadata_saved and os.path.exists(self._path("metadata.json")):
+            os.remove(self._path("metadata.json"))
+        self._metadata_saved = len(self._metadata_table)
+
+    def _save_manifest(self):
+        self._save_metadata()
+        manifest = {
+            "dimension": self.dimension,
+            "dtype": self.dtype,
+            "rows": self.rows,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_rows": self.trained_rows,
+            "metadata_entries": self._metadata_saved
+        }
+        with open(self._path("manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _set_ivf(self, centroids, assignments):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def vectors(self, rows):
+        """Dequantised float32 vectors for row indices or a slice"""
+        vectors = np.asarray(self._maps["vectors"][rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= np.asarray(self._maps["scales"][rows])[:, None]
+        return vectors
+
+    def _metadata_id(self, metadata):
+        key = json.dumps(metadata or {}, sort_keys=True, default=str)
+        if key not in self._metadata_lookup:
+            self._metadata_lookup[key] = len(self._metadata_table)
+            self._metadata_table.append(json.loads(key))
+        return self._metadata_lookup[key]
+
+    def add(self, texts, metadatas, vectors, train=True):
+        """Append chunks with their metadata and embedding vectors.
+
+        Bulk loaders can pass train=False for every block and call train()
+        once at the end instead of retraining the IVF index as it grows.
+        """
+        if not len(texts):
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one embedding vector per text")
+        metadatas = metadatas or [{}] * len(texts)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                os.makedirs(self.directory, exist_ok=True)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+            vectors = _normalize(vectors)
+            stored, scales = quantize(vectors, self.dtype)
+            encoded = [text.encode("utf-8") for text in texts]
+            start = int(self._maps["offsets"][-1]) if self.rows else 0
+            offsets = start + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            if not self.rows:
+                offsets = np.concatenate([[0], offsets]).astype(np.int64)
+            meta_ids = np.array([self._metadata_id(m) for m in metadatas], dtype=np.int32)
+
+            self._maps = {}  # drop the maps before growing the files
+            for name, data in (("vectors.bin", stored), ("scales.bin", scales), ("offsets.bin", offsets),
+                               ("meta_ids.bin", meta_ids), ("texts.bin", b"".join(encoded))):
+                if data is None:
+                    continue
+                mode = "ab" if self.rows else "wb"
+                with open(self._path(name), mode) as f:
+                    f.write(data if isinstance(data, bytes) else data.tobytes())
+            self.rows += len(texts)
+            self._map()
+
+            # With an automatic nlist, retrain once the index has grown 4x so lists stay small
+            retrain = self.centroids is not None and self.nlist is None and self.rows >= 4 * self.trained_rows
+            # With train=False a due retrain waits for train(); the new rows still join their nearest lists
+            if self.centroids is not None and not (retrain and train):
+                self._set_ivf(self.centroids, np.concatenate([self.assignments, self._assign(vectors)]))
+                np.savez(self._path("ivf.npz"), centroids=self.centroids, assignments=self.assignments)
+            elif train and self.rows >= self.ivf_min_rows:
+                self.train()
+            self._save_manifest()
+        return len(texts)
+
+    def _assign(self, vectors):
+        """Nearest IVF list for each unit vector"""
+        labels = [np.argmax(vectors[i:i + BLOCK_ROWS] @ self.centroids.T, axis=1)
+                  for i in range(0, len(vectors), BLOCK_ROWS)]
+        return np.concatenate(labels).astype(np.int32)
+
+    def train(self, seed=0):
+        """Build the IVF index by k-means over a sample of the stored vectors"""
+        with self._lock:
+            if not self.rows:
+                return
+            clusters = min(self.nlist or max(1, int(np.sqrt(self.rows))), self.rows)
+            rng = np.random.default_rng(seed)
+            sample_size = min(self.rows, max(self.train_size, clusters * 40))
+            sample = np.sort(rng.choice(self.rows, sample_size, replace=False))
+            self.centroids = _kmeans(self.vectors(sample), clusters, seed=seed)
+            assignments = np.concatenate([
+                self._assign(self.vectors(slice(i, i + BLOCK_ROWS))) for i in range(0, self.rows, BLOCK_ROWS)
+            ])
+            self.trained_rows = self.rows
+            self._set_ivf(self.centroids, assignments)
+            np.savez(self._path("ivf.npz"), centroids=self.centroids, assignments=self.assignments)
+            self._save_manifest()
+            print(f"🧭 Trained IVF index with {clusters} lists over {self.rows} vectors")
+
+    def _candidates(self, query, k):
+        """Rows to score for a query: the closest nprobe IVF lists, widened until they hold k rows"""
+        order = np.argsort(-(self.centroids @ query))
+        lists = [self._lists[i] for i in order[:self.nprobe]]
+        probed = self.nprobe
+        while sum(len(rows) for rows in lists) < k and probed < len(order):
+            lists.append(self._lists[order[probed]])
+            probed += 1
+        return np.sort(np.concatenate(lists))  # sorted rows read the memory map sequentially
+
+    def _filter_rows(self, where):
+        """Rows whose metadata matches where; checked once per distinct metadata dict, not per row"""
+        allowed = [i for i, metadata in enumerate(self._metadata_table) if metadata_matches(metadata, where)]
+        return np.flatnonzero(np.isin(np.asarray(self._maps["meta_ids"]), allowed))
+
+    def search(self, vector, k, where=None):
+        """Top-k rows by cosine similarity.
+
+        where ({field: [allowed values]}) restricts the search to matching
+        rows before scoring. Returns (texts, metadatas, dequantised unit
+        vectors, similarities), best first.
+        """
+        with self._lock:
+            allowed = self._filter_rows(where) if where and self.rows else None
+            if not self.rows or (allowed is not None and not len(allowed)):
+                return [], [], np.zeros((0, len(vector)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+            query = _normalize(vector)
+            if self.centroids is not None:
+                rows = self._candidates(query, k)
+                if allowed is not None:
+                    # A selective filter is scanned exactly; a broad one is intersected with the probed lists
+                    matched = rows[np.isin(rows, allowed, assume_unique=True)]
+                    rows = allowed if len(allowed) <= len(rows) or len(matched) < k else matched
+                scores = np.concatenate([self.vectors(rows[i:i + BLOCK_ROWS]) @ query
+                                         for i in range(0, len(rows), BLOCK_ROWS)])
+            elif allowed is not None:
+                rows = allowed
+                scores = np.concatenate([self.vectors(rows[i:i + BLOCK_ROWS]) @ query
+                                         for i in range(0, len(rows), BLOCK_ROWS)])
+            else:
+                rows = np.arange(self.rows)
+                scores = np.concatenate([self.vectors(slice(i, i + BLOCK_ROWS)) @ query
+                                         for i in range(0, self.rows, BLOCK_ROWS)])
+            k = min(k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            best = rows[top]
+            return ([self.text(int(row)) for row in best],
+                    [dict(self._metadata_table[self._maps["meta_ids"][row]]) for row in best],
+                    _normalize(self.vectors(best)),
+                    scores[top].astype(np.float32))
+
+    def get(self, where):
+        """(texts, metadatas) of every row matching where, in insertion order"""
+        with self._lock:
+            if not self.rows:
+                return [], []
+            rows = self._filter_rows(where)
+            return ([self.text(int(row)) for row in rows],
+                    [dict(self._metadata_table[self._maps["meta_ids"][row]]) for row in rows])
+
+    def text(self, row):
+        offsets = self._maps["offsets"]
+        return bytes(self._maps["texts"][offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def count(self):
+        return self.rows
+
+    def metadatas(self):
+        """Metadata dict of every row (shared objects; do not modify)"""
+        if not self.rows:
+            return []
+        return [self._metadata_table[i] for i in self._maps["meta_ids"]]
+
+    def delete_sources(self, sources):
+        """Remove every row whose metadata source is in sources; returns the number removed"""
+        with self._lock:
+            if not self.rows:
+                return 0
+            sources = set(sources)
+            doomed = [i for i, m in enumerate(self._metadata_table) if m.get("source") in sources]
+            keep = ~np.isin(np.asarray(self._maps["meta_ids"]), doomed)
+            removed = int(self.rows - keep.sum())
+            if removed:
+                self._rewrite(np.flatnonzero(keep))
+            return removed
+
+    def _rewrite(self, rows):
+        """Rewrite the data files keeping only rows, block by block"""
+        temp_dir = self._path("rewrite.tmp")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        names = ["vectors.bin", "offsets.bin", "meta_ids.bin", "texts.bin"] + (["scales.bin"] if self.dtype == "int8" else [])
+        files = {name: open(os.path.join(temp_dir, name), "wb") for name in names}
+        try:
+            position = 0
+            files["offsets.bin"].write(np.zeros(1, dtype=np.int64).tobytes())
+            for i in range(0, len(rows), BLOCK_ROWS):
+                block = rows[i:i + BLOCK_ROWS]
+                files["vectors.bin"].write(np.asarray(self._maps["vectors"][block]).tobytes())
+                if self.dtype == "int8":
+                    files["scales.bin"].write(np.asarray(self._maps["scales"][block]).tobytes())
+                files["meta_ids.bin"].write(np.asarray(self._maps["meta_ids"][block]).tobytes())
+                encoded = [self.text(int(row)).encode("utf-8") for row in block]
+                files["texts.bin"].write(b"".join(encoded))
+                offsets = position + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+                files["offsets.bin"].write(offsets.tobytes())
+                if len(offsets):
+                    position = int(offsets[-1])
+        finally:
+            for f in files.values():
+                f.close()
+
+        assignments = self.assignments[rows] if self.assignments is not None else None
+        self._maps = {}
+        for name in files:
+            os.replace(os.path.join(temp_dir, name), self._path(name))
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        self.rows = len(rows)
+        if assignments is not None:
+            self._set_ivf(self.centroids, assignments)
+            np.savez(self._path("ivf.npz"), centroids=self.centroids, assignments=self.assignments)
+        self._map()
+        self._save_manifest()
+
+    def size_bytes(self):
+        """Disk size of the index files"""
+        return sum(os.path.getsize(self._path(name)) for name in os.listdir(self.directory)
+                   if os.path.isfile(self._path(name))) if os.path.isdir(self.directory) else 0
+
+    def clear(self):
+        """Delete the index files and reset to an empty index"""
+        with self._lock:
+            self._maps = {}
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.dimension = None
+            self.rows = 0
+            self.centroids = None
+            self.assignments = None
+            self._lists = None
+            self._metadata_table = []
+            self._metadata_lookup = {}
+            self._metadata_saved = 0